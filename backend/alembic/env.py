@@ -1,14 +1,14 @@
 import os
 from logging.config import fileConfig
 
+# Load environment variables from .env file
+from dotenv import load_dotenv
 from sqlalchemy import engine_from_config, pool
 from sqlmodel import SQLModel
 
 from alembic import context
 from app.models import *
 
-# Load environment variables from .env file
-from dotenv import load_dotenv
 load_dotenv()
 
 config = context.config
@@ -19,6 +19,13 @@ if config.config_file_name is not None:
 target_metadata = SQLModel.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip models backed by database views; migrations manage those by hand."""
+    if type_ == "table" and object.info.get("is_view"):
+        return False
+    return True
+
+
 def get_url():
     url = os.getenv("DATABASE_URL")
     if url:
@@ -48,6 +55,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -73,7 +81,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,133 @@
+"""Range-based allowance inventory
+
+Store inventory as contiguous serial ranges in ``allowance_ranges`` and replace
+the per-serial ``allowances`` table with a read-only view over those ranges.
+
+Revision ID: 3b9d2f6c1a47
+Revises: e24cbb1d809e
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d2f6c1a47"
+down_revision: Union[str, Sequence[str], None] = "e24cbb1d809e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ALLOWANCES_VIEW = """
+    CREATE VIEW allowances AS
+    SELECT
+        serial::varchar AS serial_number,
+        r.status,
+        r.order_id,
+        r.timestamp,
+        r.wallet,
+        r.message,
+        r.tx_hash,
+        r.reward_tx_hash,
+        r.created_at,
+        r.updated_at
+    FROM allowance_ranges r
+    CROSS JOIN LATERAL generate_series(r.start_serial, r.end_serial) AS serial
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "allowance_ranges",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("start_serial", sa.BigInteger(), nullable=False),
+        sa.Column("end_serial", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(
+                "AVAILABLE",
+                "RESERVED",
+                "RETIRED",
+                name="allowancestatus",
+                create_type=False,
+            ),
+            nullable=False,
+        ),
+        sa.Column("order_id", sa.String(36), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("wallet", sa.String(42), nullable=True),
+        sa.Column("message", sa.String(100), nullable=True),
+        sa.Column("tx_hash", sa.String(66), nullable=True),
+        sa.Column("reward_tx_hash", sa.String(66), nullable=True),
+        sa.Column("originating_state", sa.String(2), nullable=True),
+        sa.Column("allocation_year", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("start_serial"),
+    )
+    op.create_index(
+        op.f("ix_allowance_ranges_status"), "allowance_ranges", ["status"], unique=False
+    )
+    op.create_index(
+        op.f("ix_allowance_ranges_timestamp"),
+        "allowance_ranges",
+        ["timestamp"],
+        unique=False,
+    )
+
+    # Collapse runs of consecutive serials that share a status and order
+    op.execute(
+        """
+        INSERT INTO allowance_ranges (
+            start_serial, end_serial, status, order_id, timestamp, wallet,
+            message, tx_hash, reward_tx_hash, created_at, updated_at
+        )
+        SELECT
+            min(serial), max(serial), status, order_id, max(timestamp),
+            max(wallet), max(message), max(tx_hash), max(reward_tx_hash),
+            min(created_at), max(updated_at)
+        FROM (
+            SELECT
+                a.*,
+                a.serial_number::bigint AS serial,
+                a.serial_number::bigint - row_number() OVER (
+                    PARTITION BY a.status, a.order_id
+                    ORDER BY a.serial_number::bigint
+                ) AS island
+            FROM allowances a
+        ) serials
+        GROUP BY status, order_id, island
+    """
+    )
+
+    op.drop_table("allowances")
+    op.execute(ALLOWANCES_VIEW)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("CREATE TABLE allowances_restored AS SELECT * FROM allowances")
+    op.execute("DROP VIEW allowances")
+    op.rename_table("allowances_restored", "allowances")
+    op.alter_column("allowances", "serial_number", type_=sa.String(32), nullable=False)
+    op.alter_column("allowances", "status", nullable=False)
+    op.alter_column("allowances", "created_at", nullable=False)
+    op.alter_column("allowances", "updated_at", nullable=False)
+    op.create_primary_key("allowances_pkey", "allowances", ["serial_number"])
+    op.create_index(
+        op.f("ix_allowances_status"), "allowances", ["status"], unique=False
+    )
+    op.create_index(
+        op.f("ix_allowances_timestamp"), "allowances", ["timestamp"], unique=False
+    )
+
+    op.drop_index(op.f("ix_allowance_ranges_timestamp"), table_name="allowance_ranges")
+    op.drop_index(op.f("ix_allowance_ranges_status"), table_name="allowance_ranges")
+    op.drop_table("allowance_ranges")
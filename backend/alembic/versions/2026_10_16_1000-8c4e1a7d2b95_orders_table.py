@@ -0,0 +1,179 @@
+"""Orders table
+
+Move order-level data (buyer, message, payment and reward hashes, reservation
+time) off ``allowance_ranges`` into one ``orders`` row per order, linked to its
+ranges through ``order_allowances``.
+
+Revision ID: 8c4e1a7d2b95
+Revises: 3b9d2f6c1a47
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4e1a7d2b95"
+down_revision: Union[str, Sequence[str], None] = "3b9d2f6c1a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ALLOWANCES_VIEW = """
+    CREATE VIEW allowances AS
+    SELECT
+        serial::varchar AS serial_number,
+        r.status,
+        o.order_id,
+        o.timestamp,
+        o.wallet,
+        o.message,
+        o.tx_hash,
+        o.reward_tx_hash,
+        r.created_at,
+        r.updated_at
+    FROM allowance_ranges r
+    LEFT JOIN order_allowances oa ON oa.range_id = r.id
+    LEFT JOIN orders o ON o.order_id = oa.order_id
+    CROSS JOIN LATERAL generate_series(r.start_serial, r.end_serial) AS serial
+"""
+
+PREVIOUS_ALLOWANCES_VIEW = """
+    CREATE VIEW allowances AS
+    SELECT
+        serial::varchar AS serial_number,
+        r.status,
+        r.order_id,
+        r.timestamp,
+        r.wallet,
+        r.message,
+        r.tx_hash,
+        r.reward_tx_hash,
+        r.created_at,
+        r.updated_at
+    FROM allowance_ranges r
+    CROSS JOIN LATERAL generate_series(r.start_serial, r.end_serial) AS serial
+"""
+
+ORDER_COLUMNS = [
+    "order_id",
+    "timestamp",
+    "wallet",
+    "message",
+    "tx_hash",
+    "reward_tx_hash",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    order_state = postgresql.ENUM(
+        "RESERVED", "RETIRED", "FAILED", "EXPIRED", name="orderstate"
+    )
+    order_state.create(op.get_bind())
+
+    op.create_table(
+        "orders",
+        sa.Column("order_id", sa.String(36), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="orderstate", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("wallet", sa.String(42), nullable=True),
+        sa.Column("message", sa.String(100), nullable=True),
+        sa.Column("num_allowances", sa.Integer(), nullable=False),
+        sa.Column("tx_hash", sa.String(66), nullable=True),
+        sa.Column("reward_tx_hash", sa.String(66), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("order_id"),
+    )
+    op.create_table(
+        "order_allowances",
+        sa.Column("order_id", sa.String(36), nullable=False),
+        sa.Column("range_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.order_id"]),
+        sa.ForeignKeyConstraint(["range_id"], ["allowance_ranges.id"]),
+        sa.PrimaryKeyConstraint("order_id", "range_id"),
+    )
+
+    # One order per distinct order_id; reserved orders keep their state
+    op.execute(
+        """
+        INSERT INTO orders (
+            order_id, status, wallet, message, num_allowances, tx_hash,
+            reward_tx_hash, timestamp, created_at, updated_at
+        )
+        SELECT
+            order_id,
+            CASE WHEN bool_and(status = 'RETIRED') THEN 'RETIRED' ELSE 'RESERVED' END::orderstate,
+            max(wallet), max(message), sum(end_serial - start_serial + 1),
+            max(tx_hash), max(reward_tx_hash), max(timestamp),
+            min(created_at), max(updated_at)
+        FROM allowance_ranges
+        WHERE order_id IS NOT NULL
+        GROUP BY order_id
+    """
+    )
+    op.execute(
+        """
+        INSERT INTO order_allowances (order_id, range_id)
+        SELECT order_id, id FROM allowance_ranges WHERE order_id IS NOT NULL
+    """
+    )
+
+    op.execute("DROP VIEW allowances")
+    op.drop_index(op.f("ix_allowance_ranges_timestamp"), table_name="allowance_ranges")
+    for column in ORDER_COLUMNS:
+        op.drop_column("allowance_ranges", column)
+    op.execute(ALLOWANCES_VIEW)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP VIEW allowances")
+    op.add_column(
+        "allowance_ranges", sa.Column("order_id", sa.String(36), nullable=True)
+    )
+    op.add_column(
+        "allowance_ranges", sa.Column("timestamp", sa.DateTime(), nullable=True)
+    )
+    op.add_column("allowance_ranges", sa.Column("wallet", sa.String(42), nullable=True))
+    op.add_column(
+        "allowance_ranges", sa.Column("message", sa.String(100), nullable=True)
+    )
+    op.add_column(
+        "allowance_ranges", sa.Column("tx_hash", sa.String(66), nullable=True)
+    )
+    op.add_column(
+        "allowance_ranges", sa.Column("reward_tx_hash", sa.String(66), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_allowance_ranges_timestamp"),
+        "allowance_ranges",
+        ["timestamp"],
+        unique=False,
+    )
+
+    op.execute(
+        """
+        UPDATE allowance_ranges r
+        SET order_id = o.order_id, timestamp = o.timestamp, wallet = o.wallet,
+            message = o.message, tx_hash = o.tx_hash, reward_tx_hash = o.reward_tx_hash
+        FROM order_allowances oa
+        JOIN orders o ON o.order_id = oa.order_id
+        WHERE oa.range_id = r.id
+    """
+    )
+    op.execute(PREVIOUS_ALLOWANCES_VIEW)
+
+    op.drop_table("order_allowances")
+    op.drop_table("orders")
+    postgresql.ENUM(name="orderstate").drop(op.get_bind())
@@ -0,0 +1,65 @@
+"""Query shape indexes
+
+Index the predicates the hot paths actually filter on: free ranges by serial,
+paid-but-unretired orders, retired orders by recency and range-to-order links.
+
+Revision ID: 5e2a9c3f7d18
+Revises: 8c4e1a7d2b95
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e2a9c3f7d18"
+down_revision: Union[str, Sequence[str], None] = "8c4e1a7d2b95"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_allowance_ranges_available_start",
+        "allowance_ranges",
+        ["start_serial"],
+        unique=False,
+        postgresql_where=sa.text("status = 'AVAILABLE'"),
+    )
+    op.create_index(
+        "ix_allowance_ranges_available_end",
+        "allowance_ranges",
+        ["end_serial"],
+        unique=False,
+        postgresql_where=sa.text("status = 'AVAILABLE'"),
+    )
+    op.create_index(
+        "ix_orders_status_updated_at", "orders", ["status", "updated_at"], unique=False
+    )
+    op.create_index(
+        "ix_orders_reserved_paid",
+        "orders",
+        ["timestamp"],
+        unique=False,
+        postgresql_where=sa.text("status = 'RESERVED' AND tx_hash IS NOT NULL"),
+    )
+    op.create_index(
+        op.f("ix_order_allowances_range_id"),
+        "order_allowances",
+        ["range_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_order_allowances_range_id"), table_name="order_allowances")
+    op.drop_index("ix_orders_reserved_paid", table_name="orders")
+    op.drop_index("ix_orders_status_updated_at", table_name="orders")
+    op.drop_index("ix_allowance_ranges_available_end", table_name="allowance_ranges")
+    op.drop_index("ix_allowance_ranges_available_start", table_name="allowance_ranges")
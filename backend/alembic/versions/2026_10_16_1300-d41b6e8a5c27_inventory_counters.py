@@ -0,0 +1,66 @@
+"""Inventory counters
+
+Keep a striped per-status serial count so stock can be read and sold-out
+requests rejected without scanning allowance_ranges.
+
+Revision ID: d41b6e8a5c27
+Revises: a7f3c2e91d04
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d41b6e8a5c27"
+down_revision: Union[str, Sequence[str], None] = "a7f3c2e91d04"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTER_SLOTS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "inventory_counters",
+        sa.Column(
+            "status",
+            postgresql.ENUM(
+                "AVAILABLE",
+                "RESERVED",
+                "RETIRED",
+                name="allowancestatus",
+                create_type=False,
+            ),
+            nullable=False,
+        ),
+        sa.Column("slot", sa.Integer(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("status", "slot"),
+    )
+
+    # Totals go to slot 0; the other slots start empty
+    op.execute(
+        f"""
+        INSERT INTO inventory_counters (status, slot, count)
+        SELECT s.status, slots.slot, CASE WHEN slots.slot = 0 THEN COALESCE(t.total, 0) ELSE 0 END
+        FROM unnest(enum_range(NULL::allowancestatus)) AS s(status)
+        CROSS JOIN generate_series(0, {COUNTER_SLOTS - 1}) AS slots(slot)
+        LEFT JOIN (
+            SELECT status, sum(end_serial - start_serial + 1) AS total
+            FROM allowance_ranges
+            GROUP BY status
+        ) t ON t.status = s.status
+    """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("inventory_counters")
@@ -0,0 +1,108 @@
+"""Allocation buckets
+
+Spread free allowance ranges over allocation buckets so concurrent checkouts
+start on different ranges, and count available serials per bucket.
+
+Revision ID: f2c8d5a0b613
+Revises: d41b6e8a5c27
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c8d5a0b613"
+down_revision: Union[str, Sequence[str], None] = "d41b6e8a5c27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ALLOCATION_BUCKETS = 16
+BUCKET_CHUNK_SIZE = 50
+
+
+def _rebuild_counters(available_by_bucket: bool) -> None:
+    slot = "bucket" if available_by_bucket else "0"
+    op.execute(
+        f"""
+        UPDATE inventory_counters c
+        SET count = COALESCE(t.total, 0)
+        FROM inventory_counters k
+        LEFT JOIN (
+            SELECT
+                status,
+                CASE WHEN status = 'AVAILABLE' THEN {slot} ELSE 0 END AS slot,
+                sum(end_serial - start_serial + 1) AS total
+            FROM allowance_ranges
+            GROUP BY 1, 2
+        ) t ON t.status = k.status AND t.slot = k.slot
+        WHERE c.status = k.status AND c.slot = k.slot
+    """
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "allowance_ranges",
+        sa.Column("bucket", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.alter_column("allowance_ranges", "bucket", server_default=None)
+
+    # Deal serial-aligned chunks of free ranges out to the buckets
+    op.execute(
+        f"""
+        WITH source AS (
+            DELETE FROM allowance_ranges r
+            WHERE r.status = 'AVAILABLE'
+            AND NOT EXISTS (SELECT 1 FROM order_allowances oa WHERE oa.range_id = r.id)
+            RETURNING r.*
+        )
+        INSERT INTO allowance_ranges (
+            start_serial, end_serial, status, originating_state, allocation_year,
+            bucket, created_at, updated_at
+        )
+        SELECT
+            chunk_start, chunk_end, 'AVAILABLE', originating_state, allocation_year,
+            CAST((row_number() OVER (ORDER BY chunk_start) - 1) % {ALLOCATION_BUCKETS} AS integer),
+            created_at, now()
+        FROM (
+            SELECT
+                GREATEST(s.start_serial, k * {BUCKET_CHUNK_SIZE}) AS chunk_start,
+                LEAST(s.end_serial, (k + 1) * {BUCKET_CHUNK_SIZE} - 1) AS chunk_end,
+                s.originating_state, s.allocation_year, s.created_at
+            FROM source s
+            CROSS JOIN LATERAL generate_series(
+                s.start_serial / {BUCKET_CHUNK_SIZE}, s.end_serial / {BUCKET_CHUNK_SIZE}
+            ) AS k
+        ) chunks
+    """
+    )
+    _rebuild_counters(available_by_bucket=True)
+
+    op.drop_index("ix_allowance_ranges_available_start", table_name="allowance_ranges")
+    op.create_index(
+        "ix_allowance_ranges_available_bucket",
+        "allowance_ranges",
+        ["bucket", "start_serial"],
+        unique=False,
+        postgresql_where=sa.text("status = 'AVAILABLE'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_allowance_ranges_available_bucket", table_name="allowance_ranges")
+    op.create_index(
+        "ix_allowance_ranges_available_start",
+        "allowance_ranges",
+        ["start_serial"],
+        unique=False,
+        postgresql_where=sa.text("status = 'AVAILABLE'"),
+    )
+    op.drop_column("allowance_ranges", "bucket")
+    _rebuild_counters(available_by_bucket=False)
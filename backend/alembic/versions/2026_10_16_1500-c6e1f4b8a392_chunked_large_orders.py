@@ -0,0 +1,47 @@
+"""Chunked large orders
+
+Add a RESERVING order state for large orders that are reserved in chunks and
+track how many serials each order has reserved so far.
+
+Revision ID: c6e1f4b8a392
+Revises: f2c8d5a0b613
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c6e1f4b8a392"
+down_revision: Union[str, Sequence[str], None] = "f2c8d5a0b613"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A new enum value cannot be used in the transaction that adds it, and a
+    # single upgrade runs every revision in one transaction; commit it first
+    with op.get_context().autocommit_block():
+        op.execute(
+            "ALTER TYPE orderstate ADD VALUE IF NOT EXISTS 'RESERVING' BEFORE 'RESERVED'"
+        )
+    op.add_column(
+        "orders",
+        sa.Column("num_reserved", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    # Existing orders were reserved in one statement
+    op.execute("UPDATE orders SET num_reserved = num_allowances")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Postgres cannot drop an enum value, so RESERVING stays in the type. Run
+    # the cleanup job first so no order is left half-filled
+    op.execute("UPDATE orders SET status = 'FAILED' WHERE status = 'RESERVING'")
+    op.drop_column("orders", "num_reserved")
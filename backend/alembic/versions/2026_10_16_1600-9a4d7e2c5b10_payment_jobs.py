@@ -0,0 +1,62 @@
+"""Payment jobs
+
+Queue confirmed payments so they are validated and fulfilled by workers
+instead of inside the confirm request.
+
+Revision ID: 9a4d7e2c5b10
+Revises: c6e1f4b8a392
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4d7e2c5b10"
+down_revision: Union[str, Sequence[str], None] = "c6e1f4b8a392"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    job_state = postgresql.ENUM("QUEUED", "DONE", "FAILED", name="paymentjobstate")
+    job_state.create(op.get_bind())
+
+    op.create_table(
+        "payment_jobs",
+        sa.Column("order_id", sa.String(36), nullable=False),
+        sa.Column("tx_hash", sa.String(66), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="paymentjobstate", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.order_id"]),
+        sa.PrimaryKeyConstraint("order_id"),
+    )
+    op.create_index(
+        "ix_payment_jobs_queued_run_at",
+        "payment_jobs",
+        ["run_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'QUEUED'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_payment_jobs_queued_run_at", table_name="payment_jobs")
+    op.drop_table("payment_jobs")
+    postgresql.ENUM(name="paymentjobstate").drop(op.get_bind())
@@ -0,0 +1,36 @@
+"""Order payment quotes
+
+Store the ETH amount quoted at reservation on each order, with its price
+source and expiry, so confirmation can check the payment without a live price.
+
+Revision ID: 4f8b1d3e6a29
+Revises: 9a4d7e2c5b10
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4f8b1d3e6a29"
+down_revision: Union[str, Sequence[str], None] = "9a4d7e2c5b10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("orders", sa.Column("quote_wei", sa.Numeric(78, 0), nullable=True))
+    op.add_column("orders", sa.Column("quote_source", sa.String(32), nullable=True))
+    op.add_column("orders", sa.Column("quote_expires_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("orders", "quote_expires_at")
+    op.drop_column("orders", "quote_source")
+    op.drop_column("orders", "quote_wei")
@@ -0,0 +1,47 @@
+"""Unique payment tx_hash
+
+Make payment_jobs the registry of submitted payments: each transaction hash
+can belong to one order only. Orders paid before the job queue existed are
+registered as finished jobs; if a hash was reused, the earliest order keeps it.
+
+Revision ID: b3e9c6f2d874
+Revises: 4f8b1d3e6a29
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e9c6f2d874"
+down_revision: Union[str, Sequence[str], None] = "4f8b1d3e6a29"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        INSERT INTO payment_jobs (
+            order_id, tx_hash, status, attempts, run_at, created_at, updated_at
+        )
+        SELECT DISTINCT ON (o.tx_hash)
+            o.order_id, o.tx_hash, 'DONE', 0, o.updated_at, o.updated_at, o.updated_at
+        FROM orders o
+        WHERE o.tx_hash IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM payment_jobs j WHERE j.tx_hash = o.tx_hash)
+        ORDER BY o.tx_hash, o.created_at
+        ON CONFLICT (order_id) DO NOTHING
+    """
+    )
+    op.create_index(
+        op.f("ix_payment_jobs_tx_hash"), "payment_jobs", ["tx_hash"], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_payment_jobs_tx_hash"), table_name="payment_jobs")
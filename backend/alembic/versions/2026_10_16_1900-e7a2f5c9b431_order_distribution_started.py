@@ -0,0 +1,34 @@
+"""Order distribution started
+
+Record when the $PR token transfer for a paid order begins, so status readers
+can tell a paid order from one whose reward is being distributed.
+
+Revision ID: e7a2f5c9b431
+Revises: b3e9c6f2d874
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a2f5c9b431"
+down_revision: Union[str, Sequence[str], None] = "b3e9c6f2d874"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "orders", sa.Column("distribution_started_at", sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("orders", "distribution_started_at")
@@ -0,0 +1,46 @@
+"""Retirement watermark
+
+Single-row version of the retirement history, bumped by every retirement,
+used to validate cached history responses.
+
+Revision ID: 5c1d8e3a7f26
+Revises: e7a2f5c9b431
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1d8e3a7f26"
+down_revision: Union[str, Sequence[str], None] = "e7a2f5c9b431"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "retirement_watermark",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Start from the clock so a recreated watermark never repeats the
+    # versions clients may still hold
+    op.execute(
+        """
+        INSERT INTO retirement_watermark (id, version, updated_at)
+        VALUES (1, CAST(extract(epoch FROM clock_timestamp()) * 1000000 AS bigint), now())
+    """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("retirement_watermark")
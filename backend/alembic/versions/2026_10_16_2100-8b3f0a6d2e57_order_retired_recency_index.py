@@ -0,0 +1,38 @@
+"""Order retired recency index
+
+Index retired orders by (updated_at, order_id) so history pages can seek
+to a keyset cursor instead of skipping rows.
+
+Revision ID: 8b3f0a6d2e57
+Revises: 5c1d8e3a7f26
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8b3f0a6d2e57"
+down_revision: Union[str, Sequence[str], None] = "5c1d8e3a7f26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_orders_retired_recency",
+        "orders",
+        ["updated_at", "order_id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'RETIRED'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_orders_retired_recency", table_name="orders")
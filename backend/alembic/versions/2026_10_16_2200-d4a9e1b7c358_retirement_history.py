@@ -0,0 +1,65 @@
+"""Retirement history
+
+Projection of completed retirements that the public history reads, written
+with each retirement. Existing retirements are loaded with
+scripts/backfill_retirement_history.py. The retired-order index on orders is
+no longer read by history and is dropped.
+
+Revision ID: d4a9e1b7c358
+Revises: 8b3f0a6d2e57
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a9e1b7c358"
+down_revision: Union[str, Sequence[str], None] = "8b3f0a6d2e57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "retirement_history",
+        sa.Column("order_id", sa.String(36), nullable=False),
+        sa.Column("wallet", sa.String(42), nullable=True),
+        sa.Column("message", sa.String(100), nullable=True),
+        sa.Column("reward_tx_hash", sa.String(66), nullable=True),
+        sa.Column(
+            "serial_ranges",
+            postgresql.ARRAY(sa.BigInteger(), dimensions=2),
+            nullable=False,
+        ),
+        sa.Column("num_allowances", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.order_id"]),
+        sa.PrimaryKeyConstraint("order_id"),
+    )
+    op.create_index(
+        "ix_retirement_history_completed_at",
+        "retirement_history",
+        ["completed_at", "order_id"],
+        unique=False,
+    )
+    op.drop_index("ix_orders_retired_recency", table_name="orders")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_orders_retired_recency",
+        "orders",
+        ["updated_at", "order_id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'RETIRED'"),
+    )
+    op.drop_index("ix_retirement_history_completed_at", table_name="retirement_history")
+    op.drop_table("retirement_history")
@@ -0,0 +1,63 @@
+"""Wallet retirement summaries
+
+Per-wallet totals of completed retirements, seeded from retirement_history and
+maintained with it, plus an index for reading one wallet's retirements.
+
+Revision ID: a1f6c3e8d925
+Revises: d4a9e1b7c358
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a1f6c3e8d925"
+down_revision: Union[str, Sequence[str], None] = "d4a9e1b7c358"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "wallet_retirement_summaries",
+        sa.Column("wallet", sa.String(42), nullable=False),
+        sa.Column("retirements", sa.Integer(), nullable=False),
+        sa.Column("tons_retired", sa.BigInteger(), nullable=False),
+        sa.Column("pr_earned", sa.BigInteger(), nullable=False),
+        sa.Column("first_retired_at", sa.DateTime(), nullable=False),
+        sa.Column("last_retired_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("wallet"),
+    )
+    op.create_index(
+        "ix_retirement_history_wallet",
+        "retirement_history",
+        [sa.text("lower(wallet)"), "completed_at", "order_id"],
+        unique=False,
+    )
+
+    # Retirements already in the history
+    op.execute(
+        """
+        INSERT INTO wallet_retirement_summaries (
+            wallet, retirements, tons_retired, pr_earned, first_retired_at, last_retired_at
+        )
+        SELECT
+            lower(wallet), count(*), sum(num_allowances), sum(num_allowances),
+            min(completed_at), max(completed_at)
+        FROM retirement_history
+        WHERE wallet IS NOT NULL
+        GROUP BY lower(wallet)
+    """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_retirement_history_wallet", table_name="retirement_history")
+    op.drop_table("wallet_retirement_summaries")
@@ -0,0 +1,62 @@
+"""Order paid_at
+
+Record when an order's payment was submitted, so the transaction timeout runs
+from the payment rather than from the reservation.
+
+Revision ID: 6c2d8f4a1e39
+Revises: a1f6c3e8d925
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6c2d8f4a1e39"
+down_revision: Union[str, Sequence[str], None] = "a1f6c3e8d925"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("orders", sa.Column("paid_at", sa.DateTime(), nullable=True))
+
+    # Payments already submitted: when they were queued, or failing that when
+    # the order last changed
+    op.execute(
+        """
+        UPDATE orders AS o
+        SET paid_at = COALESCE(j.created_at, o.updated_at)
+        FROM orders AS p
+        LEFT JOIN payment_jobs AS j ON j.order_id = p.order_id
+        WHERE o.order_id = p.order_id
+          AND (o.tx_hash IS NOT NULL OR j.order_id IS NOT NULL)
+    """
+    )
+
+    op.drop_index("ix_orders_reserved_paid", table_name="orders")
+    op.create_index(
+        "ix_orders_reserved_paid",
+        "orders",
+        ["paid_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'RESERVED' AND tx_hash IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_orders_reserved_paid", table_name="orders")
+    op.create_index(
+        "ix_orders_reserved_paid",
+        "orders",
+        ["timestamp"],
+        unique=False,
+        postgresql_where=sa.text("status = 'RESERVED' AND tx_hash IS NOT NULL"),
+    )
+    op.drop_column("orders", "paid_at")
@@ -0,0 +1,73 @@
+"""Large order jobs
+
+Queue large-order fills durably so a fill interrupted by a restart is resumed
+by a worker instead of being left partly reserved.
+
+Revision ID: f7a3b9d2c640
+Revises: 6c2d8f4a1e39
+Create Date: 2026-10-17 01:00:00.000000
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f7a3b9d2c640"
+down_revision: Union[str, Sequence[str], None] = "6c2d8f4a1e39"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    job_state = postgresql.ENUM("QUEUED", "DONE", "FAILED", name="largeorderjobstate")
+    job_state.create(op.get_bind())
+
+    op.create_table(
+        "large_order_jobs",
+        sa.Column("order_id", sa.String(36), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="largeorderjobstate", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.order_id"]),
+        sa.PrimaryKeyConstraint("order_id"),
+    )
+    op.create_index(
+        "ix_large_order_jobs_queued_run_at",
+        "large_order_jobs",
+        ["run_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'QUEUED'"),
+    )
+
+    # Large orders still being reserved are resumed by the new workers
+    op.execute(
+        """
+        INSERT INTO large_order_jobs (
+            order_id, status, attempts, run_at, created_at, updated_at
+        )
+        SELECT order_id, 'QUEUED', 0, now(), now(), now()
+        FROM orders
+        WHERE status = 'RESERVING'
+    """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_large_order_jobs_queued_run_at", table_name="large_order_jobs")
+    op.drop_table("large_order_jobs")
+    postgresql.ENUM(name="largeorderjobstate").drop(op.get_bind())
@@ -13,10 +13,14 @@ from sqlmodel import select, text
 from app.config import settings
 from app.database import get_session
 from app.models.allowances import Allowance
+from app.services.alchemy import alchemy_service
+from app.services.history import history_service
+from app.services.order_events import order_event_bus
+from app.services.payment_jobs import payment_job_service
 from app.utils.retry import (
     alchemy_circuit_breaker,
+    price_api_circuit_breaker,
     thirdweb_circuit_breaker,
-    price_api_circuit_breaker
 )
 
 logger = logging.getLogger(__name__)
@@ -87,6 +91,12 @@ async def detailed_health_check():
         }
     }
     
+    # Chain data cache effectiveness
+    health_status["checks"]["chain_cache"] = alchemy_service.cache_stats()
+    health_status["checks"]["used_tx_hash_cache"] = payment_job_service.used_hashes.stats()
+    health_status["checks"]["order_events"] = order_event_bus.stats()
+    health_status["checks"]["history_cache"] = history_service.page_cache.stats()
+
     # External service checks (quick pings)
     external_checks = await asyncio.gather(
         _check_alchemy_health(),
@@ -1,27 +1,71 @@
+import asyncio
 import logging
+from datetime import datetime
+from typing import Optional
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    status,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from app.config import settings
 from app.database import get_session
 from app.middleware.rate_limit import limiter
-from app.models.allowances import Allowance, AllowanceStatus
+from app.models.allowances import AllowanceStatus
+from app.models.orders import Order, OrderState
 from app.schemas.retirements import (
+    BatchMode,
+    BatchRetirementRequest,
+    BatchRetirementResponse,
+    BatchRetirementResult,
     ConfirmPaymentRequest,
     ConfirmPaymentResponse,
     HistoryResponse,
+    InventoryResponse,
+    LargeRetirementRequest,
+    LargeRetirementResponse,
     OrderStatus,
     OrderStatusResponse,
+    PaymentQuote,
     RetirementRequest,
     RetirementResponse,
+    WalletRetirementsResponse,
 )
 from app.services.background_manager import background_manager
 from app.services.blockchain import blockchain_service
-from app.services.payment_validator import payment_validator
+from app.services.history import InvalidCursorError, history_service
+from app.services.idempotency import (
+    IdempotencyInProgressError,
+    IdempotencyKeyReuseError,
+    idempotency_service,
+)
+from app.services.inventory import (
+    InsufficientInventoryError,
+    ReservationConflictError,
+    inventory_service,
+)
+from app.services.large_orders import large_order_service
+from app.services.order_events import OrderEvent, order_event_bus
+from app.services.payment_jobs import TransactionReplayError, payment_job_service
 from app.services.price_service import price_service
+from app.services.retirement_export import (
+    ExportFormat,
+    ExportUnavailableError,
+    retirement_export_service,
+)
 from app.services.reward_calculator import reward_calculator
+from app.utils.serials import SerialFormat, format_serials, negotiate_serial_format
 
 router = APIRouter(prefix="/retirements", tags=["retirements"])
 logger = logging.getLogger(__name__)
@@ -34,10 +78,11 @@ async def get_payment_estimate(
 ):
     """Get payment estimate for given number of allowances."""
     try:
-        if num_allowances < 1 or num_allowances > 99:
+        max_allowances = large_order_service.max_allowances
+        if num_allowances < 1 or num_allowances > max_allowances:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Number of allowances must be between 1 and 99"
+                detail=f"Number of allowances must be between 1 and {max_allowances}"
             )
         
         # Get payment estimate
@@ -74,62 +119,350 @@ async def get_payment_estimate(
         ) from e
 
 
+@router.get("/inventory", response_model=InventoryResponse)
+@limiter.limit("60/minute")
+async def get_inventory(
+    request: Request, session: AsyncSession = Depends(get_session)
+):
+    """Get remaining allowance stock from the maintained inventory counters"""
+    try:
+        counts = await inventory_service.count_by_status(session)
+
+        return InventoryResponse(
+            available=counts[AllowanceStatus.AVAILABLE.value],
+            reserved=counts[AllowanceStatus.RESERVED.value],
+            retired=counts[AllowanceStatus.RETIRED.value],
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get inventory: {str(e)}",
+        ) from e
+
+
 @router.post("/", response_model=RetirementResponse)
 @limiter.limit("5/minute")
 async def create_retirement(
     request: Request,
     retirement_request: RetirementRequest,
     session: AsyncSession = Depends(get_session),
+    idempotency_key: Optional[str] = Header(
+        default=None, alias="Idempotency-Key", max_length=255
+    ),
 ):
-    """Reserve allowances for retirement"""
+    """Reserve allowances for retirement, locking in the ETH amount to pay"""
     try:
-        # Find and lock available allowances
-        stmt = (
-            select(Allowance)
-            .where(Allowance.status == AllowanceStatus.AVAILABLE)
-            .limit(retirement_request.num_allowances)
-            .with_for_update(skip_locked=True)
+        # A retried request replays the stored response instead of reserving again
+        if idempotency_key:
+            record = await idempotency_service.claim(
+                session,
+                idempotency_key,
+                "create_retirement",
+                retirement_request.model_dump_json(),
+            )
+            if record:
+                return idempotency_service.replay(record)
+
+        # Priced before any inventory row is locked, and never for a replay;
+        # the quote is stored with the order
+        [quote] = await price_service.quote_payments([retirement_request.num_allowances])
+
+        # Generate order ID and reserve allowances in a single statement
+        order_id = uuid4()
+
+        await inventory_service.reserve(
+            session,
+            order_id=str(order_id),
+            quantity=retirement_request.num_allowances,
+            wallet=retirement_request.wallet,
+            message=retirement_request.message,
+            quote=quote,
+        )
+        await order_event_bus.publish(
+            session, str(order_id), OrderState.RESERVED, OrderEvent.RESERVED
         )
 
-        result = await session.execute(stmt)
-        allowances = result.scalars().all()
+        response = JSONResponse(
+            content=jsonable_encoder(
+                RetirementResponse(
+                    order_id=order_id,
+                    quote=PaymentQuote(**quote) if quote else None,
+                )
+            )
+        )
+        if idempotency_key:
+            await idempotency_service.store(
+                session, idempotency_key, "create_retirement", response
+            )
+
+        await session.commit()
+
+        return response
+
+    except IdempotencyKeyReuseError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e),
+        ) from e
+    except IdempotencyInProgressError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        ) from e
+    except InsufficientInventoryError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+    except ReservationConflictError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Allowances are busy, please retry: {str(e)}",
+        ) from e
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reserve allowances: {str(e)}",
+        ) from e
 
-        if len(allowances) < retirement_request.num_allowances:
+
+@router.post("/batch", response_model=BatchRetirementResponse)
+@limiter.limit("5/minute")
+async def create_retirement_batch(
+    request: Request,
+    batch_request: BatchRetirementRequest,
+    session: AsyncSession = Depends(get_session),
+    idempotency_key: Optional[str] = Header(
+        default=None, alias="Idempotency-Key", max_length=255
+    ),
+):
+    """Reserve allowances for many wallets in one transaction"""
+    try:
+        if idempotency_key:
+            record = await idempotency_service.claim(
+                session,
+                idempotency_key,
+                "create_retirement_batch",
+                batch_request.model_dump_json(),
+            )
+            if record:
+                return idempotency_service.replay(record)
+
+        quotes = await price_service.quote_payments(
+            [entry.num_allowances for entry in batch_request.entries]
+        )
+
+        order_ids = [uuid4() for _ in batch_request.entries]
+
+        reserved = await inventory_service.reserve_batch(
+            session,
+            [
+                {
+                    "order_id": str(order_id),
+                    "quantity": entry.num_allowances,
+                    "wallet": entry.wallet,
+                    "message": entry.message,
+                    "quote": quote,
+                }
+                for order_id, entry, quote in zip(
+                    order_ids, batch_request.entries, quotes
+                )
+            ],
+            all_or_nothing=batch_request.mode == BatchMode.ALL_OR_NOTHING,
+        )
+        await order_event_bus.publish_many(
+            session, sorted(reserved), OrderState.RESERVED, OrderEvent.RESERVED
+        )
+
+        results = [
+            BatchRetirementResult(
+                wallet=entry.wallet,
+                num_allowances=entry.num_allowances,
+                reserved=str(order_id) in reserved,
+                order_id=order_id if str(order_id) in reserved else None,
+                quote=(
+                    PaymentQuote(**quote) if quote and str(order_id) in reserved else None
+                ),
+                error=None if str(order_id) in reserved else "Insufficient allowances",
+            )
+            for order_id, entry, quote in zip(order_ids, batch_request.entries, quotes)
+        ]
+
+        response = JSONResponse(
+            content=jsonable_encoder(
+                BatchRetirementResponse(
+                    results=results,
+                    reserved=len(reserved),
+                    failed=len(results) - len(reserved),
+                )
+            )
+        )
+        if idempotency_key:
+            await idempotency_service.store(
+                session, idempotency_key, "create_retirement_batch", response
+            )
+
+        await session.commit()
+
+        logger.info(
+            f"Batch reservation | mode={batch_request.mode.value} | "
+            f"entries={len(results)} | reserved={len(reserved)}"
+        )
+
+        return response
+
+    except IdempotencyKeyReuseError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e),
+        ) from e
+    except IdempotencyInProgressError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        ) from e
+    except InsufficientInventoryError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+    except ReservationConflictError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Allowances are busy, please retry: {str(e)}",
+        ) from e
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reserve allowances: {str(e)}",
+        ) from e
+
+
+@router.post(
+    "/large",
+    response_model=LargeRetirementResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+@limiter.limit("5/minute")
+async def create_large_retirement(
+    request: Request,
+    retirement_request: LargeRetirementRequest,
+    session: AsyncSession = Depends(get_session),
+    idempotency_key: Optional[str] = Header(
+        default=None, alias="Idempotency-Key", max_length=255
+    ),
+):
+    """Start reserving a large order in chunks; poll the status endpoint for progress"""
+    try:
+        if retirement_request.num_allowances > large_order_service.max_allowances:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Only {len(allowances)} allowances available, but {retirement_request.num_allowances} requested",
+                detail=(
+                    f"Number of allowances must be between 1 and "
+                    f"{large_order_service.max_allowances}"
+                ),
+            )
+
+        if idempotency_key:
+            record = await idempotency_service.claim(
+                session,
+                idempotency_key,
+                "create_large_retirement",
+                retirement_request.model_dump_json(),
             )
+            if record:
+                return idempotency_service.replay(record)
+
+        [quote] = await price_service.quote_payments([retirement_request.num_allowances])
 
-        # Generate order ID and reserve allowances
         order_id = uuid4()
 
-        for allowance in allowances:
-            allowance.status = AllowanceStatus.RESERVED
-            allowance.order_id = str(order_id)
-            allowance.wallet = retirement_request.wallet
-            allowance.message = retirement_request.message
+        await large_order_service.create(
+            session,
+            order_id=str(order_id),
+            quantity=retirement_request.num_allowances,
+            wallet=retirement_request.wallet,
+            message=retirement_request.message,
+            quote=quote,
+        )
+        await order_event_bus.publish(
+            session, str(order_id), OrderState.RESERVING, OrderEvent.RESERVING
+        )
+
+        response = JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(
+                LargeRetirementResponse(
+                    order_id=order_id,
+                    num_allowances=retirement_request.num_allowances,
+                    quote=PaymentQuote(**quote) if quote else None,
+                )
+            ),
+        )
+        if idempotency_key:
+            await idempotency_service.store(
+                session, idempotency_key, "create_large_retirement", response
+            )
 
+        # The order and its fill job commit together; a worker fills it
         await session.commit()
 
-        return RetirementResponse(order_id=order_id)
+        return response
 
+    except HTTPException:
+        raise
+    except IdempotencyKeyReuseError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e),
+        ) from e
+    except IdempotencyInProgressError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        ) from e
+    except InsufficientInventoryError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
     except Exception as e:
         await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to reserve allowances: {str(e)}",
+            detail=f"Failed to start reservation: {str(e)}",
         ) from e
 
 
-@router.post("/confirm", response_model=ConfirmPaymentResponse)
+@router.post(
+    "/confirm",
+    response_model=ConfirmPaymentResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 @limiter.limit("5/minute")
 async def confirm_payment(
     request: Request,
     confirm_request: ConfirmPaymentRequest,
-    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_session),
+    idempotency_key: Optional[str] = Header(
+        default=None, alias="Idempotency-Key", max_length=255
+    ),
 ):
-    """Confirm payment was sent for an order with enhanced validation"""
+    """Accept a payment for an order; it is validated and fulfilled by a worker"""
     order_id = str(confirm_request.order_id)
     tx_hash = confirm_request.tx_hash
     
@@ -140,107 +473,98 @@ async def confirm_payment(
     )
     
     try:
+        # A retried confirmation replays the stored response
+        if idempotency_key:
+            record = await idempotency_service.claim(
+                session,
+                idempotency_key,
+                "confirm_payment",
+                confirm_request.model_dump_json(),
+            )
+            if record:
+                return idempotency_service.replay(record)
+
+        # A transaction already used by another order is turned away up front
+        await payment_job_service.check_replay(session, order_id, tx_hash)
+
         # Verify order exists and is in reserved status
-        stmt = select(Allowance).where(Allowance.order_id == order_id)
+        stmt = select(Order).where(Order.order_id == order_id).with_for_update()
         result = await session.execute(stmt)
-        allowances = result.scalars().all()
+        order = result.scalar_one_or_none()
 
-        if not allowances:
+        if not order:
             logger.error(f"CRITICAL: Order not found | order_id={order_id}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
             )
 
-        first_allowance = allowances[0]
-        if first_allowance.status != AllowanceStatus.RESERVED:
+        if order.status != OrderState.RESERVED:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Order is not in reserved status: {first_allowance.status}"
+                detail=f"Order is not in reserved status: {order.status}"
             )
 
         # Check for duplicate transaction hash
-        if first_allowance.tx_hash:
+        if order.tx_hash:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Payment already confirmed for this order"
             )
 
-        num_allowances = len(allowances)
-        tx_hash = confirm_request.tx_hash
-
-        # Enhanced payment validation
-        logger.info(
-            f"CRITICAL: Starting payment validation | "
-            f"order_id={order_id} | tx_hash={tx_hash} | "
-            f"num_allowances={num_allowances} | wallet={first_allowance.wallet}"
-        )
-        
-        validation_result = await payment_validator.validate_payment_transaction(
-            tx_hash=tx_hash,
-            num_allowances=num_allowances
-        )
-
-        if not validation_result["success"]:
-            logger.error(
-                f"CRITICAL: Payment validation failed | "
-                f"order_id={order_id} | tx_hash={tx_hash} | "
-                f"error={validation_result.get('error')}"
-            )
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Payment validation failed: {validation_result.get('error')}",
-            )
-
-        if not validation_result.get("valid", False):
-            # Handle pending transactions
-            if validation_result.get("status") == "pending":
-                raise HTTPException(
-                    status_code=status.HTTP_202_ACCEPTED,
-                    detail="Transaction is pending confirmation. Please wait and try again.",
-                )
-            else:
+        # Validation and fulfilment run on the payment job queue
+        if not await payment_job_service.enqueue(session, order_id, tx_hash):
+            job = await payment_job_service.get_job(session, order_id)
+            if not job or job.tx_hash != tx_hash:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid payment: {validation_result.get('error')}",
+                    detail="Payment already confirmed for this order"
                 )
+        else:
+            # The transaction timeout runs from the payment, not the reservation
+            order.paid_at = datetime.utcnow()
+            await order_event_bus.publish(
+                session, order_id, OrderState.RESERVED, OrderEvent.PAYMENT_QUEUED
+            )
 
-        # Store transaction hash and payment details in database
-        for allowance in allowances:
-            allowance.tx_hash = confirm_request.tx_hash
+        response = JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(ConfirmPaymentResponse()),
+        )
+        if idempotency_key:
+            await idempotency_service.store(
+                session, idempotency_key, "confirm_payment", response
+            )
 
         await session.commit()
         
         logger.info(
-            f"CRITICAL: Payment confirmed and stored | "
+            f"CRITICAL: Payment queued for validation | "
             f"order_id={order_id} | tx_hash={tx_hash} | "
-            f"wallet={first_allowance.wallet} | num_allowances={num_allowances} | "
-            f"triggering_background_processing=True"
+            f"wallet={order.wallet} | num_allowances={order.num_allowances}"
         )
 
-        # Trigger background payment processing
-        background_tasks.add_task(
-            background_manager.process_payment_background,
-            order_id
-        )
-
-        # Get payment details for response
-        payment_details = validation_result.get("payment_details", {})
-        
-        return {
-            "message": "Payment confirmed and verified successfully",
-            "status": "processing",
-            "order_id": str(confirm_request.order_id),
-            "payment_details": {
-                "tx_hash": tx_hash,
-                "amount_eth": payment_details.get("amount_eth"),
-                "block_number": payment_details.get("block_number"),
-                "num_allowances": num_allowances
-            },
-            "next_steps": "Your allowances are being retired and reward tokens are being distributed. Check order status for updates."
-        }
+        return response
 
     except HTTPException:
         raise
+    except IdempotencyKeyReuseError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e),
+        ) from e
+    except IdempotencyInProgressError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        ) from e
+    except TransactionReplayError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
     except Exception as e:
         await session.rollback()
         raise HTTPException(
@@ -249,52 +573,136 @@ async def confirm_payment(
         ) from e
 
 
+def _order_status(order: Order) -> OrderStatus:
+    """Map an order's stored state to the status shown to buyers."""
+    if order.status == OrderState.RESERVING:
+        return OrderStatus.RESERVING
+    if order.status == OrderState.RESERVED:
+        if order.distribution_started_at:
+            return OrderStatus.DISTRIBUTING
+        if order.tx_hash:
+            return OrderStatus.PAID_BUT_NOT_RETIRED
+        return OrderStatus.PENDING
+    if order.status == OrderState.RETIRED:
+        return OrderStatus.COMPLETED
+    return OrderStatus.ERROR
+
+
+def _order_version(updated_at: datetime) -> int:
+    """Monotonic version of an order's status; every transition bumps updated_at."""
+    return int((updated_at - datetime(1970, 1, 1)).total_seconds() * 1_000_000)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (
+        candidate.removeprefix("W/") for candidate in candidates
+    )
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"},
+    )
+
+
+def _serial_format(
+    serials: Optional[SerialFormat] = Query(
+        default=None,
+        description="'ranges' collapses consecutive serial numbers into 'start-end'",
+    ),
+    accept: Optional[str] = Header(default=None),
+) -> SerialFormat:
+    """Serial representation asked for by ``?serials=`` or ``Accept: ...; serials=``."""
+    return negotiate_serial_format(serials, accept)
+
+
+def _variant_etag(tag: str, serial_format: SerialFormat) -> str:
+    """ETag of one serial representation of a resource."""
+    if serial_format == SerialFormat.LIST:
+        return f'"{tag}"'
+    return f'"{tag}-{serial_format.value}"'
+
+
+async def _order_status_response(
+    session: AsyncSession,
+    order: Order,
+    serial_format: SerialFormat = SerialFormat.LIST,
+) -> OrderStatusResponse:
+    """Build the status response of an order."""
+    status_value = _order_status(order)
+
+    # Serial numbers are only needed once the order is retired
+    serial_numbers = None
+    if status_value == OrderStatus.COMPLETED:
+        allowance_ranges = await inventory_service.get_order_ranges(
+            session, order.order_id
+        )
+        serial_numbers = format_serials(
+            [(r.start_serial, r.end_serial) for r in allowance_ranges], serial_format
+        )
+
+    return OrderStatusResponse(
+        order_id=order.order_id,
+        status=status_value,
+        serial_numbers=serial_numbers,
+        message=order.message,
+        tx_hash=order.tx_hash,
+        reward_tx_hash=order.reward_tx_hash,
+        num_allowances=(
+            order.num_allowances if status_value == OrderStatus.RESERVING else None
+        ),
+        reserved_allowances=(
+            order.num_reserved if status_value == OrderStatus.RESERVING else None
+        ),
+    )
+
+
 @router.get("/status/{order_id}", response_model=OrderStatusResponse)
 @limiter.limit("10/minute")
 async def get_order_status(
-    request: Request, order_id: UUID, session: AsyncSession = Depends(get_session)
+    request: Request,
+    response: Response,
+    order_id: UUID,
+    session: AsyncSession = Depends(get_session),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    serial_format: SerialFormat = Depends(_serial_format),
 ):
-    """Get the status of an order"""
+    """Get the status of an order; polls with a current ETag get a 304"""
     try:
-        stmt = select(Allowance).where(Allowance.order_id == str(order_id))
-        result = await session.execute(stmt)
-        allowances = result.scalars().all()
+        # Revalidation costs one primary key lookup of the order's version
+        updated_at = (
+            await session.execute(
+                select(Order.updated_at).where(Order.order_id == str(order_id))
+            )
+        ).scalar_one_or_none()
 
-        if not allowances:
+        if updated_at is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
             )
 
-        # Determine status based on allowance states
-        first_allowance = allowances[0]
-
-        # Determine status based on allowance state and transaction hashes
-        if first_allowance.status == AllowanceStatus.RESERVED:
-            if first_allowance.tx_hash and first_allowance.reward_tx_hash:
-                status_value = OrderStatus.PAID_BUT_NOT_RETIRED
-            elif first_allowance.tx_hash:
-                status_value = OrderStatus.PAID_BUT_NOT_RETIRED
-            else:
-                status_value = OrderStatus.PENDING
-        elif first_allowance.status == AllowanceStatus.RETIRED:
-            status_value = OrderStatus.COMPLETED
-        else:
-            status_value = OrderStatus.ERROR
+        etag = _variant_etag(str(_order_version(updated_at)), serial_format)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
 
-        serial_numbers = (
-            [a.serial_number for a in allowances]
-            if status_value == OrderStatus.COMPLETED
-            else None
-        )
+        order = await session.get(Order, str(order_id))
+
+        if not order:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+            )
 
-        return OrderStatusResponse(
-            order_id=order_id,
-            status=status_value,
-            serial_numbers=serial_numbers,
-            message=first_allowance.message,
-            tx_hash=first_allowance.tx_hash,
-            reward_tx_hash=first_allowance.reward_tx_hash,
+        response.headers["ETag"] = _variant_etag(
+            str(_order_version(order.updated_at)), serial_format
         )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept"
+        return await _order_status_response(session, order, serial_format)
 
     except HTTPException:
         raise
@@ -305,83 +713,237 @@ async def get_order_status(
         ) from e
 
 
+TERMINAL_STATUSES = {OrderStatus.COMPLETED, OrderStatus.ERROR}
+
+
+def _sse_event(event_id: int, data: str) -> str:
+    """Format one Server-Sent Event."""
+    return f"id: {event_id}\nevent: status\ndata: {data}\n\n"
+
+
+async def _order_status_events(
+    session: AsyncSession, order_id: str, last_event_id: Optional[int]
+):
+    """
+    Yield a status event for every change of an order until it settles.
+
+    The order is reread whenever the event bus reports a change to it, or every
+    ``order_stream_poll_seconds`` while the bus is disconnected, and the
+    session's connection is handed back to the pool between reads. A comment
+    line is sent after ``order_stream_keepalive_seconds`` without events so
+    proxies keep the connection open, and the stream ends after
+    ``order_stream_max_seconds``; the client then reconnects with Last-Event-ID
+    and misses nothing.
+    """
+    loop = asyncio.get_running_loop()
+    opened_at = last_write = loop.time()
+
+    # Subscribed before the first read so no change slips in between
+    with order_event_bus.subscribe(order_id) as events:
+        yield f"retry: {settings.order_stream_retry_ms}\n\n"
+
+        while True:
+            order = await session.get(Order, order_id, populate_existing=True)
+            if not order:
+                return
+
+            version = _order_version(order.updated_at)
+            settled = _order_status(order) in TERMINAL_STATUSES
+            if last_event_id is None or version > last_event_id:
+                response = await _order_status_response(session, order)
+                yield _sse_event(version, response.model_dump_json())
+                last_event_id = version
+                last_write = loop.time()
+            await session.rollback()
+
+            if settled or loop.time() - opened_at >= settings.order_stream_max_seconds:
+                return
+
+            timeout = min(
+                settings.order_stream_keepalive_seconds - (loop.time() - last_write),
+                settings.order_stream_max_seconds - (loop.time() - opened_at),
+            )
+            if not order_event_bus.connected:
+                timeout = min(timeout, settings.order_stream_poll_seconds)
+            try:
+                await asyncio.wait_for(events.get(), max(timeout, 0))
+                # One reread covers every change queued so far
+                while not events.empty():
+                    events.get_nowait()
+            except asyncio.TimeoutError:
+                pass
+
+            if loop.time() - last_write >= settings.order_stream_keepalive_seconds:
+                yield ": keepalive\n\n"
+                last_write = loop.time()
+
+
+@router.get("/status/{order_id}/stream")
+@limiter.limit("10/minute")
+async def stream_order_status(
+    request: Request,
+    order_id: UUID,
+    session: AsyncSession = Depends(get_session),
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+):
+    """Stream status changes of an order as Server-Sent Events until it settles"""
+    try:
+        order = await session.get(Order, str(order_id))
+
+        if not order:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+            )
+
+        resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+        # A client that already saw the final status is told not to reconnect
+        if (
+            resume_from is not None
+            and resume_from >= _order_version(order.updated_at)
+            and _order_status(order) in TERMINAL_STATUSES
+        ):
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+        await session.rollback()
+
+        return StreamingResponse(
+            _order_status_events(session, str(order_id), resume_from),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to stream order status: {str(e)}",
+        ) from e
+
+
 @router.get("/history", response_model=HistoryResponse)
 @limiter.limit("30/minute")
 async def get_retirement_history(
     request: Request,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, max_length=200),
     session: AsyncSession = Depends(get_session),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    serial_format: SerialFormat = Depends(_serial_format),
 ):
-    """Get history of retired allowances grouped by retirement orders"""
+    """Get history of retired allowances grouped by retirement orders, paged by offset or cursor"""
     try:
-        # Get all retired allowances grouped by order_id
-        stmt = (
-            select(Allowance)
-            .where(Allowance.status == AllowanceStatus.RETIRED, Allowance.order_id.is_not(None))
-            .order_by(Allowance.updated_at.desc())
+        # Read before the rows: a page is never older than its ETag claims
+        version = await inventory_service.retirement_version(session)
+        etag = _variant_etag(f"retirements-{version}", serial_format)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+        # Pages are cached already serialized, until the next retirement
+        body = await history_service.get_page_json(
+            version, limit, offset, cursor, serial_format
         )
-        
-        result = await session.execute(stmt)
-        all_retired_allowances = result.scalars().all()
-        
-        # Group allowances by order_id
-        orders_dict = {}
-        for allowance in all_retired_allowances:
-            order_id = allowance.order_id
-            if order_id not in orders_dict:
-                orders_dict[order_id] = {
-                    "allowances": [],
-                    "timestamp": allowance.updated_at,
-                    "message": allowance.message,
-                    "wallet": allowance.wallet,
-                    "reward_tx_hash": allowance.reward_tx_hash
-                }
-            orders_dict[order_id]["allowances"].append(allowance)
-            
-            # Use the most recent timestamp for the order
-            if allowance.updated_at > orders_dict[order_id]["timestamp"]:
-                orders_dict[order_id]["timestamp"] = allowance.updated_at
-
-        # Sort orders by timestamp (most recent first) and apply pagination
-        sorted_orders = sorted(
-            orders_dict.items(), 
-            key=lambda x: x[1]["timestamp"], 
-            reverse=True
+
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"},
         )
-        
-        total_orders = len(sorted_orders)
-        paginated_orders = sorted_orders[offset:offset + limit]
-
-        # Build history items
-        history_items = []
-        for order_id, order_data in paginated_orders:
-            # Generate Etherscan link for reward transaction
-            etherscan_link = None
-            if order_data["reward_tx_hash"]:
-                etherscan_link = f"https://sepolia.etherscan.io/tx/{order_data['reward_tx_hash']}"
-            
-            # Collect all serial numbers for this order
-            serial_numbers = [allowance.serial_number for allowance in order_data["allowances"]]
-            
-            history_items.append({
-                "serial_numbers": serial_numbers,
-                "message": order_data["message"],
-                "wallet": order_data["wallet"],
-                "timestamp": order_data["timestamp"].isoformat(),
-                "etherscan_link": etherscan_link,
-                "order_id": order_id
-            })
-
-        return HistoryResponse(
+
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get retirement history: {str(e)}",
+        ) from e
+
+
+@router.get("/wallet/{address}", response_model=WalletRetirementsResponse)
+@limiter.limit("30/minute")
+async def get_wallet_retirements(
+    request: Request,
+    response: Response,
+    address: str = Path(..., pattern=r"^0x[0-9a-fA-F]{40}$"),
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None, max_length=200),
+    session: AsyncSession = Depends(get_session),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    serial_format: SerialFormat = Depends(_serial_format),
+):
+    """Get one wallet's retirement orders, paged by cursor, with its running totals"""
+    try:
+        # Read before the rows: a page is never older than its ETag claims
+        version = await inventory_service.retirement_version(session)
+        etag = _variant_etag(f"retirements-{version}", serial_format)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept"
+
+        history_items, totals, next_cursor = await history_service.get_wallet_page(
+            session, address, limit, cursor, serial_format
+        )
+
+        return WalletRetirementsResponse(
+            wallet=address.lower(),
             retirements=history_items,
-            total=total_orders
+            total=totals["retirements"],
+            tons_retired=totals["tons_retired"],
+            pr_earned=totals["pr_earned"],
+            first_retired_at=totals["first_retired_at"],
+            last_retired_at=totals["last_retired_at"],
+            next_cursor=next_cursor,
         )
 
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get retirement history: {str(e)}",
+            detail=f"Failed to get wallet retirements: {str(e)}",
+        ) from e
+
+
+@router.get("/export")
+@limiter.limit("5/minute")
+async def export_retirements(
+    request: Request,
+    format: ExportFormat = Query(default=ExportFormat.NDJSON),
+    session: AsyncSession = Depends(get_session),
+):
+    """Stream every completed retirement as NDJSON, CSV or Parquet"""
+    try:
+        retirement_export_service.check_available(format)
+
+        return StreamingResponse(
+            retirement_export_service.stream(session, format),
+            media_type=retirement_export_service.media_type(format),
+            headers={
+                "Content-Disposition": f'attachment; filename="retirements.{format.value}"',
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            },
+        )
+
+    except ExportUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e),
+        ) from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to export retirements: {str(e)}",
         ) from e
 
 
@@ -423,3 +985,16 @@ async def trigger_transaction_check_now(request: Request):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to trigger transaction check: {str(e)}",
         ) from e
+
+
+@router.post("/admin/run-payment-jobs-now")
+async def trigger_payment_jobs_now(request: Request):
+    """Manually run due payment jobs (admin endpoint)."""
+    try:
+        result = await background_manager.run_payment_jobs_now()
+        return result
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to run payment jobs: {str(e)}",
+        ) from e
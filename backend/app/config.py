@@ -54,6 +54,10 @@ class Settings(BaseSettings):
     min_confirmations: int = Field(
         default=1, description="Minimum confirmations before processing payment"
     )
+    distribution_stall_minutes: int = Field(
+        default=30,
+        description="Minutes after claiming a token distribution before an unfinished one is reported",
+    )
     
     # Payment Processing
     price_slippage_tolerance: float = Field(
@@ -62,6 +66,117 @@ class Settings(BaseSettings):
     max_payment_retries: int = Field(
         default=3, description="Maximum retries for failed payments"
     )
+    price_quote_ttl_minutes: int = Field(
+        default=15, description="How long the ETH amount quoted at reservation holds"
+    )
+    eth_price_cache_seconds: float = Field(
+        default=30.0, description="How long a fetched ETH price is reused for quotes"
+    )
+    idempotency_key_ttl_hours: int = Field(
+        default=24, description="How long Idempotency-Key responses are replayed"
+    )
+
+    # Allocation buckets
+    allocation_buckets: int = Field(
+        default=16, description="Buckets free serials are spread over for concurrent checkouts"
+    )
+    bucket_min_chunk_size: int = Field(
+        default=50, description="Fewest serials dealt to a bucket at a time when rebucketing"
+    )
+
+    # Payment job queue
+    payment_job_poll_seconds: int = Field(
+        default=2, description="How often workers look for due payment jobs"
+    )
+    payment_job_batch_size: int = Field(
+        default=10, description="Payment jobs leased by a worker per poll"
+    )
+    payment_job_max_attempts: int = Field(
+        default=20, description="Attempts before a payment job is given up"
+    )
+    payment_job_retry_base_seconds: float = Field(
+        default=5.0, description="Delay before the first retry; doubles per attempt"
+    )
+    payment_job_retry_max_seconds: float = Field(
+        default=120.0, description="Longest delay between payment job attempts"
+    )
+    payment_job_visibility_timeout_seconds: int = Field(
+        default=600, description="How long a leased job is hidden from other workers"
+    )
+    used_tx_hash_cache_max_entries: int = Field(
+        default=10000, description="Replayed transaction hashes remembered in memory"
+    )
+    used_tx_hash_cache_seconds: float = Field(
+        default=300.0, description="How long a replayed hash is rejected from memory"
+    )
+
+    # Chain data cache
+    chain_cache_max_entries: int = Field(
+        default=10000, description="Transactions and receipts kept in memory each"
+    )
+    chain_cache_pending_ttl_seconds: float = Field(
+        default=5.0, description="How long pending or shallow chain results are reused"
+    )
+    chain_finality_confirmations: int = Field(
+        default=12, description="Confirmations after which chain results are cached for good"
+    )
+
+    # Order status streams
+    order_stream_poll_seconds: float = Field(
+        default=2.0,
+        description="How often a status stream rereads its order while the event bus is down",
+    )
+    order_stream_keepalive_seconds: float = Field(
+        default=15.0, description="Idle time before a status stream sends a keepalive"
+    )
+    order_stream_max_seconds: float = Field(
+        default=600.0, description="How long a status stream stays open before the client reconnects"
+    )
+    order_stream_retry_ms: int = Field(
+        default=3000, description="Reconnect delay suggested to status stream clients"
+    )
+
+    # Order event bus (Postgres LISTEN/NOTIFY)
+    order_events_queue_size: int = Field(
+        default=100, description="Events buffered per subscriber before new ones are dropped"
+    )
+    order_events_reconnect_seconds: float = Field(
+        default=5.0, description="Delay before the event listener reconnects"
+    )
+    order_events_health_check_seconds: float = Field(
+        default=30.0, description="How often the idle event listener checks its connection"
+    )
+
+    # Retirement history
+    history_cache_max_entries: int = Field(
+        default=256, description="Serialized history pages kept in memory per worker"
+    )
+    export_chunk_size: int = Field(
+        default=1000, description="Retirements fetched per round trip by ledger exports"
+    )
+
+    # Large orders
+    max_large_order_allowances: int = Field(
+        default=10000, description="Largest order that can be reserved in chunks"
+    )
+    large_order_chunk_size: int = Field(
+        default=99, description="Serials reserved per chunk of a large order"
+    )
+    large_order_job_poll_seconds: int = Field(
+        default=2, description="How often workers look for due large order fills"
+    )
+    large_order_job_batch_size: int = Field(
+        default=2, description="Large order fills leased by a worker per poll"
+    )
+    large_order_job_max_attempts: int = Field(
+        default=5, description="Attempts before a large order fill is given up"
+    )
+    large_order_job_retry_base_seconds: float = Field(
+        default=5.0, description="Delay before the first fill retry; doubles per attempt"
+    )
+    large_order_job_visibility_timeout_seconds: int = Field(
+        default=60, description="How long a leased fill is hidden; each chunk renews it"
+    )
 
     # Pricing
     allowance_price_usd: float = Field(
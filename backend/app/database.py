@@ -1,4 +1,4 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 
@@ -15,7 +15,18 @@ async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False
 
 async def create_db_and_tables():
     async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await create_tables(conn)
+
+
+async def create_tables(conn: AsyncConnection) -> None:
+    """Create the model tables on a connection, in its first search_path schema."""
+    # View-backed models (e.g. ``allowances``) are created by migrations
+    tables = [
+        table
+        for table in SQLModel.metadata.sorted_tables
+        if not table.info.get("is_view")
+    ]
+    await conn.run_sync(SQLModel.metadata.create_all, tables=tables)
 
 
 async def get_session():
@@ -4,10 +4,9 @@ from fastapi import FastAPI, HTTPException
 from pydantic import ValidationError
 from slowapi.errors import RateLimitExceeded
 
-from app.api.retirements import router as retirements_router
 from app.api.health import router as health_router
+from app.api.retirements import router as retirements_router
 from app.config import settings
-from app.services.background_manager import background_manager
 from app.middleware.audit import AuditMiddleware, setup_audit_logging
 from app.middleware.cors import setup_cors_middleware
 from app.middleware.error_handling import (
@@ -17,16 +16,20 @@ from app.middleware.error_handling import (
 )
 from app.middleware.rate_limit import limiter, rate_limit_exceeded_handler
 from app.middleware.validation import ValidationMiddleware
+from app.services.background_manager import background_manager
+from app.services.order_events import order_event_bus
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan events."""
     # Startup
+    await order_event_bus.start()
     await background_manager.start()
     yield
     # Shutdown
     await background_manager.stop()
+    await order_event_bus.stop()
 
 
 app = FastAPI(
@@ -6,6 +6,8 @@ from datetime import datetime
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.middleware.request_body import read_body
+
 # Configure audit logger
 audit_logger = logging.getLogger("audit")
 audit_logger.setLevel(logging.INFO)
@@ -47,8 +49,7 @@ class AuditMiddleware(BaseHTTPMiddleware):
             user_agent = request.headers.get("user-agent", "Unknown")
 
             # Get request body
-            body = await request.body()
-            request._body = body  # Re-attach for downstream processing
+            body = await read_body(request)
 
             # Hash sensitive data
             body_hash = self._hash_data(body) if body else None
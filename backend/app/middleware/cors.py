@@ -35,11 +35,13 @@ def setup_cors_middleware(app):
             "Origin",
             "Access-Control-Request-Method",
             "Access-Control-Request-Headers",
+            "Idempotency-Key",
         ],
         expose_headers=[
             "X-RateLimit-Limit",
             "X-RateLimit-Remaining",
             "X-RateLimit-Reset",
+            "Idempotent-Replayed",
         ],
         max_age=86400,  # 24 hours
     )
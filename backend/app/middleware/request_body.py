@@ -0,0 +1,25 @@
+from fastapi import Request
+
+
+async def read_body(request: Request) -> bytes:
+    """
+    Read the request body inside a ``BaseHTTPMiddleware`` and keep it readable.
+
+    ``call_next`` hands the endpoint a fresh request that pulls the body from
+    the ASGI ``receive`` channel, which has already been drained here. Setting
+    ``request._body`` alone leaves the endpoint waiting for a message that never
+    arrives, so the body is replayed through ``receive`` as well.
+    """
+    body = await request.body()
+    receive = request._receive
+    replayed = False
+
+    async def replay():
+        nonlocal replayed
+        if replayed:
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request._receive = replay
+    return body
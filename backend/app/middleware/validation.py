@@ -3,6 +3,8 @@ import re
 from fastapi import HTTPException, Request, status
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.middleware.request_body import read_body
+
 
 class ValidationMiddleware(BaseHTTPMiddleware):
     """Middleware for request validation and sanitization"""
@@ -27,13 +29,10 @@ class ValidationMiddleware(BaseHTTPMiddleware):
 
         try:
             # Get request body
-            body = await request.body()
+            body = await read_body(request)
             if not body:
                 return
 
-            # Re-create request with body for downstream processing
-            request._body = body
-
             # Basic content-type validation
             content_type = request.headers.get("content-type", "")
             if "application/json" not in content_type:
@@ -1,3 +1,28 @@
+from .allowance_ranges import AllowanceRange
 from .allowances import Allowance, AllowanceStatus
+from .idempotency import IdempotencyRecord
+from .inventory_counters import InventoryCounter
+from .large_order_jobs import LargeOrderJob, LargeOrderJobState
+from .orders import Order, OrderAllowance, OrderState
+from .payment_jobs import PaymentJob, PaymentJobState
+from .retirement_history import RetirementHistory
+from .retirement_watermark import RetirementWatermark
+from .wallet_retirement_summary import WalletRetirementSummary
 
-__all__ = ["Allowance", "AllowanceStatus"]
+__all__ = [
+    "Allowance",
+    "AllowanceRange",
+    "AllowanceStatus",
+    "IdempotencyRecord",
+    "InventoryCounter",
+    "LargeOrderJob",
+    "LargeOrderJobState",
+    "Order",
+    "OrderAllowance",
+    "OrderState",
+    "PaymentJob",
+    "PaymentJobState",
+    "RetirementHistory",
+    "RetirementWatermark",
+    "WalletRetirementSummary",
+]
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column, Index, text
+from sqlmodel import Field, SQLModel
+
+from .allowances import AllowanceStatus
+
+
+class AllowanceRange(SQLModel, table=True):
+    """A contiguous block of serial numbers sharing one inventory state.
+
+    Serials are stored as inclusive ``[start_serial, end_serial]`` ranges and
+    split whenever only part of a range is reserved, retired or released.
+    Order-level data lives on ``orders``, linked through ``order_allowances``;
+    per-serial readers use the ``allowances`` view over these ranges.
+    Free serials are spread over allocation buckets so concurrent checkouts
+    start on different ranges.
+    """
+
+    __tablename__ = "allowance_ranges"
+    __table_args__ = (
+        # Reservation scans and neighbour merges only ever look at free ranges
+        Index(
+            "ix_allowance_ranges_available_bucket",
+            "bucket",
+            "start_serial",
+            postgresql_where=text("status = 'AVAILABLE'"),
+        ),
+        Index(
+            "ix_allowance_ranges_available_end",
+            "end_serial",
+            postgresql_where=text("status = 'AVAILABLE'"),
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    start_serial: int = Field(sa_column=Column(BigInteger, nullable=False, unique=True))
+    end_serial: int = Field(sa_column=Column(BigInteger, nullable=False))
+    status: AllowanceStatus = Field(default=AllowanceStatus.AVAILABLE, index=True)
+    originating_state: Optional[str] = Field(default=None, max_length=2)
+    allocation_year: Optional[int] = Field(default=None)
+    bucket: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @property
+    def quantity(self) -> int:
+        """Number of serials covered by this range."""
+        return self.end_serial - self.start_serial + 1
+
+    def serial_numbers(self) -> list[str]:
+        """Expand the range into individual serial numbers."""
+        return [str(serial) for serial in range(self.start_serial, self.end_serial + 1)]
@@ -12,7 +12,10 @@ class AllowanceStatus(str, Enum):
 
 
 class Allowance(SQLModel, table=True):
+    """Per-serial view over ``allowance_ranges``, kept for read-only consumers."""
+
     __tablename__ = "allowances"
+    __table_args__ = {"info": {"is_view": True}}
 
     serial_number: str = Field(primary_key=True, max_length=32)
     status: AllowanceStatus = Field(default=AllowanceStatus.AVAILABLE, index=True)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, LargeBinary
+from sqlmodel import Field, SQLModel
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    """A stored response for an ``Idempotency-Key`` on one endpoint."""
+
+    __tablename__ = "idempotency_keys"
+
+    key: str = Field(primary_key=True, max_length=255)
+    scope: str = Field(primary_key=True, max_length=64)
+    request_hash: str = Field(max_length=64)
+    status_code: Optional[int] = Field(default=None)
+    response_body: Optional[bytes] = Field(
+        default=None, sa_column=Column(LargeBinary, nullable=True)
+    )
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
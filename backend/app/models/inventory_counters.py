@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column
+from sqlmodel import Field, SQLModel
+
+from .allowances import AllowanceStatus
+
+
+class InventoryCounter(SQLModel, table=True):
+    """One stripe of the per-status serial count.
+
+    Each status is spread over several slots so concurrent writers rarely
+    update the same row; the count for a status is the sum of its slots.
+    Available serials are counted per allocation bucket, one slot per bucket.
+    """
+
+    __tablename__ = "inventory_counters"
+
+    status: AllowanceStatus = Field(primary_key=True)
+    slot: int = Field(primary_key=True)
+    count: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
@@ -0,0 +1,40 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Index, text
+from sqlmodel import Field, SQLModel
+
+
+class LargeOrderJobState(str, Enum):
+    QUEUED = "QUEUED"  # Waiting to run, or leased by a worker until locked_until
+    DONE = "DONE"
+    FAILED = "FAILED"  # Out of stock or attempts; the order's serials were released
+
+
+class LargeOrderJob(SQLModel, table=True):
+    """A large order waiting to be reserved chunk by chunk by a worker."""
+
+    __tablename__ = "large_order_jobs"
+    __table_args__ = (
+        # Workers only scan jobs that are still queued, oldest due first
+        Index(
+            "ix_large_order_jobs_queued_run_at",
+            "run_at",
+            postgresql_where=text("status = 'QUEUED'"),
+        ),
+    )
+
+    order_id: str = Field(
+        foreign_key="orders.order_id", primary_key=True, max_length=36
+    )
+    status: LargeOrderJobState = Field(default=LargeOrderJobState.QUEUED)
+    attempts: int = Field(default=0)
+    # Not picked up before this time; pushed back after each failed attempt
+    run_at: datetime = Field(default_factory=datetime.utcnow)
+    # Lease of the worker filling the order; an expired lease is taken over
+    # and the fill resumes from the order's num_reserved
+    locked_until: Optional[datetime] = Field(default=None)
+    last_error: Optional[str] = Field(default=None, max_length=500)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
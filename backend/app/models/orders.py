@@ -0,0 +1,67 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Column, Index, Numeric, text
+from sqlmodel import Field, SQLModel
+
+
+class OrderState(str, Enum):
+    RESERVING = "RESERVING"  # Large order still being reserved in chunks
+    RESERVED = "RESERVED"
+    RETIRED = "RETIRED"
+    FAILED = "FAILED"
+    EXPIRED = "EXPIRED"
+
+
+class Order(SQLModel, table=True):
+    """A checkout order; holds the buyer and payment data shared by its serials."""
+
+    __tablename__ = "orders"
+    __table_args__ = (
+        # Stalled large-order cleanup scans orders by state and age
+        Index("ix_orders_status_updated_at", "status", "updated_at"),
+        # The monitor and stuck-order cleanup only look at paid, unretired orders
+        Index(
+            "ix_orders_reserved_paid",
+            "paid_at",
+            postgresql_where=text("status = 'RESERVED' AND tx_hash IS NOT NULL"),
+        ),
+    )
+
+    order_id: str = Field(primary_key=True, max_length=36)
+    status: OrderState = Field(default=OrderState.RESERVED)
+    wallet: Optional[str] = Field(default=None, max_length=42)
+    message: Optional[str] = Field(default=None, max_length=100)
+    num_allowances: int
+    # Serials reserved so far; reaches num_allowances once the order is reserved
+    num_reserved: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # ETH amount locked in at reservation; confirm compares the payment to it
+    quote_wei: Optional[int] = Field(
+        default=None, sa_column=Column(Numeric(78, 0), nullable=True)
+    )
+    quote_source: Optional[str] = Field(default=None, max_length=32)
+    quote_expires_at: Optional[datetime] = Field(default=None)
+    tx_hash: Optional[str] = Field(default=None, max_length=66)
+    # When the payment was submitted; the transaction timeout runs from here
+    paid_at: Optional[datetime] = Field(default=None)
+    reward_tx_hash: Optional[str] = Field(default=None, max_length=66)
+    # Set when the $PR token transfer for a paid order begins
+    distribution_started_at: Optional[datetime] = Field(default=None)
+    # When the serials were reserved; unpaid reservations expire from here
+    timestamp: Optional[datetime] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class OrderAllowance(SQLModel, table=True):
+    """Links an order to the allowance ranges it holds."""
+
+    __tablename__ = "order_allowances"
+
+    order_id: str = Field(
+        foreign_key="orders.order_id", primary_key=True, max_length=36
+    )
+    range_id: int = Field(
+        foreign_key="allowance_ranges.id", primary_key=True, index=True
+    )
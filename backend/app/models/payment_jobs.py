@@ -0,0 +1,41 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Index, text
+from sqlmodel import Field, SQLModel
+
+
+class PaymentJobState(str, Enum):
+    QUEUED = "QUEUED"  # Waiting to run, or leased by a worker until locked_until
+    DONE = "DONE"
+    FAILED = "FAILED"  # Invalid payment or out of attempts; a new confirm requeues it
+
+
+class PaymentJob(SQLModel, table=True):
+    """A confirmed payment waiting to be validated and fulfilled by a worker."""
+
+    __tablename__ = "payment_jobs"
+    __table_args__ = (
+        # Workers only scan jobs that are still queued, oldest due first
+        Index(
+            "ix_payment_jobs_queued_run_at",
+            "run_at",
+            postgresql_where=text("status = 'QUEUED'"),
+        ),
+    )
+
+    order_id: str = Field(
+        foreign_key="orders.order_id", primary_key=True, max_length=36
+    )
+    # Registry of submitted payments: a transaction can pay for one order only
+    tx_hash: str = Field(max_length=66, unique=True, index=True)
+    status: PaymentJobState = Field(default=PaymentJobState.QUEUED)
+    attempts: int = Field(default=0)
+    # Not picked up before this time; pushed back after each failed attempt
+    run_at: datetime = Field(default_factory=datetime.utcnow)
+    # Lease of the worker running the job; an expired lease is taken over
+    locked_until: Optional[datetime] = Field(default=None)
+    last_error: Optional[str] = Field(default=None, max_length=500)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import ARRAY, BigInteger, Column, Index, text
+from sqlmodel import Field, SQLModel
+
+
+class RetirementHistory(SQLModel, table=True):
+    """Read model of one completed retirement, as the public history shows it.
+
+    Written in the transaction that retires the order's serials, so the
+    history never reads orders or ranges. Serials are kept as inclusive
+    ``[start, end]`` pairs in serial order.
+    """
+
+    __tablename__ = "retirement_history"
+    __table_args__ = (
+        # History pages by recency; cursors seek into it
+        Index("ix_retirement_history_completed_at", "completed_at", "order_id"),
+        # One wallet's retirements by recency, whatever the address casing
+        Index(
+            "ix_retirement_history_wallet",
+            text("lower(wallet)"),
+            "completed_at",
+            "order_id",
+        ),
+    )
+
+    order_id: str = Field(
+        foreign_key="orders.order_id", primary_key=True, max_length=36
+    )
+    wallet: Optional[str] = Field(default=None, max_length=42)
+    message: Optional[str] = Field(default=None, max_length=100)
+    reward_tx_hash: Optional[str] = Field(default=None, max_length=66)
+    serial_ranges: list[list[int]] = Field(
+        sa_column=Column(ARRAY(BigInteger, dimensions=2), nullable=False)
+    )
+    num_allowances: int
+    completed_at: datetime
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column
+from sqlmodel import Field, SQLModel
+
+
+class RetirementWatermark(SQLModel, table=True):
+    """Version of the retirement history as a whole.
+
+    A single row whose version is bumped in the transaction of every
+    retirement, so it changes exactly when a retirement becomes visible.
+    """
+
+    __tablename__ = "retirement_watermark"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column
+from sqlmodel import Field, SQLModel
+
+
+class WalletRetirementSummary(SQLModel, table=True):
+    """Running totals of one wallet's completed retirements.
+
+    Kept up to date with retirement_history, in the same statement that adds
+    a retirement to it. Wallets are stored lowercased. Every retired allowance
+    is one ton of CO2 and is rewarded with one $PR.
+    """
+
+    __tablename__ = "wallet_retirement_summaries"
+
+    wallet: str = Field(primary_key=True, max_length=42)
+    retirements: int = Field(default=0)
+    tons_retired: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    pr_earned: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    first_retired_at: datetime
+    last_retired_at: datetime
@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import Optional
 from uuid import UUID
@@ -6,8 +7,10 @@ from pydantic import BaseModel, Field, validator
 
 
 class OrderStatus(str, Enum):
+    RESERVING = "reserving"
     PENDING = "pending"
     PAID_BUT_NOT_RETIRED = "paid_but_not_retired"
+    DISTRIBUTING = "distributing"
     COMPLETED = "completed"
     ERROR = "error"
 
@@ -28,9 +31,69 @@ class RetirementRequest(BaseModel):
         return v.lower()
 
 
+class PaymentQuote(BaseModel):
+    eth_amount_wei: str  # Decimal string; may exceed JavaScript's safe integers
+    eth_amount_formatted: str
+    eth_price_usd: float
+    total_usd: float
+    price_source: str
+    expires_at: datetime  # Payments are checked against the live price after this
+
+    @validator("eth_amount_wei", pre=True)
+    def wei_as_string(cls, v):
+        return str(v)
+
+
 class RetirementResponse(BaseModel):
     order_id: UUID
     message: str = "Allowances reserved successfully"
+    quote: Optional[PaymentQuote] = None  # Amount to pay, locked at reservation
+
+
+class LargeRetirementRequest(RetirementRequest):
+    num_allowances: int = Field(
+        ..., ge=1, description="Number of allowances to retire, reserved in chunks"
+    )
+
+
+class LargeRetirementResponse(BaseModel):
+    order_id: UUID
+    num_allowances: int
+    message: str = "Reservation started"
+    quote: Optional[PaymentQuote] = None
+
+
+class BatchMode(str, Enum):
+    ALL_OR_NOTHING = "all_or_nothing"
+    BEST_EFFORT = "best_effort"
+
+
+class BatchRetirementRequest(BaseModel):
+    entries: list[RetirementRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=50,
+        description="Orders to reserve, in priority order",
+    )
+    mode: BatchMode = Field(
+        BatchMode.ALL_OR_NOTHING,
+        description="Reserve every entry or as many as possible",
+    )
+
+
+class BatchRetirementResult(BaseModel):
+    wallet: str
+    num_allowances: int
+    reserved: bool
+    order_id: Optional[UUID] = None  # Set when the entry was reserved
+    quote: Optional[PaymentQuote] = None  # Set when the entry was reserved
+    error: Optional[str] = None  # Why the entry was not reserved
+
+
+class BatchRetirementResponse(BaseModel):
+    results: list[BatchRetirementResult]  # One per entry, in request order
+    reserved: int  # Entries that got an order
+    failed: int  # Entries left unreserved (best-effort only)
 
 
 class ConfirmPaymentRequest(BaseModel):
@@ -52,16 +115,20 @@ class ConfirmPaymentResponse(BaseModel):
 class OrderStatusResponse(BaseModel):
     order_id: UUID
     status: OrderStatus
-    serial_numbers: Optional[list[str]] = None
+    serial_numbers: Optional[list[str]] = None  # "start-end" runs with ?serials=ranges
     message: Optional[str] = None
     tx_hash: Optional[str] = None
     reward_tx_hash: Optional[str] = None
+    num_allowances: Optional[int] = None  # Set while a large order is reserving
+    reserved_allowances: Optional[int] = None  # Progress of a large order
 
 
 class HistoryItem(BaseModel):
-    serial_numbers: list[str]  # All serial numbers for this retirement order
+    serial_numbers: list[
+        str
+    ]  # All serial numbers, or "start-end" runs with ?serials=ranges
     message: Optional[str] = None  # User's retirement message
-    wallet: str  # User's wallet address
+    wallet: Optional[str] = None  # User's wallet address; unset on some older orders
     timestamp: str  # When the retirement was completed
     etherscan_link: Optional[str] = None  # Link to reward transaction on Etherscan
     order_id: str  # Order ID for reference
@@ -70,6 +137,24 @@ class HistoryItem(BaseModel):
 class HistoryResponse(BaseModel):
     retirements: list[HistoryItem]
     total: int  # Total number of retirement orders (not individual allowances)
+    next_cursor: Optional[str] = None  # Cursor of the next page; None on the last page
+
+
+class WalletRetirementsResponse(BaseModel):
+    wallet: str  # Wallet address, lowercased
+    retirements: list[HistoryItem]  # One page of the wallet's retirement orders
+    total: int  # Retirement orders of the wallet
+    tons_retired: int  # Tons of CO2 retired, one per allowance
+    pr_earned: int  # $PR tokens rewarded, one per allowance
+    first_retired_at: Optional[datetime] = None
+    last_retired_at: Optional[datetime] = None
+    next_cursor: Optional[str] = None  # Cursor of the next page; None on the last page
+
+
+class InventoryResponse(BaseModel):
+    available: int  # Serials that can still be reserved
+    reserved: int  # Serials held by open orders
+    retired: int  # Serials already retired
 
 
 class ErrorResponse(BaseModel):
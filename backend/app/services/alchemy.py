@@ -2,24 +2,99 @@
 
 import asyncio
 import logging
-from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 
 import httpx
 
 from app.config import settings
-from app.utils.retry import retry_external_api, alchemy_circuit_breaker
+from app.utils.cache import MISSING, BoundedTTLCache
+from app.utils.retry import alchemy_circuit_breaker, retry_external_api
 
 logger = logging.getLogger(__name__)
 
 
+class FetchContext:
+    """RPC calls and the HTTP client shared by one request."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.calls: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+_fetch_context: ContextVar[Optional[FetchContext]] = ContextVar(
+    "alchemy_fetch_context", default=None
+)
+
+
 class AlchemyService:
     """Service for interacting with Alchemy API for transaction monitoring."""
 
     def __init__(self):
         self.api_url = settings.alchemy_sepolia_url
         self.timeout = httpx.Timeout(30.0)
+        # Results buried under enough blocks never change and are kept until
+        # evicted; pending and shallow ones are reused only briefly
+        self.pending_ttl = settings.chain_cache_pending_ttl_seconds
+        self.finality_confirmations = settings.chain_finality_confirmations
+        self.receipt_cache = BoundedTTLCache(settings.chain_cache_max_entries)
+        self.transaction_cache = BoundedTTLCache(settings.chain_cache_max_entries)
+        self.block_number_cache = BoundedTTLCache(1)
+
+    @asynccontextmanager
+    async def fetch_context(self):
+        """
+        Scope RPCs to one request or unit of work.
+
+        Inside the context each (method, tx hash) RPC is sent at most once, and
+        concurrent callers share the in-flight call, all over one HTTP client.
+        A nested context reuses the outer one.
+        """
+        context = _fetch_context.get()
+        if context is not None:
+            yield context
+            return
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            context = FetchContext(client)
+            token = _fetch_context.set(context)
+            try:
+                yield context
+            finally:
+                _fetch_context.reset(token)
+                for call in context.calls.values():
+                    call.cancel()
+
+    async def _fetch_once(
+        self, method: str, tx_hash: str, fetch: Callable[[], Awaitable[Optional[Dict]]]
+    ) -> Optional[Dict]:
+        """Run an RPC, or join the identical one already made in this fetch context."""
+        context = _fetch_context.get()
+        if context is None:
+            return await fetch()
+
+        key = (method, tx_hash)
+        call = context.calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fetch())
+            context.calls[key] = call
+        else:
+            logger.debug(f"Reusing {method} result for {tx_hash}")
+        # A cancelled caller must not cancel the call other callers are waiting on
+        return await asyncio.shield(call)
+
+    @asynccontextmanager
+    async def _client(self):
+        """HTTP client of the current fetch context, or a one-off client."""
+        context = _fetch_context.get()
+        if context is not None:
+            yield context.client
+            return
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            yield client
 
-    @retry_external_api(max_retries=3, delay=1.0, context="alchemy_transaction_receipt")
     async def get_transaction_receipt(self, tx_hash: str) -> Optional[Dict]:
         """
         Get transaction receipt from Alchemy with retries and circuit breaker.
@@ -30,6 +105,21 @@ class AlchemyService:
         Returns:
             Transaction receipt dict or None if not found/pending
         """
+        cached = self.receipt_cache.get(tx_hash)
+        if cached is not MISSING:
+            return cached
+
+        receipt = await self._fetch_once(
+            "eth_getTransactionReceipt",
+            tx_hash,
+            lambda: self._fetch_transaction_receipt(tx_hash),
+        )
+        self.receipt_cache.set(tx_hash, receipt, await self._cache_ttl(receipt))
+        return receipt
+
+    @retry_external_api(max_retries=3, delay=1.0, context="alchemy_transaction_receipt")
+    async def _fetch_transaction_receipt(self, tx_hash: str) -> Optional[Dict]:
+        """Send eth_getTransactionReceipt."""
         # Check circuit breaker
         if not alchemy_circuit_breaker.can_execute():
             logger.warning(f"Alchemy circuit breaker is open, skipping transaction receipt check for {tx_hash}")
@@ -49,7 +139,7 @@ class AlchemyService:
         try:
             logger.debug(f"Fetching transaction receipt for {tx_hash}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with self._client() as client:
                 response = await client.post(
                     self.api_url,
                     json=payload,
@@ -158,6 +248,24 @@ class AlchemyService:
 
     async def _get_transaction(self, tx_hash: str) -> Optional[Dict]:
         """Get raw transaction data."""
+        cached = self.transaction_cache.get(tx_hash)
+        if cached is not MISSING:
+            return cached
+
+        transaction = await self._fetch_once(
+            "eth_getTransactionByHash",
+            tx_hash,
+            lambda: self._fetch_transaction(tx_hash),
+        )
+        # A failed lookup is not a result worth keeping
+        if transaction is not None:
+            self.transaction_cache.set(
+                tx_hash, transaction, await self._cache_ttl(transaction)
+            )
+        return transaction
+
+    async def _fetch_transaction(self, tx_hash: str) -> Optional[Dict]:
+        """Send eth_getTransactionByHash."""
         payload = {
             "jsonrpc": "2.0",
             "id": 1,
@@ -170,7 +278,7 @@ class AlchemyService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with self._client() as client:
                 response = await client.post(
                     self.api_url,
                     json=payload,
@@ -193,6 +301,80 @@ class AlchemyService:
             logger.error(f"Error getting transaction {tx_hash}: {str(e)}")
             return None
 
+    async def _cache_ttl(self, result: Optional[Dict]) -> Optional[float]:
+        """
+        How long a transaction or receipt may be reused.
+
+        Returns None (keep until evicted) once the result's block is at least
+        ``finality_confirmations`` deep, otherwise the short pending TTL.
+        """
+        block_hex = result.get("blockNumber") if result else None
+        if not block_hex:
+            return self.pending_ttl
+
+        latest = await self.get_block_number()
+        if latest is None:
+            return self.pending_ttl
+
+        confirmations = latest - int(block_hex, 16) + 1
+        if confirmations >= self.finality_confirmations:
+            return None
+        return self.pending_ttl
+
+    async def get_block_number(self) -> Optional[int]:
+        """Latest block number, reused for the pending TTL."""
+        cached = self.block_number_cache.get("latest")
+        if cached is not MISSING:
+            return cached
+
+        block_number = await self._fetch_once(
+            "eth_blockNumber", "latest", self._fetch_block_number
+        )
+        if block_number is not None:
+            self.block_number_cache.set("latest", block_number, self.pending_ttl)
+        return block_number
+
+    async def _fetch_block_number(self) -> Optional[int]:
+        """Send eth_blockNumber."""
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "eth_blockNumber",
+            "params": []
+        }
+
+        try:
+            async with self._client() as client:
+                response = await client.post(
+                    self.api_url,
+                    json=payload,
+                    headers={"Content-Type": "application/json"}
+                )
+
+                if response.status_code != 200:
+                    logger.error(f"Alchemy API error: {response.status_code} - {response.text}")
+                    return None
+
+                data = response.json()
+
+                if "error" in data:
+                    logger.error(f"Alchemy RPC error: {data['error']}")
+                    return None
+
+                return int(data["result"], 16)
+
+        except Exception as e:
+            logger.error(f"Error getting block number: {str(e)}")
+            return None
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Hit/miss counters of the chain data caches."""
+        return {
+            "receipts": self.receipt_cache.stats(),
+            "transactions": self.transaction_cache.stats(),
+            "block_number": self.block_number_cache.stats(),
+        }
+
     async def verify_payment_transaction(
         self, 
         tx_hash: str, 
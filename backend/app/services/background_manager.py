@@ -1,13 +1,15 @@
 """Background task manager for orchestrating all background services."""
 
-import asyncio
 import logging
 from typing import Dict
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
+from app.config import settings
 from app.services.cleanup_service import cleanup_service
+from app.services.large_orders import large_order_service
+from app.services.payment_jobs import payment_job_service
 from app.services.transaction_monitor import transaction_monitor
 
 logger = logging.getLogger(__name__)
@@ -47,6 +49,24 @@ class BackgroundTaskManager:
                 replace_existing=True
             )
 
+            # Pick up confirmed payments from the job queue
+            self.scheduler.add_job(
+                func=self._run_payment_jobs,
+                trigger=IntervalTrigger(seconds=settings.payment_job_poll_seconds),
+                id="run_payment_jobs",
+                name="Run queued payment jobs",
+                replace_existing=True
+            )
+
+            # Fill large orders from their job queue
+            self.scheduler.add_job(
+                func=self._run_large_order_jobs,
+                trigger=IntervalTrigger(seconds=settings.large_order_job_poll_seconds),
+                id="run_large_order_jobs",
+                name="Fill queued large orders",
+                replace_existing=True
+            )
+
             # Start the scheduler
             self.scheduler.start()
             self.is_running = True
@@ -67,6 +87,8 @@ class BackgroundTaskManager:
             logger.info("Stopping background task manager")
 
             self.scheduler.shutdown(wait=True)
+            await payment_job_service.stop()
+            await large_order_service.stop()
             self.is_running = False
 
             logger.info("Background task manager stopped successfully")
@@ -120,6 +142,26 @@ class BackgroundTaskManager:
         except Exception as e:
             logger.error(f"Error in transaction monitoring: {str(e)}")
 
+    async def _run_payment_jobs(self) -> None:
+        """Start due payment jobs (called by scheduler)."""
+        try:
+            started = await payment_job_service.poll()
+            if started:
+                logger.info(f"Started {started} payment jobs")
+
+        except Exception as e:
+            logger.error(f"Error polling payment jobs: {str(e)}")
+
+    async def _run_large_order_jobs(self) -> None:
+        """Start due large order fills (called by scheduler)."""
+        try:
+            started = await large_order_service.poll()
+            if started:
+                logger.info(f"Started {started} large order fills")
+
+        except Exception as e:
+            logger.error(f"Error polling large order fills: {str(e)}")
+
     async def run_cleanup_now(self) -> Dict[str, any]:
         """Manually trigger cleanup job."""
         try:
@@ -151,6 +193,19 @@ class BackgroundTaskManager:
                 "error": f"Manual transaction check error: {str(e)}"
             }
 
+    async def run_payment_jobs_now(self) -> Dict[str, any]:
+        """Manually run due payment jobs."""
+        try:
+            logger.info("Manually running payment jobs")
+            return await payment_job_service.run_due_jobs()
+
+        except Exception as e:
+            logger.error(f"Error in manual payment job run: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Manual payment job error: {str(e)}"
+            }
+
     async def get_status(self) -> Dict[str, any]:
         """Get status of background task manager and scheduled jobs."""
         try:
@@ -166,13 +221,15 @@ class BackgroundTaskManager:
 
             # Get cleanup stats
             cleanup_stats = await cleanup_service.get_cleanup_stats()
+            payment_jobs = await payment_job_service.get_queue_stats()
 
             return {
                 "success": True,
                 "is_running": self.is_running,
                 "scheduled_jobs": jobs,
                 "cleanup_stats": cleanup_stats.get("stats", {}),
-                "cleanup_thresholds": cleanup_stats.get("cleanup_thresholds", {})
+                "cleanup_thresholds": cleanup_stats.get("cleanup_thresholds", {}),
+                "payment_jobs": payment_jobs
             }
 
         except Exception as e:
@@ -183,28 +240,6 @@ class BackgroundTaskManager:
                 "is_running": self.is_running
             }
 
-    async def process_payment_background(self, order_id: str) -> None:
-        """
-        Process payment in background (triggered by API endpoint).
-        This is called by FastAPI BackgroundTasks.
-        """
-        try:
-            logger.info(f"Processing payment in background for order {order_id}")
-            
-            # Give the transaction a moment to propagate
-            await asyncio.sleep(5)
-            
-            # Process the order
-            result = await transaction_monitor.process_single_order(order_id)
-            
-            if result["success"]:
-                logger.info(f"Background payment processing completed for order {order_id}")
-            else:
-                logger.warning(f"Background payment processing incomplete for order {order_id}: {result.get('error')}")
-                
-        except Exception as e:
-            logger.error(f"Error in background payment processing for order {order_id}: {str(e)}")
-
 
 # Global instance
 background_manager = BackgroundTaskManager()
\ No newline at end of file
@@ -2,14 +2,21 @@
 
 import logging
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Any, Dict, List
 
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.config import settings
 from app.database import get_session
-from app.models.allowances import Allowance, AllowanceStatus
+from app.models.allowances import AllowanceStatus
+from app.models.large_order_jobs import LargeOrderJob, LargeOrderJobState
+from app.models.orders import Order, OrderState
+from app.models.payment_jobs import PaymentJob, PaymentJobState
+from app.services.idempotency import idempotency_service
+from app.services.inventory import inventory_service
+from app.services.order_events import OrderEvent, order_event_bus
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +26,24 @@ class CleanupService:
 
     def __init__(self):
         self.reservation_timeout_minutes = settings.reservation_timeout_minutes
+        self.distribution_stall_minutes = settings.distribution_stall_minutes
+
+    def _unpaid_conditions(self) -> List[Any]:
+        """Conditions for orders with no recorded payment and none queued."""
+        queued_payment = select(PaymentJob.order_id).where(
+            PaymentJob.order_id == Order.order_id,
+            PaymentJob.status == PaymentJobState.QUEUED,
+        )
+        return [Order.tx_hash.is_(None), ~queued_payment.exists()]
+
+    def _stalled_distribution_conditions(self) -> List[Any]:
+        """Conditions for paid orders whose token distribution was claimed but never finished."""
+        stall_threshold = datetime.utcnow() - timedelta(minutes=self.distribution_stall_minutes)
+        return [
+            Order.status == OrderState.RESERVED,
+            Order.tx_hash.is_not(None),
+            Order.distribution_started_at < stall_threshold,
+        ]
 
     async def cleanup_expired_reservations(self) -> Dict[str, any]:
         """
@@ -36,16 +61,18 @@ class CleanupService:
                     minutes=self.reservation_timeout_minutes
                 )
                 
-                # Find expired reservations
-                stmt = select(Allowance).where(
-                    Allowance.status == AllowanceStatus.RESERVED,
-                    Allowance.timestamp < timeout_threshold
-                )
+                # Find expired reservations; paid orders and orders whose
+                # payment is waiting for a worker are left to the payment flow
+                stmt = select(Order).where(
+                    Order.status == OrderState.RESERVED,
+                    Order.timestamp < timeout_threshold,
+                    *self._unpaid_conditions()
+                ).with_for_update(skip_locked=True)
                 
                 result = await session.execute(stmt)
-                expired_allowances = result.scalars().all()
+                expired_orders = result.scalars().all()
                 
-                if not expired_allowances:
+                if not expired_orders:
                     logger.info("No expired reservations found")
                     return {
                         "success": True,
@@ -53,24 +80,17 @@ class CleanupService:
                         "message": "No expired reservations to clean"
                     }
                 
-                # Group by order_id for logging
-                orders_cleaned = set()
-                
-                # Clean up expired allowances
-                for allowance in expired_allowances:
-                    orders_cleaned.add(allowance.order_id)
-                    
-                    # Reset allowance to available state
-                    allowance.status = AllowanceStatus.AVAILABLE
-                    allowance.order_id = None
-                    allowance.wallet = None
-                    allowance.message = None
-                    allowance.tx_hash = None
-                    allowance.reward_tx_hash = None
-                    allowance.timestamp = None
-                    allowance.updated_at = datetime.utcnow()
-                    
-                    cleanup_count += 1
+                orders_cleaned = {order.order_id for order in expired_orders}
+
+                # Expire the orders and return their ranges to the available pool
+                now = datetime.utcnow()
+                for order in expired_orders:
+                    order.status = OrderState.EXPIRED
+                    order.updated_at = now
+                    cleanup_count += await inventory_service.release(session, order.order_id)
+                await order_event_bus.publish_many(
+                    session, sorted(orders_cleaned), OrderState.EXPIRED, OrderEvent.EXPIRED
+                )
                 
                 await session.commit()
                 
@@ -107,22 +127,26 @@ class CleanupService:
             cleanup_count = 0
             
             async for session in get_session():
-                # Find allowances that have been in processing state too long
-                # (have tx_hash but still reserved and older than 2x timeout)
+                # Find orders that have been in processing state too long
+                # (paid but still reserved more than 2x timeout after payment).
+                # Once distribution is claimed tokens may have been sent, so
+                # those orders are reported by check_stalled_distributions
+                # for manual reconciliation instead.
                 extended_timeout_threshold = datetime.utcnow() - timedelta(
                     minutes=self.reservation_timeout_minutes * 2
                 )
                 
-                stmt = select(Allowance).where(
-                    Allowance.status == AllowanceStatus.RESERVED,
-                    Allowance.tx_hash.is_not(None),
-                    Allowance.timestamp < extended_timeout_threshold
-                )
+                stmt = select(Order).where(
+                    Order.status == OrderState.RESERVED,
+                    Order.tx_hash.is_not(None),
+                    Order.distribution_started_at.is_(None),
+                    Order.paid_at < extended_timeout_threshold
+                ).with_for_update(skip_locked=True)
                 
                 result = await session.execute(stmt)
-                stuck_allowances = result.scalars().all()
+                stuck_orders = result.scalars().all()
                 
-                if not stuck_allowances:
+                if not stuck_orders:
                     logger.info("No stuck transactions found")
                     return {
                         "success": True,
@@ -130,23 +154,17 @@ class CleanupService:
                         "message": "No stuck transactions to clean"
                     }
                 
-                orders_cleaned = set()
-                
-                # Clean up stuck allowances
-                for allowance in stuck_allowances:
-                    orders_cleaned.add(allowance.order_id)
-                    
-                    # Reset allowance to available state
-                    allowance.status = AllowanceStatus.AVAILABLE
-                    allowance.order_id = None
-                    allowance.wallet = None
-                    allowance.message = None
-                    allowance.tx_hash = None
-                    allowance.reward_tx_hash = None
-                    allowance.timestamp = None
-                    allowance.updated_at = datetime.utcnow()
-                    
-                    cleanup_count += 1
+                orders_cleaned = {order.order_id for order in stuck_orders}
+
+                # Fail the orders and return their ranges to the available pool
+                now = datetime.utcnow()
+                for order in stuck_orders:
+                    order.status = OrderState.FAILED
+                    order.updated_at = now
+                    cleanup_count += await inventory_service.release(session, order.order_id)
+                await order_event_bus.publish_many(
+                    session, sorted(orders_cleaned), OrderState.FAILED, OrderEvent.FAILED
+                )
                 
                 await session.commit()
                 
@@ -171,6 +189,166 @@ class CleanupService:
                 "cleaned_count": 0
             }
 
+    async def cleanup_stalled_large_orders(self) -> Dict[str, any]:
+        """
+        Release large orders whose chunked reservation stopped making progress
+        and that no queued fill job will resume.
+
+        Returns:
+            Dict with cleanup results
+        """
+        try:
+            cleanup_count = 0
+
+            async for session in get_session():
+                stall_threshold = datetime.utcnow() - timedelta(
+                    minutes=self.reservation_timeout_minutes
+                )
+
+                stmt = select(Order).where(
+                    Order.status == OrderState.RESERVING,
+                    Order.updated_at < stall_threshold,
+                    ~select(LargeOrderJob.order_id).where(
+                        LargeOrderJob.order_id == Order.order_id,
+                        LargeOrderJob.status == LargeOrderJobState.QUEUED,
+                    ).exists(),
+                ).with_for_update(skip_locked=True)
+
+                result = await session.execute(stmt)
+                stalled_orders = result.scalars().all()
+
+                if not stalled_orders:
+                    return {
+                        "success": True,
+                        "cleaned_count": 0,
+                        "message": "No stalled large orders to clean"
+                    }
+
+                now = datetime.utcnow()
+                for order in stalled_orders:
+                    order.status = OrderState.FAILED
+                    order.updated_at = now
+                    cleanup_count += await inventory_service.release(session, order.order_id)
+                await order_event_bus.publish_many(
+                    session,
+                    sorted(order.order_id for order in stalled_orders),
+                    OrderState.FAILED,
+                    OrderEvent.FAILED,
+                )
+
+                await session.commit()
+
+                logger.warning(
+                    f"Released {cleanup_count} allowances from {len(stalled_orders)} stalled large orders"
+                )
+
+                return {
+                    "success": True,
+                    "cleaned_count": cleanup_count,
+                    "orders_cleaned": len(stalled_orders),
+                    "timeout_threshold": stall_threshold.isoformat(),
+                    "message": f"Cleaned {cleanup_count} allowances from stalled large orders"
+                }
+
+        except Exception as e:
+            logger.error(f"Error during stalled large order cleanup: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Stalled large order cleanup error: {str(e)}",
+                "cleaned_count": 0
+            }
+
+    async def check_stalled_distributions(self) -> Dict[str, any]:
+        """
+        Report paid orders whose token distribution was claimed but never finished.
+
+        The claim is committed before tokens move, so a worker that died in
+        between leaves the order RESERVED with distribution_started_at set,
+        and nothing retries it. Whether tokens were sent can only be settled
+        by hand, so these orders are logged and alerted on, never changed.
+
+        Returns:
+            Dict with the stalled orders found
+        """
+        try:
+            async for session in get_session():
+                stmt = select(Order.order_id, Order.tx_hash, Order.distribution_started_at).where(
+                    *self._stalled_distribution_conditions()
+                ).order_by(Order.distribution_started_at)
+                stalled = (await session.execute(stmt)).all()
+
+            if not stalled:
+                return {
+                    "success": True,
+                    "stalled_count": 0,
+                    "message": "No stalled distributions"
+                }
+
+            for order_id, tx_hash, started_at in stalled:
+                logger.error(
+                    f"CRITICAL: Token distribution stalled | order_id={order_id} | "
+                    f"tx_hash={tx_hash} | started_at={started_at.isoformat()} | "
+                    f"needs manual reconciliation"
+                )
+
+            order_ids = [order_id for order_id, _, _ in stalled]
+            try:
+                from app.services.email import email_service
+                await email_service.send_system_error_alert(
+                    error_type="distribution_stalled",
+                    error_message=(
+                        f"{len(stalled)} paid orders started token distribution more than "
+                        f"{self.distribution_stall_minutes} minutes ago and never finished"
+                    ),
+                    context={"order_ids": order_ids},
+                )
+            except Exception as email_error:
+                logger.error(f"Failed to send stalled distribution alert: {email_error}")
+
+            return {
+                "success": True,
+                "stalled_count": len(stalled),
+                "order_ids": order_ids,
+                "message": f"Found {len(stalled)} stalled distributions needing reconciliation"
+            }
+
+        except Exception as e:
+            logger.error(f"Error checking stalled distributions: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Stalled distribution check error: {str(e)}",
+                "stalled_count": 0
+            }
+
+    async def cleanup_expired_idempotency_keys(self) -> Dict[str, any]:
+        """
+        Delete stored Idempotency-Key responses that are past their TTL.
+
+        Returns:
+            Dict with cleanup results
+        """
+        try:
+            async for session in get_session():
+                deleted_count = await idempotency_service.delete_expired(session)
+
+                await session.commit()
+
+                logger.info(f"Deleted {deleted_count} expired idempotency keys")
+
+                return {
+                    "success": True,
+                    "deleted_count": deleted_count,
+                    "message": f"Deleted {deleted_count} expired idempotency keys"
+                }
+
+        except Exception as e:
+            logger.error(f"Error during idempotency key cleanup: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Idempotency key cleanup error: {str(e)}",
+                "deleted_count": 0
+            }
+
     async def get_cleanup_stats(self) -> Dict[str, any]:
         """
         Get statistics about reservations and potential cleanup candidates.
@@ -181,44 +359,46 @@ class CleanupService:
         try:
             async for session in get_session():
                 # Count total allowances by status
-                available_stmt = select(Allowance).where(Allowance.status == AllowanceStatus.AVAILABLE)
-                reserved_stmt = select(Allowance).where(Allowance.status == AllowanceStatus.RESERVED)
-                retired_stmt = select(Allowance).where(Allowance.status == AllowanceStatus.RETIRED)
-                
-                available_result = await session.execute(available_stmt)
-                reserved_result = await session.execute(reserved_stmt)
-                retired_result = await session.execute(retired_stmt)
+                counts = await inventory_service.count_by_status(session)
+                available_count = counts[AllowanceStatus.AVAILABLE.value]
+                reserved_count = counts[AllowanceStatus.RESERVED.value]
+                retired_count = counts[AllowanceStatus.RETIRED.value]
                 
-                available_count = len(available_result.scalars().all())
-                reserved_count = len(reserved_result.scalars().all())
-                retired_count = len(retired_result.scalars().all())
+                serial_count = func.coalesce(func.sum(Order.num_allowances), 0)
                 
                 # Count expired reservations
                 timeout_threshold = datetime.utcnow() - timedelta(
                     minutes=self.reservation_timeout_minutes
                 )
                 
-                expired_stmt = select(Allowance).where(
-                    Allowance.status == AllowanceStatus.RESERVED,
-                    Allowance.timestamp < timeout_threshold
+                expired_stmt = select(serial_count).where(
+                    Order.status == OrderState.RESERVED,
+                    Order.timestamp < timeout_threshold,
+                    *self._unpaid_conditions()
                 )
                 
-                expired_result = await session.execute(expired_stmt)
-                expired_count = len(expired_result.scalars().all())
+                expired_count = int((await session.execute(expired_stmt)).scalar_one())
                 
                 # Count stuck transactions
                 extended_timeout_threshold = datetime.utcnow() - timedelta(
                     minutes=self.reservation_timeout_minutes * 2
                 )
                 
-                stuck_stmt = select(Allowance).where(
-                    Allowance.status == AllowanceStatus.RESERVED,
-                    Allowance.tx_hash.is_not(None),
-                    Allowance.timestamp < extended_timeout_threshold
+                stuck_stmt = select(serial_count).where(
+                    Order.status == OrderState.RESERVED,
+                    Order.tx_hash.is_not(None),
+                    Order.distribution_started_at.is_(None),
+                    Order.paid_at < extended_timeout_threshold
                 )
                 
-                stuck_result = await session.execute(stuck_stmt)
-                stuck_count = len(stuck_result.scalars().all())
+                stuck_count = int((await session.execute(stuck_stmt)).scalar_one())
+
+                # Count paid orders whose distribution stalled after its claim
+                stalled_stmt = select(func.count()).select_from(Order).where(
+                    *self._stalled_distribution_conditions()
+                )
+
+                stalled_count = int((await session.execute(stalled_stmt)).scalar_one())
                 
                 return {
                     "success": True,
@@ -228,10 +408,12 @@ class CleanupService:
                         "retired_allowances": retired_count,
                         "expired_reservations": expired_count,
                         "stuck_transactions": stuck_count,
+                        "stalled_distributions": stalled_count,
                         "total_allowances": available_count + reserved_count + retired_count
                     },
                     "cleanup_thresholds": {
                         "reservation_timeout_minutes": self.reservation_timeout_minutes,
+                        "distribution_stall_minutes": self.distribution_stall_minutes,
                         "next_cleanup_candidates": expired_count + stuck_count
                     }
                 }
@@ -259,16 +441,33 @@ class CleanupService:
             # Cleanup stuck transactions
             stuck_result = await self.cleanup_orphaned_transactions()
             
+            # Release large orders whose chunked reservation stalled
+            stalled_result = await self.cleanup_stalled_large_orders()
+
+            # Report distributions that need manual reconciliation
+            distribution_result = await self.check_stalled_distributions()
+
+            # Evict expired idempotency keys
+            idempotency_result = await self.cleanup_expired_idempotency_keys()
+
             total_cleaned = (
                 expired_result.get("cleaned_count", 0) + 
-                stuck_result.get("cleaned_count", 0)
+                stuck_result.get("cleaned_count", 0) +
+                stalled_result.get("cleaned_count", 0)
             )
             
             result = {
-                "success": expired_result["success"] and stuck_result["success"],
+                "success": (
+                    expired_result["success"]
+                    and stuck_result["success"]
+                    and stalled_result["success"]
+                ),
                 "total_cleaned": total_cleaned,
                 "expired_cleanup": expired_result,
                 "stuck_cleanup": stuck_result,
+                "stalled_large_order_cleanup": stalled_result,
+                "stalled_distribution_check": distribution_result,
+                "idempotency_cleanup": idempotency_result,
                 "message": f"Full cleanup completed. Total cleaned: {total_cleaned} allowances"
             }
             
@@ -0,0 +1,471 @@
+"""Retirement history projection and reads."""
+
+import asyncio
+import base64
+import binascii
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.orders import Order
+from app.schemas.retirements import HistoryResponse
+from app.services.inventory import inventory_service
+from app.utils.cache import MISSING, BoundedTTLCache
+from app.utils.serials import SerialFormat, format_serials
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidCursorError(Exception):
+    """Raised when a history cursor was not issued by this service."""
+
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+        super().__init__("Invalid history cursor")
+
+
+# One page of completed retirements, most recent first, and the total number
+# of them, read from the retirement_history projection alone. The total is
+# joined to the page so an empty page still reports it. One row more than the
+# page is read to tell whether another page follows.
+_HISTORY_PAGE_SQL = """
+    WITH page AS (
+        SELECT order_id, wallet, message, reward_tx_hash, serial_ranges, completed_at
+        FROM retirement_history
+        {keyset}
+        ORDER BY completed_at DESC, order_id DESC
+        LIMIT CAST(:limit AS integer) + 1 OFFSET CAST(:offset AS integer)
+    ),
+    total AS (
+        SELECT count(*) AS orders FROM retirement_history
+    )
+    SELECT
+        total.orders AS total,
+        p.order_id, p.wallet, p.message, p.reward_tx_hash, p.serial_ranges, p.completed_at
+    FROM total
+    LEFT JOIN page p ON true
+    ORDER BY p.completed_at DESC, p.order_id DESC
+"""
+
+HISTORY_PAGE_SQL = text(_HISTORY_PAGE_SQL.format(keyset=""))
+
+# The same page starting after a cursor: a seek on
+# ix_retirement_history_completed_at, so deep pages cost what the first one does
+HISTORY_PAGE_AFTER_SQL = text(
+    _HISTORY_PAGE_SQL.format(
+        keyset="""
+        WHERE (completed_at, order_id) < (
+            CAST(:after_completed_at AS timestamp), CAST(:after_order_id AS varchar)
+        )"""
+    )
+)
+
+# Add the retirements of the ``added`` CTE to their wallets' running totals.
+# Every retired allowance is one ton and is rewarded with one $PR.
+_ADD_TO_WALLET_SUMMARIES_SQL = """
+    INSERT INTO wallet_retirement_summaries (
+        wallet, retirements, tons_retired, pr_earned, first_retired_at, last_retired_at
+    )
+    SELECT
+        lower(wallet), count(*), sum(num_allowances), sum(num_allowances),
+        min(completed_at), max(completed_at)
+    FROM added
+    WHERE wallet IS NOT NULL
+    GROUP BY lower(wallet)
+    ON CONFLICT (wallet) DO UPDATE
+    SET retirements = wallet_retirement_summaries.retirements + EXCLUDED.retirements,
+        tons_retired = wallet_retirement_summaries.tons_retired + EXCLUDED.tons_retired,
+        pr_earned = wallet_retirement_summaries.pr_earned + EXCLUDED.pr_earned,
+        first_retired_at = LEAST(
+            wallet_retirement_summaries.first_retired_at, EXCLUDED.first_retired_at
+        ),
+        last_retired_at = GREATEST(
+            wallet_retirement_summaries.last_retired_at, EXCLUDED.last_retired_at
+        )
+"""
+
+# Project one retired order, with its ranges as [start, end] pairs, and add
+# it to its wallet's totals. Order fields come from the caller, whose changes
+# are not flushed yet. An order already in the history is left as it is.
+RECORD_RETIREMENT_SQL = text(
+    f"""
+    WITH added AS (
+        INSERT INTO retirement_history (
+            order_id, wallet, message, reward_tx_hash,
+            serial_ranges, num_allowances, completed_at
+        )
+        SELECT
+            CAST(:order_id AS varchar),
+            CAST(:wallet AS varchar),
+            CAST(:message AS varchar),
+            CAST(:reward_tx_hash AS varchar),
+            COALESCE(
+                array_agg(ARRAY[r.start_serial, r.end_serial] ORDER BY r.start_serial),
+                '{{}}'
+            ),
+            COALESCE(sum(r.end_serial - r.start_serial + 1), 0),
+            CAST(:completed_at AS timestamp)
+        FROM order_allowances oa
+        JOIN allowance_ranges r ON r.id = oa.range_id
+        WHERE oa.order_id = CAST(:order_id AS varchar)
+        ON CONFLICT (order_id) DO NOTHING
+        RETURNING wallet, num_allowances, completed_at
+    )
+    {_ADD_TO_WALLET_SUMMARIES_SQL}
+"""
+)
+
+# Project the next batch of retired orders missing from the history, in
+# order_id order, for orders retired before the projection existed
+BACKFILL_HISTORY_SQL = text(
+    f"""
+    WITH added AS (
+        INSERT INTO retirement_history (
+            order_id, wallet, message, reward_tx_hash,
+            serial_ranges, num_allowances, completed_at
+        )
+        SELECT
+            o.order_id, o.wallet, o.message, o.reward_tx_hash,
+            COALESCE(s.serial_ranges, '{{}}'), COALESCE(s.num_allowances, 0), o.updated_at
+        FROM orders o
+        LEFT JOIN LATERAL (
+            SELECT
+                array_agg(ARRAY[r.start_serial, r.end_serial] ORDER BY r.start_serial)
+                    AS serial_ranges,
+                sum(r.end_serial - r.start_serial + 1) AS num_allowances
+            FROM order_allowances oa
+            JOIN allowance_ranges r ON r.id = oa.range_id
+            WHERE oa.order_id = o.order_id
+        ) s ON true
+        WHERE o.status = 'RETIRED'
+        AND o.order_id > CAST(:after_order_id AS varchar)
+        AND NOT EXISTS (
+            SELECT 1 FROM retirement_history h WHERE h.order_id = o.order_id
+        )
+        ORDER BY o.order_id
+        LIMIT CAST(:batch_size AS integer)
+        ON CONFLICT (order_id) DO NOTHING
+        RETURNING order_id, wallet, num_allowances, completed_at
+    ),
+    summaries AS (
+        {_ADD_TO_WALLET_SUMMARIES_SQL}
+    )
+    SELECT order_id FROM added
+"""
+)
+
+# One page of a wallet's retirements, most recent first, with the wallet's
+# totals; the totals are joined so an empty page still reports them
+_WALLET_PAGE_SQL = """
+    WITH page AS (
+        SELECT order_id, wallet, message, reward_tx_hash, serial_ranges, completed_at
+        FROM retirement_history
+        WHERE lower(wallet) = CAST(:wallet AS varchar)
+        {keyset}
+        ORDER BY completed_at DESC, order_id DESC
+        LIMIT CAST(:limit AS integer) + 1
+    )
+    SELECT
+        s.retirements, s.tons_retired, s.pr_earned, s.first_retired_at, s.last_retired_at,
+        p.order_id, p.wallet, p.message, p.reward_tx_hash, p.serial_ranges, p.completed_at
+    FROM (SELECT 1) AS one
+    LEFT JOIN wallet_retirement_summaries s ON s.wallet = CAST(:wallet AS varchar)
+    LEFT JOIN page p ON true
+    ORDER BY p.completed_at DESC, p.order_id DESC
+"""
+
+WALLET_PAGE_SQL = text(_WALLET_PAGE_SQL.format(keyset=""))
+
+WALLET_PAGE_AFTER_SQL = text(
+    _WALLET_PAGE_SQL.format(
+        keyset="""
+        AND (completed_at, order_id) < (
+            CAST(:after_completed_at AS timestamp), CAST(:after_order_id AS varchar)
+        )"""
+    )
+)
+
+
+class HistoryService:
+    """Service for reading the public history of completed retirements."""
+
+    def __init__(self):
+        # Serialized pages keyed by (retirement version, limit, offset, cursor,
+        # serial format).
+        # The version lives in the shared retirement watermark and only moves
+        # when an order retires, so every worker stops using its pages at the
+        # same commit without any cross-worker messages.
+        self.page_cache = BoundedTTLCache(settings.history_cache_max_entries)
+        self._cached_version = 0
+        self._rebuilds: dict[tuple, asyncio.Future] = {}
+
+    def encode_cursor(self, completed_at: datetime, order_id: str) -> str:
+        """Opaque cursor pointing just after a history item."""
+        micros = (completed_at - EPOCH) // timedelta(microseconds=1)
+        raw = f"{micros}:{order_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> tuple[datetime, str]:
+        """
+        Read the position a cursor points after.
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            micros, order_id = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+            return EPOCH + timedelta(microseconds=int(micros)), order_id
+        except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError) as e:
+            raise InvalidCursorError(cursor) from e
+
+    async def get_page(
+        self,
+        session: AsyncSession,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        serial_format: SerialFormat = SerialFormat.LIST,
+    ) -> tuple[list[dict[str, Any]], int, Optional[str]]:
+        """
+        Read one page of completed retirements in a single statement.
+
+        Args:
+            session: Database session
+            limit: Maximum number of orders on the page
+            offset: Number of orders to skip, after the cursor if one is given
+            cursor: ``next_cursor`` of the previous page
+            serial_format: How the items list their serial numbers
+
+        Returns:
+            The page's history items, most recent first, the total number of
+            completed retirements and the cursor of the next page, if there is one
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        params = {"limit": limit, "offset": offset}
+        statement = HISTORY_PAGE_SQL
+        if cursor:
+            after_completed_at, after_order_id = self.decode_cursor(cursor)
+            params.update(
+                after_completed_at=after_completed_at, after_order_id=after_order_id
+            )
+            statement = HISTORY_PAGE_AFTER_SQL
+
+        rows = (await session.execute(statement, params)).all()
+
+        total = rows[0].total if rows else 0
+        page = [row for row in rows if row.order_id is not None]
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = self.encode_cursor(page[-1].completed_at, page[-1].order_id)
+
+        items = [self._history_item(row, serial_format) for row in page]
+        return items, total, next_cursor
+
+    async def get_wallet_page(
+        self,
+        session: AsyncSession,
+        wallet: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        serial_format: SerialFormat = SerialFormat.LIST,
+    ) -> tuple[list[dict[str, Any]], dict[str, Any], Optional[str]]:
+        """
+        Read one page of a wallet's retirements and its totals in a single statement.
+
+        Args:
+            session: Database session
+            wallet: Wallet address, in any casing
+            limit: Maximum number of orders on the page
+            cursor: ``next_cursor`` of the previous page
+            serial_format: How the items list their serial numbers
+
+        Returns:
+            The page's history items, most recent first, the wallet's totals
+            and the cursor of the next page, if there is one
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        params = {"wallet": wallet.lower(), "limit": limit}
+        statement = WALLET_PAGE_SQL
+        if cursor:
+            after_completed_at, after_order_id = self.decode_cursor(cursor)
+            params.update(
+                after_completed_at=after_completed_at, after_order_id=after_order_id
+            )
+            statement = WALLET_PAGE_AFTER_SQL
+
+        rows = (await session.execute(statement, params)).all()
+
+        # A wallet without retirements has no summary row yet
+        summary = rows[0]
+        totals = {
+            "retirements": summary.retirements or 0,
+            "tons_retired": summary.tons_retired or 0,
+            "pr_earned": summary.pr_earned or 0,
+            "first_retired_at": summary.first_retired_at,
+            "last_retired_at": summary.last_retired_at,
+        }
+        page = [row for row in rows if row.order_id is not None]
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = self.encode_cursor(page[-1].completed_at, page[-1].order_id)
+
+        items = [self._history_item(row, serial_format) for row in page]
+        return items, totals, next_cursor
+
+    async def get_page_json(
+        self,
+        version: int,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        serial_format: SerialFormat = SerialFormat.LIST,
+    ) -> bytes:
+        """
+        One history page serialized as a HistoryResponse, cached until the next retirement.
+
+        Concurrent misses on the same page share a single read, made in a
+        session of its own so it outlives any one of the requests waiting on it.
+
+        Args:
+            version: Current retirement version, read by the caller
+            limit: Maximum number of orders on the page
+            offset: Number of orders to skip, after the cursor if one is given
+            cursor: ``next_cursor`` of the previous page
+            serial_format: How the items list their serial numbers
+
+        Returns:
+            The page as JSON
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        if version > self._cached_version:
+            # Pages of older versions can never be asked for again
+            self.page_cache.clear()
+            self._cached_version = version
+
+        key = (version, limit, offset, cursor, serial_format)
+        body = self.page_cache.get(key)
+        if body is not MISSING:
+            return body
+
+        rebuild = self._rebuilds.get(key)
+        if rebuild is None:
+            rebuild = asyncio.ensure_future(self._build_page_json(key))
+            self._rebuilds[key] = rebuild
+            rebuild.add_done_callback(lambda _: self._rebuilds.pop(key, None))
+        else:
+            logger.debug(f"Joining history page rebuild for {key}")
+        # A cancelled caller must not cancel the rebuild other callers are waiting on
+        return await asyncio.shield(rebuild)
+
+    async def _build_page_json(self, key: tuple) -> bytes:
+        """Read and serialize one page, caching it unless a retirement overtook it."""
+        version, limit, offset, cursor, serial_format = key
+        async with async_session() as session:
+            items, total, next_cursor = await self.get_page(
+                session, limit, offset, cursor, serial_format
+            )
+        # Validated like any other response of the route
+        body = (
+            HistoryResponse(retirements=items, total=total, next_cursor=next_cursor)
+            .model_dump_json()
+            .encode("utf-8")
+        )
+
+        if version == self._cached_version:
+            self.page_cache.set(key, body)
+        return body
+
+    async def record(self, session: AsyncSession, order: Order) -> None:
+        """
+        Add a retired order to the history and its wallet's totals in the
+        session's transaction.
+
+        Call after its ranges were retired; the ranges are read as they
+        stand in the transaction. Recording an order twice has no effect.
+
+        Args:
+            session: Session whose transaction retires the order
+            order: The order, with its final reward_tx_hash and updated_at
+        """
+        await session.execute(
+            RECORD_RETIREMENT_SQL,
+            {
+                "order_id": order.order_id,
+                "wallet": order.wallet,
+                "message": order.message,
+                "reward_tx_hash": order.reward_tx_hash,
+                "completed_at": order.updated_at,
+            },
+        )
+
+    async def backfill(self, session: AsyncSession, batch_size: int = 1000) -> int:
+        """
+        Add retired orders missing from the history, and their wallets' totals,
+        one committed batch at a time.
+
+        Safe to run again at any time; orders already in the history are
+        skipped. The retirement version is bumped once rows were added.
+
+        Args:
+            session: Database session
+            batch_size: Orders projected per transaction
+
+        Returns:
+            Number of orders added to the history
+        """
+        added = 0
+        after_order_id = ""
+        while True:
+            result = await session.execute(
+                BACKFILL_HISTORY_SQL,
+                {"after_order_id": after_order_id, "batch_size": batch_size},
+            )
+            order_ids = result.scalars().all()
+            if not order_ids:
+                break
+
+            await inventory_service.bump_retirement_version(session)
+            await session.commit()
+
+            added += len(order_ids)
+            after_order_id = max(order_ids)
+            logger.info(f"Backfilled {added} retirements into the history")
+
+        return added
+
+    def _history_item(self, row, serial_format: SerialFormat) -> dict[str, Any]:
+        """Shape one page row as a history item."""
+        etherscan_link = None
+        if row.reward_tx_hash:
+            etherscan_link = f"https://sepolia.etherscan.io/tx/{row.reward_tx_hash}"
+
+        return {
+            "serial_numbers": format_serials(row.serial_ranges, serial_format),
+            "message": row.message,
+            "wallet": row.wallet,
+            "timestamp": row.completed_at.isoformat(),
+            "etherscan_link": etherscan_link,
+            "order_id": row.order_id,
+        }
+
+
+# Global instance
+history_service = HistoryService()
@@ -0,0 +1,145 @@
+"""Idempotency-Key support: store the first response and replay it on retries."""
+
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import Response
+from sqlalchemy import delete, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import settings
+from app.models.idempotency import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReuseError(Exception):
+    """Raised when a key is replayed with a different request body."""
+
+
+class IdempotencyInProgressError(Exception):
+    """Raised when a key was claimed but no response was stored for it."""
+
+
+# Claim a key for this request. An expired record is taken over in place; a
+# live one is left alone and nothing is returned. A concurrent claim of the
+# same key blocks here until the first transaction commits or rolls back.
+CLAIM_KEY_SQL = text(
+    """
+    INSERT INTO idempotency_keys (key, scope, request_hash, created_at, expires_at)
+    VALUES (:key, :scope, :request_hash, CAST(:now AS timestamp), CAST(:expires_at AS timestamp))
+    ON CONFLICT (key, scope) DO UPDATE
+    SET request_hash = EXCLUDED.request_hash,
+        status_code = NULL,
+        response_body = NULL,
+        created_at = EXCLUDED.created_at,
+        expires_at = EXCLUDED.expires_at
+    WHERE idempotency_keys.expires_at <= EXCLUDED.created_at
+    RETURNING key
+"""
+)
+
+
+class IdempotencyService:
+    """Service that stores responses by Idempotency-Key and replays them."""
+
+    def __init__(self):
+        self.ttl = timedelta(hours=settings.idempotency_key_ttl_hours)
+
+    @staticmethod
+    def hash_request(body: str) -> str:
+        """Fingerprint a request body so a key cannot be reused for another request."""
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    async def claim(
+        self, session: AsyncSession, key: str, scope: str, body: str
+    ) -> Optional[IdempotencyRecord]:
+        """
+        Claim an idempotency key inside the caller's transaction.
+
+        The claim is committed together with the caller's work and the stored
+        response, so a failed request leaves the key free for a retry.
+
+        Args:
+            session: Database session
+            key: Client-supplied Idempotency-Key
+            scope: Endpoint the key applies to
+            body: Canonical request body
+
+        Returns:
+            None if the caller now owns the key, otherwise the stored record
+
+        Raises:
+            IdempotencyKeyReuseError: If the key was used with a different body
+            IdempotencyInProgressError: If the stored record has no response
+        """
+        now = datetime.utcnow()
+        request_hash = self.hash_request(body)
+
+        result = await session.execute(
+            CLAIM_KEY_SQL,
+            {
+                "key": key,
+                "scope": scope,
+                "request_hash": request_hash,
+                "now": now,
+                "expires_at": now + self.ttl,
+            },
+        )
+        if result.first():
+            return None
+
+        stmt = select(IdempotencyRecord).where(
+            IdempotencyRecord.key == key, IdempotencyRecord.scope == scope
+        )
+        record = (await session.execute(stmt)).scalar_one()
+
+        if record.request_hash != request_hash:
+            raise IdempotencyKeyReuseError(
+                "Idempotency-Key was already used with a different request"
+            )
+        if record.response_body is None:
+            raise IdempotencyInProgressError(
+                "A request with this Idempotency-Key is still being processed"
+            )
+
+        logger.info(f"Replaying stored response for Idempotency-Key {key} ({scope})")
+        return record
+
+    async def store(
+        self, session: AsyncSession, key: str, scope: str, response: Response
+    ) -> None:
+        """Store the rendered response for a claimed key."""
+        await session.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.key == key, IdempotencyRecord.scope == scope)
+            .values(
+                status_code=response.status_code, response_body=bytes(response.body)
+            )
+        )
+
+    @staticmethod
+    def replay(record: IdempotencyRecord) -> Response:
+        """Rebuild the original response byte-for-byte."""
+        return Response(
+            content=record.response_body,
+            status_code=record.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    async def delete_expired(self, session: AsyncSession) -> int:
+        """Delete records past their TTL."""
+        result = await session.execute(
+            delete(IdempotencyRecord).where(
+                IdempotencyRecord.expires_at <= datetime.utcnow()
+            )
+        )
+        return result.rowcount
+
+
+# Global instance
+idempotency_service = IdempotencyService()
@@ -0,0 +1,876 @@
+"""Range-based allowance inventory for reserving, retiring and releasing serials."""
+
+import asyncio
+import logging
+import random
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import delete, func, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import settings
+from app.models.allowance_ranges import AllowanceRange
+from app.models.allowances import AllowanceStatus
+from app.models.inventory_counters import InventoryCounter
+from app.models.orders import OrderAllowance
+from app.models.retirement_watermark import RetirementWatermark
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientInventoryError(Exception):
+    """Raised when fewer serials are available than were requested."""
+
+    def __init__(self, available: int, requested: int):
+        self.available = available
+        self.requested = requested
+        super().__init__(
+            f"Only {available} allowances available, but {requested} requested"
+        )
+
+
+class ReservationConflictError(Exception):
+    """Raised when concurrent checkouts keep claiming the ranges a reservation needs."""
+
+
+# Reserve serials in a single round trip from the given allocation buckets.
+# The smallest prefix of available ranges (by serial) in those buckets that
+# covers the request is locked with SKIP LOCKED, whole
+# ranges are claimed in place and the last one is carved from its tail, so the
+# available row only shrinks and concurrent lockers re-read it instead of
+# failing. The order row, its range links and the inventory counters are
+# written by the same statement, and nothing is written unless the locked
+# ranges cover the full request. When the buckets' counters already show too
+# little stock no range is scanned or locked at all. A large order reserved in
+# chunks already exists, so each chunk adds to its progress instead.
+RESERVE_RANGES_SQL = text(
+    """
+    WITH stock AS (
+        SELECT COALESCE(sum(count), 0) AS available
+        FROM inventory_counters
+        WHERE status = 'AVAILABLE' AND slot = ANY(CAST(:buckets AS integer[]))
+    ),
+    candidates AS (
+        SELECT
+            id,
+            end_serial - start_serial + 1 AS size,
+            sum(end_serial - start_serial + 1) OVER (ORDER BY start_serial) AS cumulative
+        FROM allowance_ranges
+        WHERE status = 'AVAILABLE' AND bucket = ANY(CAST(:buckets AS integer[]))
+        AND (SELECT available FROM stock) >= CAST(:quantity AS bigint)
+    ),
+    locked AS (
+        SELECT
+            r.id, r.start_serial, r.end_serial, r.originating_state,
+            r.allocation_year, r.bucket
+        FROM allowance_ranges r
+        WHERE r.id IN (
+            SELECT id FROM candidates
+            WHERE cumulative - size < CAST(:quantity AS bigint)
+        )
+        AND r.status = 'AVAILABLE'
+        ORDER BY r.start_serial
+        FOR UPDATE SKIP LOCKED
+    ),
+    allocation AS (
+        SELECT
+            locked.*,
+            end_serial - start_serial + 1 AS size,
+            LEAST(
+                end_serial - start_serial + 1,
+                CAST(:quantity AS bigint) - COALESCE(sum(end_serial - start_serial + 1) OVER (
+                    ORDER BY start_serial ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ), 0)
+            ) AS take
+        FROM locked
+    ),
+    chosen AS (
+        SELECT * FROM allocation
+        WHERE take > 0
+        AND (SELECT sum(size) FROM allocation) >= CAST(:quantity AS bigint)
+    ),
+    new_order AS (
+        INSERT INTO orders (
+            order_id, status, wallet, message, num_allowances, num_reserved,
+            quote_wei, quote_source, quote_expires_at,
+            timestamp, created_at, updated_at
+        )
+        SELECT
+            :order_id, 'RESERVED', :wallet, :message, CAST(:quantity AS integer),
+            CAST(:quantity AS integer), CAST(:quote_wei AS numeric),
+            CAST(:quote_source AS varchar), CAST(:quote_expires_at AS timestamp),
+            CAST(:now AS timestamp), CAST(:now AS timestamp), CAST(:now AS timestamp)
+        WHERE EXISTS (SELECT 1 FROM chosen)
+        ON CONFLICT (order_id) DO UPDATE
+        SET num_reserved = orders.num_reserved + EXCLUDED.num_reserved,
+            updated_at = EXCLUDED.updated_at
+    ),
+    shrunk AS (
+        UPDATE allowance_ranges r
+        SET end_serial = c.end_serial - c.take, updated_at = CAST(:now AS timestamp)
+        FROM chosen c
+        WHERE r.id = c.id AND c.take < c.size
+        RETURNING r.id
+    ),
+    carved AS (
+        INSERT INTO allowance_ranges (
+            start_serial, end_serial, status, originating_state, allocation_year,
+            bucket, created_at, updated_at
+        )
+        SELECT
+            c.end_serial - c.take + 1, c.end_serial, 'RESERVED', c.originating_state,
+            c.allocation_year, c.bucket, CAST(:now AS timestamp), CAST(:now AS timestamp)
+        FROM chosen c
+        WHERE c.take < c.size
+        RETURNING id, start_serial, end_serial
+    ),
+    claimed AS (
+        UPDATE allowance_ranges r
+        SET status = 'RESERVED', updated_at = CAST(:now AS timestamp)
+        FROM chosen c
+        WHERE r.id = c.id AND c.take = c.size
+        RETURNING r.id, r.start_serial, r.end_serial
+    ),
+    reserved AS (
+        SELECT * FROM carved
+        UNION ALL
+        SELECT * FROM claimed
+    ),
+    linked AS (
+        INSERT INTO order_allowances (order_id, range_id)
+        SELECT :order_id, id FROM reserved
+    ),
+    taken AS (
+        UPDATE inventory_counters c
+        SET count = c.count - t.taken
+        FROM (SELECT bucket, sum(take) AS taken FROM chosen GROUP BY bucket) t
+        WHERE c.status = 'AVAILABLE' AND c.slot = t.bucket
+    ),
+    counted AS (
+        UPDATE inventory_counters
+        SET count = count + CAST(:quantity AS bigint)
+        WHERE status = 'RESERVED' AND slot = CAST(:slot AS integer)
+        AND EXISTS (SELECT 1 FROM chosen)
+    )
+    SELECT start_serial, end_serial FROM reserved
+    ORDER BY start_serial
+"""
+)
+
+# Reserve serials for a batch of orders in a single round trip. Entries are
+# numbered in request order and laid end to end; the prefix of free ranges
+# covering the whole batch is locked once, taken from the tails as above and
+# cut at entry boundaries so every order gets its own ranges. In all-or-nothing
+# mode nothing is written unless the batch is covered; otherwise entries are
+# walked in request order and each one that still fits in the locked serials
+# is filled, so an entry too large to fill does not hold back later ones.
+RESERVE_BATCH_SQL = text(
+    """
+    WITH RECURSIVE entries AS (
+        SELECT
+            e.order_id, e.wallet, e.message, e.quantity,
+            e.quote_wei, e.quote_source, e.quote_expires_at,
+            e.position,
+            sum(e.quantity) OVER (ORDER BY e.position) AS upto
+        FROM unnest(
+            CAST(:order_ids AS varchar[]), CAST(:wallets AS varchar[]),
+            CAST(:messages AS varchar[]), CAST(:quantities AS bigint[]),
+            CAST(:quote_weis AS numeric[]), CAST(:quote_sources AS varchar[]),
+            CAST(:quote_expiries AS timestamp[])
+        ) WITH ORDINALITY AS e(
+            order_id, wallet, message, quantity,
+            quote_wei, quote_source, quote_expires_at, position
+        )
+    ),
+    requested AS (
+        SELECT COALESCE(max(upto), 0) AS total FROM entries
+    ),
+    stock AS (
+        SELECT COALESCE(sum(count), 0) AS available
+        FROM inventory_counters
+        WHERE status = 'AVAILABLE' AND slot = ANY(CAST(:buckets AS integer[]))
+    ),
+    candidates AS (
+        SELECT
+            id,
+            end_serial - start_serial + 1 AS size,
+            sum(end_serial - start_serial + 1) OVER (ORDER BY start_serial) AS cumulative
+        FROM allowance_ranges
+        WHERE status = 'AVAILABLE' AND bucket = ANY(CAST(:buckets AS integer[]))
+        AND (SELECT available FROM stock) >= CASE
+            WHEN CAST(:all_or_nothing AS boolean) THEN (SELECT total FROM requested)
+            ELSE 1
+        END
+    ),
+    locked AS (
+        SELECT
+            r.id, r.start_serial, r.end_serial, r.originating_state,
+            r.allocation_year, r.bucket
+        FROM allowance_ranges r
+        WHERE r.id IN (
+            SELECT id FROM candidates
+            WHERE cumulative - size < (SELECT total FROM requested)
+        )
+        AND r.status = 'AVAILABLE'
+        ORDER BY r.start_serial
+        FOR UPDATE SKIP LOCKED
+    ),
+    held AS (
+        SELECT COALESCE(sum(end_serial - start_serial + 1), 0) AS total FROM locked
+    ),
+    walk AS (
+        SELECT CAST(0 AS bigint) AS position, CAST(0 AS bigint) AS used, false AS fits
+        UNION ALL
+        SELECT
+            e.position,
+            w.used + CASE WHEN w.used + e.quantity <= h.total THEN e.quantity ELSE 0 END,
+            w.used + e.quantity <= h.total
+        FROM walk w
+        JOIN entries e ON e.position = w.position + 1
+        CROSS JOIN held h
+    ),
+    fulfilled AS (
+        SELECT
+            e.order_id, e.wallet, e.message, e.quantity,
+            e.quote_wei, e.quote_source, e.quote_expires_at,
+            w.used AS upto
+        FROM entries e
+        JOIN walk w ON w.position = e.position AND w.fits
+        CROSS JOIN held
+        CROSS JOIN requested
+        WHERE held.total >= requested.total OR NOT CAST(:all_or_nothing AS boolean)
+    ),
+    filled AS (
+        SELECT COALESCE(max(upto), 0) AS quantity FROM fulfilled
+    ),
+    allocation AS (
+        SELECT
+            locked.*,
+            end_serial - start_serial + 1 AS size,
+            COALESCE(sum(end_serial - start_serial + 1) OVER (
+                ORDER BY start_serial ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ), 0) AS offset_start
+        FROM locked
+    ),
+    chosen AS (
+        SELECT a.*, LEAST(a.size, f.quantity - a.offset_start) AS take
+        FROM allocation a, filled f
+        WHERE a.offset_start < f.quantity
+    ),
+    pieces AS (
+        SELECT
+            e.order_id,
+            c.id AS range_id,
+            c.take = c.size
+                AND GREATEST(c.offset_start, e.upto - e.quantity) = c.offset_start AS in_place,
+            c.end_serial - c.take + 1
+                + GREATEST(c.offset_start, e.upto - e.quantity) - c.offset_start AS start_serial,
+            c.end_serial - c.take
+                + LEAST(c.offset_start + c.take, e.upto) - c.offset_start AS end_serial,
+            c.originating_state, c.allocation_year, c.bucket
+        FROM chosen c
+        JOIN fulfilled e
+            ON e.upto - e.quantity < c.offset_start + c.take
+            AND e.upto > c.offset_start
+    ),
+    new_orders AS (
+        INSERT INTO orders (
+            order_id, status, wallet, message, num_allowances, num_reserved,
+            quote_wei, quote_source, quote_expires_at,
+            timestamp, created_at, updated_at
+        )
+        SELECT
+            order_id, 'RESERVED', wallet, message, CAST(quantity AS integer),
+            CAST(quantity AS integer), quote_wei, quote_source, quote_expires_at,
+            CAST(:now AS timestamp), CAST(:now AS timestamp), CAST(:now AS timestamp)
+        FROM fulfilled
+    ),
+    shrunk AS (
+        UPDATE allowance_ranges r
+        SET end_serial = c.end_serial - c.take, updated_at = CAST(:now AS timestamp)
+        FROM chosen c
+        WHERE r.id = c.id AND c.take < c.size
+    ),
+    claimed AS (
+        UPDATE allowance_ranges r
+        SET status = 'RESERVED', end_serial = p.end_serial,
+            updated_at = CAST(:now AS timestamp)
+        FROM pieces p
+        WHERE r.id = p.range_id AND p.in_place
+        RETURNING r.id, r.start_serial, r.end_serial
+    ),
+    carved AS (
+        INSERT INTO allowance_ranges (
+            start_serial, end_serial, status, originating_state, allocation_year,
+            bucket, created_at, updated_at
+        )
+        SELECT
+            p.start_serial, p.end_serial, 'RESERVED', p.originating_state,
+            p.allocation_year, p.bucket, CAST(:now AS timestamp), CAST(:now AS timestamp)
+        FROM pieces p
+        WHERE NOT p.in_place
+        RETURNING id, start_serial, end_serial
+    ),
+    reserved AS (
+        SELECT p.order_id, x.id, x.start_serial, x.end_serial
+        FROM (
+            SELECT * FROM carved
+            UNION ALL
+            SELECT * FROM claimed
+        ) x
+        JOIN pieces p ON p.start_serial = x.start_serial
+    ),
+    linked AS (
+        INSERT INTO order_allowances (order_id, range_id)
+        SELECT order_id, id FROM reserved
+    ),
+    taken AS (
+        UPDATE inventory_counters c
+        SET count = c.count - t.taken
+        FROM (SELECT bucket, sum(take) AS taken FROM chosen GROUP BY bucket) t
+        WHERE c.status = 'AVAILABLE' AND c.slot = t.bucket
+    ),
+    counted AS (
+        UPDATE inventory_counters
+        SET count = count + (SELECT quantity FROM filled)
+        WHERE status = 'RESERVED' AND slot = CAST(:slot AS integer)
+        AND (SELECT quantity FROM filled) > 0
+    )
+    SELECT order_id, start_serial, end_serial FROM reserved
+    ORDER BY start_serial
+"""
+)
+
+# Retire every reserved range linked to an order and move the serials from
+# the reserved to the retired count in one statement.
+RETIRE_RANGES_SQL = text(
+    """
+    WITH retired AS (
+        UPDATE allowance_ranges r
+        SET status = 'RETIRED', updated_at = CAST(:now AS timestamp)
+        FROM order_allowances oa
+        WHERE oa.range_id = r.id AND oa.order_id = :order_id
+        AND r.status = 'RESERVED'
+        RETURNING r.end_serial - r.start_serial + 1 AS size
+    ),
+    total AS (
+        SELECT sum(size) AS quantity FROM retired
+    )
+    UPDATE inventory_counters c
+    SET count = c.count + CASE c.status
+        WHEN 'RESERVED' THEN -total.quantity
+        ELSE total.quantity
+    END
+    FROM total
+    WHERE c.slot = CAST(:slot AS integer)
+    AND c.status IN ('RESERVED', 'RETIRED')
+    AND total.quantity IS NOT NULL
+"""
+)
+
+# Bump the retirement history version with the retirement. The row lock
+# orders concurrent retirements, so a reader that sees a version also sees
+# every retirement committed before it.
+BUMP_RETIREMENT_WATERMARK_SQL = text(
+    """
+    INSERT INTO retirement_watermark (id, version, updated_at)
+    VALUES (
+        1,
+        CAST(extract(epoch FROM clock_timestamp()) * 1000000 AS bigint),
+        CAST(:now AS timestamp)
+    )
+    ON CONFLICT (id) DO UPDATE
+    SET version = retirement_watermark.version + 1,
+        updated_at = EXCLUDED.updated_at
+"""
+)
+
+ADJUST_COUNTER_SQL = text(
+    """
+    UPDATE inventory_counters
+    SET count = count + CAST(:delta AS bigint)
+    WHERE status = CAST(:status AS allowancestatus) AND slot = CAST(:slot AS integer)
+"""
+)
+
+# Recompute the counters from the ranges, e.g. after seeding inventory.
+# Available serials are counted per bucket, other statuses on slot 0.
+REBUILD_COUNTERS_SQL = text(
+    """
+    INSERT INTO inventory_counters (status, slot, count)
+    SELECT s.status, slots.slot, COALESCE(t.total, 0)
+    FROM unnest(enum_range(NULL::allowancestatus)) AS s(status)
+    CROSS JOIN generate_series(0, CAST(:slots AS integer) - 1) AS slots(slot)
+    LEFT JOIN (
+        SELECT
+            status,
+            CASE WHEN status = 'AVAILABLE' THEN bucket ELSE 0 END AS slot,
+            sum(end_serial - start_serial + 1) AS total
+        FROM allowance_ranges
+        GROUP BY 1, 2
+    ) t ON t.status = s.status AND t.slot = slots.slot
+    ON CONFLICT (status, slot) DO UPDATE SET count = EXCLUDED.count
+"""
+)
+
+# Split free inventory into one share per allocation bucket. Free serials are
+# laid end to end in serial order and cut into equal runs (never smaller than
+# :min_chunk), so each bucket gets a contiguous run of stock and the table
+# holds about one free range per bucket plus the gaps between free serials.
+REBUCKET_RANGES_SQL = text(
+    """
+    WITH source AS (
+        DELETE FROM allowance_ranges r
+        WHERE r.status = 'AVAILABLE'
+        AND NOT EXISTS (SELECT 1 FROM order_allowances oa WHERE oa.range_id = r.id)
+        RETURNING r.*
+    ),
+    positioned AS (
+        SELECT
+            s.*,
+            CAST(sum(s.end_serial - s.start_serial + 1) OVER (ORDER BY s.start_serial)
+                 - (s.end_serial - s.start_serial + 1) AS bigint) AS position
+        FROM source s
+    ),
+    share AS (
+        SELECT GREATEST(
+            CAST(:min_chunk AS bigint),
+            CAST(ceil(COALESCE(sum(end_serial - start_serial + 1), 0)
+                      / CAST(:buckets AS numeric)) AS bigint)
+        ) AS size
+        FROM source
+    )
+    INSERT INTO allowance_ranges (
+        start_serial, end_serial, status, originating_state, allocation_year,
+        bucket, created_at, updated_at
+    )
+    SELECT
+        GREATEST(p.start_serial, p.start_serial - p.position + k * z.size),
+        LEAST(p.end_serial, p.start_serial - p.position + (k + 1) * z.size - 1),
+        'AVAILABLE', p.originating_state, p.allocation_year,
+        CAST(k % CAST(:buckets AS bigint) AS integer),
+        p.created_at, CAST(:now AS timestamp)
+    FROM positioned p
+    CROSS JOIN share z
+    CROSS JOIN LATERAL generate_series(
+        p.position / z.size,
+        (p.position + p.end_serial - p.start_serial) / z.size
+    ) AS k
+"""
+)
+
+
+def _quote_field(entry: dict[str, Any], field: str) -> Any:
+    """A field of a batch entry's payment quote, or None if it has no quote."""
+    quote = entry.get("quote")
+    return quote[field] if quote else None
+
+
+class InventoryService:
+    """Service that manages allowance inventory as contiguous serial ranges."""
+
+    def __init__(self):
+        self.max_reservation_attempts = 5
+        # Free serials are spread over buckets so concurrent checkouts start in
+        # different places; counters are striped over the same slots
+        self.allocation_buckets = settings.allocation_buckets
+        self.bucket_min_chunk_size = settings.bucket_min_chunk_size
+
+    async def reserve(
+        self,
+        session: AsyncSession,
+        order_id: str,
+        quantity: int,
+        wallet: str,
+        message: Optional[str],
+        quote: Optional[dict[str, Any]] = None,
+    ) -> list[tuple[int, int]]:
+        """
+        Create an order holding ``quantity`` serials with one set-based statement.
+
+        The statement locks and splits the ranges it needs, inserts the order and
+        its range links, and returns the reserved ``(start_serial, end_serial)``
+        pairs without loading ORM objects. The first try goes to one random
+        allocation bucket. If that bucket is short or a concurrent checkout holds
+        part of the needed prefix, the statement writes nothing and the request
+        walks the other buckets round-robin before reserving across buckets.
+        The caller owns the transaction.
+
+        Args:
+            session: Database session
+            order_id: ID of the order to create
+            quantity: Number of serials to reserve
+            wallet: Buyer's wallet address
+            message: Buyer's retirement message
+            quote: Payment quote to lock in on a new order, if any
+
+        Returns:
+            Reserved serial ranges ordered by serial number
+
+        Raises:
+            InsufficientInventoryError: If not enough serials are available
+            ReservationConflictError: If concurrent checkouts kept the ranges locked
+        """
+        params = {
+            "order_id": order_id,
+            "quantity": quantity,
+            "wallet": wallet,
+            "message": message,
+            "quote_wei": quote["eth_amount_wei"] if quote else None,
+            "quote_source": quote["price_source"] if quote else None,
+            "quote_expires_at": quote["expires_at"] if quote else None,
+            "now": datetime.utcnow(),
+            "slot": random.randrange(self.allocation_buckets),
+        }
+
+        start_bucket = random.randrange(self.allocation_buckets)
+        bucket_sets = [[start_bucket]]
+
+        for attempt in range(self.max_reservation_attempts):
+            for buckets in bucket_sets:
+                result = await session.execute(
+                    RESERVE_RANGES_SQL, {**params, "buckets": buckets}
+                )
+                reserved = [(row.start_serial, row.end_serial) for row in result.all()]
+
+                if reserved:
+                    return reserved
+
+            bucket_stock = await self.count_available_by_bucket(session)
+            available = sum(bucket_stock.values())
+            if available < quantity:
+                raise InsufficientInventoryError(available, quantity)
+
+            bucket_sets = self._bucket_rotation(bucket_stock, quantity, start_bucket)
+
+            if attempt:
+                logger.debug(
+                    f"Reservation attempt {attempt + 1} for order {order_id} lost a race, retrying"
+                )
+                await asyncio.sleep(random.uniform(0.01, 0.03) * 2**attempt)
+
+        raise ReservationConflictError(
+            f"Could not lock {quantity} allowances after "
+            f"{self.max_reservation_attempts} attempts"
+        )
+
+    async def reserve_batch(
+        self,
+        session: AsyncSession,
+        entries: list[dict[str, Any]],
+        all_or_nothing: bool = True,
+    ) -> dict[str, list[tuple[int, int]]]:
+        """
+        Create one order per batch entry with a single set-based statement.
+
+        Entries are dicts with ``order_id``, ``quantity``, ``wallet``,
+        ``message`` and an optional payment ``quote``. The whole batch is allocated from one locked prefix of
+        free ranges, trying single buckets that could cover it before reserving
+        across buckets. In best-effort mode only the all-bucket pass may fill
+        part of the batch; entries are then taken in request order, skipping
+        any that no longer fit, so a large entry does not block smaller ones
+        after it. The caller owns the transaction.
+
+        Args:
+            session: Database session
+            entries: Orders to create, in request order
+            all_or_nothing: Reserve every entry or none of them
+
+        Returns:
+            Reserved serial ranges per order ID, for the entries that were filled
+
+        Raises:
+            InsufficientInventoryError: If an all-or-nothing batch cannot be covered
+            ReservationConflictError: If concurrent checkouts kept the ranges locked
+        """
+        total = sum(entry["quantity"] for entry in entries)
+        params = {
+            "order_ids": [entry["order_id"] for entry in entries],
+            "wallets": [entry["wallet"] for entry in entries],
+            "messages": [entry["message"] for entry in entries],
+            "quantities": [entry["quantity"] for entry in entries],
+            "quote_weis": [_quote_field(entry, "eth_amount_wei") for entry in entries],
+            "quote_sources": [_quote_field(entry, "price_source") for entry in entries],
+            "quote_expiries": [_quote_field(entry, "expires_at") for entry in entries],
+            "now": datetime.utcnow(),
+            "slot": random.randrange(self.allocation_buckets),
+        }
+        start_bucket = random.randrange(self.allocation_buckets)
+
+        for attempt in range(self.max_reservation_attempts):
+            bucket_stock = await self.count_available_by_bucket(session)
+            available = sum(bucket_stock.values())
+            if all_or_nothing and available < total:
+                raise InsufficientInventoryError(available, total)
+            if available < min(entry["quantity"] for entry in entries):
+                return {}
+
+            if attempt:
+                logger.debug(
+                    f"Batch reservation attempt {attempt + 1} of {len(entries)} orders lost a race, retrying"
+                )
+                await asyncio.sleep(random.uniform(0.01, 0.03) * 2**attempt)
+
+            for buckets in self._bucket_rotation(bucket_stock, total, start_bucket):
+                whole = all_or_nothing or len(buckets) < self.allocation_buckets
+                result = await session.execute(
+                    RESERVE_BATCH_SQL,
+                    {**params, "buckets": buckets, "all_or_nothing": whole},
+                )
+
+                reserved: dict[str, list[tuple[int, int]]] = {}
+                for row in result.all():
+                    reserved.setdefault(row.order_id, []).append(
+                        (row.start_serial, row.end_serial)
+                    )
+                if reserved:
+                    return reserved
+
+        raise ReservationConflictError(
+            f"Could not lock {total} allowances for {len(entries)} orders after "
+            f"{self.max_reservation_attempts} attempts"
+        )
+
+    def _bucket_rotation(
+        self, bucket_stock: dict[int, int], quantity: int, start_bucket: int
+    ) -> list[list[int]]:
+        """Buckets to try in order: each one that could cover the request alone,
+        round-robin from the request's start bucket, then all buckets together."""
+        rotation = [
+            (start_bucket + offset) % self.allocation_buckets
+            for offset in range(self.allocation_buckets)
+        ]
+        single = [
+            [bucket] for bucket in rotation if bucket_stock.get(bucket, 0) >= quantity
+        ]
+        return single + [list(range(self.allocation_buckets))]
+
+    async def count_available_by_bucket(self, session: AsyncSession) -> dict[int, int]:
+        """Count available serials per allocation bucket."""
+        stmt = select(InventoryCounter.slot, InventoryCounter.count).where(
+            InventoryCounter.status == AllowanceStatus.AVAILABLE
+        )
+        result = await session.execute(stmt)
+        return {slot: int(count) for slot, count in result.all()}
+
+    async def count_available(self, session: AsyncSession) -> int:
+        """Count serials that are currently available."""
+        stmt = select(func.coalesce(func.sum(InventoryCounter.count), 0)).where(
+            InventoryCounter.status == AllowanceStatus.AVAILABLE
+        )
+        result = await session.execute(stmt)
+        return int(result.scalar_one())
+
+    async def get_order_ranges(
+        self, session: AsyncSession, order_id: str
+    ) -> list[AllowanceRange]:
+        """Get all ranges held by an order, ordered by serial number."""
+        stmt = (
+            select(AllowanceRange)
+            .join(OrderAllowance, OrderAllowance.range_id == AllowanceRange.id)
+            .where(OrderAllowance.order_id == order_id)
+            .order_by(AllowanceRange.start_serial)
+        )
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    async def retire(self, session: AsyncSession, order_id: str) -> None:
+        """Mark every range held by an order as retired."""
+        now = datetime.utcnow()
+        await session.execute(
+            RETIRE_RANGES_SQL,
+            {
+                "order_id": order_id,
+                "now": now,
+                "slot": random.randrange(self.allocation_buckets),
+            },
+        )
+        await self.bump_retirement_version(session)
+
+    async def bump_retirement_version(self, session: AsyncSession) -> None:
+        """Mark the retirement history as changed in the session's transaction."""
+        await session.execute(BUMP_RETIREMENT_WATERMARK_SQL, {"now": datetime.utcnow()})
+
+    async def retirement_version(self, session: AsyncSession) -> int:
+        """Current version of the retirement history; 0 before any retirement."""
+        stmt = select(RetirementWatermark.version).where(RetirementWatermark.id == 1)
+        version = (await session.execute(stmt)).scalar_one_or_none()
+        return version or 0
+
+    async def release(self, session: AsyncSession, order_id: str) -> int:
+        """
+        Return an order's ranges to the available pool.
+
+        The ranges are unlinked from the order and merged with adjacent free
+        ranges of the same origin. A range whose bucket has no other free
+        serials may merge into a neighbouring bucket.
+
+        Args:
+            session: Database session
+            order_id: Order whose ranges are released
+
+        Returns:
+            Number of serials released
+        """
+        ranges = await self.get_order_ranges(session, order_id)
+        await session.execute(
+            delete(OrderAllowance).where(OrderAllowance.order_id == order_id)
+        )
+
+        released_count = 0
+        released_by_status: dict[AllowanceStatus, int] = {}
+        released_by_bucket: dict[int, int] = {}
+        bucket_stock = await self.count_available_by_bucket(session) if ranges else {}
+        now = datetime.utcnow()
+
+        for allowance_range in ranges:
+            quantity = allowance_range.quantity
+            previous_status = AllowanceStatus(allowance_range.status)
+            released_by_status[previous_status] = (
+                released_by_status.get(previous_status, 0) + quantity
+            )
+            allowance_range.status = AllowanceStatus.AVAILABLE
+            allowance_range.updated_at = now
+            released_count += quantity
+
+            bucket = await self._coalesce(
+                session,
+                allowance_range,
+                across_buckets=bucket_stock.get(allowance_range.bucket, 0) == 0,
+            )
+            released_by_bucket[bucket] = released_by_bucket.get(bucket, 0) + quantity
+            bucket_stock[bucket] = bucket_stock.get(bucket, 0) + quantity
+
+        for previous_status, quantity in released_by_status.items():
+            await self._adjust_counter(session, previous_status, -quantity)
+        for bucket, quantity in released_by_bucket.items():
+            await self._adjust_counter(
+                session, AllowanceStatus.AVAILABLE, quantity, slot=bucket
+            )
+
+        return released_count
+
+    async def _adjust_counter(
+        self,
+        session: AsyncSession,
+        status: AllowanceStatus,
+        delta: int,
+        slot: Optional[int] = None,
+    ) -> None:
+        """Add ``delta`` serials to a status count, on a random slot by default."""
+        if slot is None:
+            slot = random.randrange(self.allocation_buckets)
+        await session.execute(
+            ADJUST_COUNTER_SQL, {"status": status.value, "delta": delta, "slot": slot}
+        )
+
+    async def rebuild_counters(self, session: AsyncSession) -> None:
+        """Recompute the inventory counters from the ranges."""
+        await session.execute(REBUILD_COUNTERS_SQL, {"slots": self.allocation_buckets})
+
+    async def rebucket(self, session: AsyncSession) -> None:
+        """
+        Spread free serials evenly over the allocation buckets.
+
+        Each bucket gets one contiguous run of an equal share of free serials,
+        at least ``bucket_min_chunk_size`` long. Counters must be rebuilt
+        afterwards.
+        """
+        await session.execute(
+            REBUCKET_RANGES_SQL,
+            {
+                "min_chunk": self.bucket_min_chunk_size,
+                "buckets": self.allocation_buckets,
+                "now": datetime.utcnow(),
+            },
+        )
+
+    async def _coalesce(
+        self,
+        session: AsyncSession,
+        allowance_range: AllowanceRange,
+        across_buckets: bool = False,
+    ) -> int:
+        """
+        Merge an available range with its free neighbours of the same origin.
+
+        Neighbours merge within the range's bucket. With ``across_buckets``,
+        used when that bucket has no other free serials, the range joins a
+        neighbouring bucket instead, so emptied buckets stop splitting runs
+        of adjacent serials; serials that change bucket move counters too.
+
+        Returns:
+            Bucket holding the merged range
+        """
+        conditions = [
+            AllowanceRange.status == AllowanceStatus.AVAILABLE,
+            AllowanceRange.id != allowance_range.id,
+            AllowanceRange.originating_state.is_not_distinct_from(
+                allowance_range.originating_state
+            ),
+            AllowanceRange.allocation_year.is_not_distinct_from(
+                allowance_range.allocation_year
+            ),
+            or_(
+                AllowanceRange.end_serial == allowance_range.start_serial - 1,
+                AllowanceRange.start_serial == allowance_range.end_serial + 1,
+            ),
+        ]
+        if not across_buckets:
+            conditions.append(AllowanceRange.bucket == allowance_range.bucket)
+        stmt = (
+            select(AllowanceRange)
+            .where(*conditions)
+            .order_by(AllowanceRange.start_serial)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(stmt)
+        neighbours = result.scalars().all()
+
+        # The merged range takes the first neighbouring bucket it can join
+        bucket = next(
+            (n.bucket for n in neighbours if n.bucket != allowance_range.bucket),
+            allowance_range.bucket,
+        )
+        for neighbour in neighbours:
+            if neighbour.bucket != bucket:
+                await self._adjust_counter(
+                    session,
+                    AllowanceStatus.AVAILABLE,
+                    -neighbour.quantity,
+                    slot=neighbour.bucket,
+                )
+                await self._adjust_counter(
+                    session, AllowanceStatus.AVAILABLE, neighbour.quantity, slot=bucket
+                )
+
+        # Only ever move end_serial so the unique start_serial is never reused
+        survivor = allowance_range
+        for neighbour in neighbours:
+            if neighbour.end_serial < survivor.start_serial:
+                neighbour.end_serial = survivor.end_serial
+                await session.delete(survivor)
+                survivor = neighbour
+            else:
+                survivor.end_serial = neighbour.end_serial
+                await session.delete(neighbour)
+        survivor.bucket = bucket
+        return bucket
+
+    async def count_by_status(self, session: AsyncSession) -> dict[str, int]:
+        """Count serials per inventory status."""
+        stmt = select(
+            InventoryCounter.status, func.sum(InventoryCounter.count)
+        ).group_by(InventoryCounter.status)
+        result = await session.execute(stmt)
+
+        counts = {status.value: 0 for status in AllowanceStatus}
+        for status, total in result.all():
+            counts[AllowanceStatus(status).value] = int(total or 0)
+        return counts
+
+
+# Global instance
+inventory_service = InventoryService()
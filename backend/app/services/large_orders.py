@@ -0,0 +1,361 @@
+"""Large orders reserved in bounded, separately committed chunks."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import settings
+from app.database import async_session
+from app.models.large_order_jobs import LargeOrderJob, LargeOrderJobState
+from app.models.orders import Order, OrderState
+from app.services.inventory import InsufficientInventoryError, inventory_service
+from app.services.order_events import OrderEvent, order_event_bus
+
+logger = logging.getLogger(__name__)
+
+
+# Lease due fills to this worker, as for payment jobs. A fill whose worker
+# died is taken over once its lease runs out and resumes where it stopped.
+LEASE_FILLS_SQL = text(
+    """
+    UPDATE large_order_jobs AS j
+    SET attempts = j.attempts + 1,
+        locked_until = CAST(:locked_until AS timestamp),
+        updated_at = CAST(:now AS timestamp)
+    FROM (
+        SELECT order_id
+        FROM large_order_jobs
+        WHERE status = 'QUEUED'
+          AND run_at <= CAST(:now AS timestamp)
+          AND (locked_until IS NULL OR locked_until <= CAST(:now AS timestamp))
+        ORDER BY run_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) AS due
+    WHERE j.order_id = due.order_id
+    RETURNING j.order_id, j.attempts
+"""
+)
+
+# Renew a fill's lease with each committed chunk
+RENEW_FILL_SQL = text(
+    """
+    UPDATE large_order_jobs
+    SET locked_until = CAST(:locked_until AS timestamp),
+        updated_at = CAST(:now AS timestamp)
+    WHERE order_id = :order_id AND attempts = :attempts
+"""
+)
+
+# Record the outcome of one attempt, unless another worker has taken it over
+FINISH_FILL_SQL = text(
+    """
+    UPDATE large_order_jobs
+    SET status = CAST(:status AS largeorderjobstate),
+        run_at = CAST(:run_at AS timestamp),
+        locked_until = NULL,
+        last_error = :error,
+        updated_at = CAST(:now AS timestamp)
+    WHERE order_id = :order_id AND attempts = :attempts
+"""
+)
+
+
+class LargeOrderService:
+    """Service that reserves orders above the checkout cap one chunk at a time.
+
+    A large order is created in the RESERVING state together with a queued
+    fill job. Workers lease fill jobs like payment jobs; every chunk is an
+    ordinary reservation committed on its own with the order's progress, so
+    row locks are held no longer than for a normal checkout and a fill cut
+    short by a restart resumes from ``num_reserved`` once its lease lapses.
+    The order becomes RESERVED, and its payment window starts, once the last
+    chunk lands. If stock runs out or the attempts are used up, everything
+    reserved so far is released and the order fails.
+    """
+
+    def __init__(self):
+        self.chunk_size = settings.large_order_chunk_size
+        self.max_allowances = settings.max_large_order_allowances
+        self.batch_size = settings.large_order_job_batch_size
+        self.max_attempts = settings.large_order_job_max_attempts
+        self.retry_base = settings.large_order_job_retry_base_seconds
+        self.visibility_timeout = timedelta(
+            seconds=settings.large_order_job_visibility_timeout_seconds
+        )
+        self._tasks: set[asyncio.Task] = set()
+
+    async def create(
+        self,
+        session: AsyncSession,
+        order_id: str,
+        quantity: int,
+        wallet: str,
+        message: Optional[str],
+        quote: Optional[dict[str, Any]] = None,
+    ) -> Order:
+        """
+        Create a large order and queue its fill, inside the caller's transaction.
+
+        Args:
+            session: Database session
+            order_id: ID of the order to create
+            quantity: Number of serials the order needs
+            wallet: Buyer's wallet address
+            message: Buyer's retirement message
+            quote: Payment quote to lock in on the order, if any
+
+        Returns:
+            The new, unfilled order
+
+        Raises:
+            InsufficientInventoryError: If the stock cannot cover the order
+        """
+        available = await inventory_service.count_available(session)
+        if available < quantity:
+            raise InsufficientInventoryError(available, quantity)
+
+        order = Order(
+            order_id=order_id,
+            status=OrderState.RESERVING,
+            wallet=wallet,
+            message=message,
+            num_allowances=quantity,
+            num_reserved=0,
+            quote_wei=quote["eth_amount_wei"] if quote else None,
+            quote_source=quote["price_source"] if quote else None,
+            quote_expires_at=quote["expires_at"] if quote else None,
+        )
+        session.add(order)
+        # The job references the order, so the order is written first
+        await session.flush()
+        session.add(LargeOrderJob(order_id=order_id))
+        return order
+
+    async def lease(self, limit: int) -> list[tuple[str, int]]:
+        """Lease up to ``limit`` due fills; returns (order_id, attempt)."""
+        now = datetime.utcnow()
+        async with async_session() as session:
+            result = await session.execute(
+                LEASE_FILLS_SQL,
+                {
+                    "now": now,
+                    "locked_until": now + self.visibility_timeout,
+                    "limit": limit,
+                },
+            )
+            jobs = [tuple(row) for row in result.all()]
+            await session.commit()
+            return jobs
+
+    async def poll(self) -> int:
+        """
+        Lease due fills and start running them without waiting for them.
+
+        At most ``batch_size`` fills run at once in this process.
+
+        Returns:
+            Number of fills started
+        """
+        capacity = self.batch_size - len(self._tasks)
+        if capacity <= 0:
+            return 0
+
+        jobs = await self.lease(capacity)
+        for order_id, attempt in jobs:
+            task = asyncio.create_task(self.run_job(order_id, attempt))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(jobs)
+
+    async def stop(self) -> None:
+        """Cancel running fills; their leases lapse and another worker resumes them."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run_job(self, order_id: str, attempt: int) -> dict[str, any]:
+        """
+        Run one leased attempt of a fill and record its outcome.
+
+        Args:
+            order_id: Order to fill
+            attempt: Attempt number given by the lease
+
+        Returns:
+            Dict with the fill result
+        """
+        result = await self.fill(order_id, attempt)
+
+        now = datetime.utcnow()
+        error = result.get("error")
+        if result["success"]:
+            job_status, run_at = LargeOrderJobState.DONE, now
+        elif result.get("retry") and attempt < self.max_attempts:
+            delay = self.retry_base * 2 ** (attempt - 1)
+            job_status, run_at = LargeOrderJobState.QUEUED, now + timedelta(
+                seconds=delay
+            )
+        else:
+            job_status, run_at = LargeOrderJobState.FAILED, now
+            result["released_count"] = await self.abandon(order_id)
+
+        async with async_session() as session:
+            await session.execute(
+                FINISH_FILL_SQL,
+                {
+                    "order_id": order_id,
+                    "attempts": attempt,
+                    "status": job_status.value,
+                    "run_at": run_at,
+                    "error": error[:500] if error else None,
+                    "now": now,
+                },
+            )
+            await session.commit()
+
+        if job_status == LargeOrderJobState.QUEUED:
+            logger.info(
+                f"Large order {order_id} fill will retry at {run_at.isoformat()} "
+                f"(attempt {attempt}): {error}"
+            )
+        elif job_status == LargeOrderJobState.FAILED:
+            logger.error(
+                f"Large order {order_id} fill failed after {attempt} attempts: {error}"
+            )
+        return result
+
+    async def fill(self, order_id: str, attempt: int) -> dict[str, any]:
+        """
+        Reserve a large order chunk by chunk, committing after each chunk.
+
+        Filling starts from the serials already reserved, so a fill cut short
+        by a restart or an error carries on where it stopped.
+
+        Args:
+            order_id: Order to fill
+            attempt: Attempt of the fill job, whose lease each chunk renews
+
+        Returns:
+            Dict with the fill result; ``retry`` tells whether it may be retried
+        """
+        chunks = 0
+        while True:
+            try:
+                async with async_session() as session:
+                    # The order row is locked only for the length of one chunk
+                    stmt = (
+                        select(Order)
+                        .where(Order.order_id == order_id)
+                        .with_for_update()
+                    )
+                    order = (await session.execute(stmt)).scalar_one_or_none()
+
+                    if order and order.status == OrderState.RESERVED:
+                        # The last chunk landed before the previous attempt ended
+                        return {"success": True, "order_id": order_id, "chunks": chunks}
+                    if not order or order.status != OrderState.RESERVING:
+                        logger.warning(
+                            f"Large order {order_id} is no longer being reserved"
+                        )
+                        return {
+                            "success": False,
+                            "retry": False,
+                            "error": "Order is not being reserved",
+                        }
+
+                    quantity = min(
+                        self.chunk_size, order.num_allowances - order.num_reserved
+                    )
+                    await inventory_service.reserve(
+                        session,
+                        order_id=order_id,
+                        quantity=quantity,
+                        wallet=order.wallet,
+                        message=order.message,
+                    )
+                    chunks += 1
+
+                    done = order.num_reserved + quantity >= order.num_allowances
+                    now = datetime.utcnow()
+                    if done:
+                        order.status = OrderState.RESERVED
+                        order.timestamp = now
+                        order.updated_at = now
+                        await order_event_bus.publish(
+                            session, order_id, OrderState.RESERVED, OrderEvent.RESERVED
+                        )
+                    else:
+                        await order_event_bus.publish(
+                            session,
+                            order_id,
+                            OrderState.RESERVING,
+                            OrderEvent.RESERVING,
+                        )
+                    await session.execute(
+                        RENEW_FILL_SQL,
+                        {
+                            "order_id": order_id,
+                            "attempts": attempt,
+                            "locked_until": now + self.visibility_timeout,
+                            "now": now,
+                        },
+                    )
+
+                    await session.commit()
+
+                if done:
+                    logger.info(f"Large order {order_id} reserved in {chunks} chunks")
+                    return {"success": True, "order_id": order_id, "chunks": chunks}
+
+            except InsufficientInventoryError as e:
+                logger.error(
+                    f"Large order {order_id} ran out of stock after {chunks} chunks"
+                )
+                return {
+                    "success": False,
+                    "retry": False,
+                    "error": str(e),
+                    "chunks": chunks,
+                }
+            except Exception as e:
+                logger.error(
+                    f"Large order {order_id} chunk failed after {chunks} chunks: {str(e)}"
+                )
+                return {
+                    "success": False,
+                    "retry": True,
+                    "error": str(e),
+                    "chunks": chunks,
+                }
+
+    async def abandon(self, order_id: str) -> int:
+        """Fail a partly reserved order and return its serials to the pool."""
+        async with async_session() as session:
+            stmt = select(Order).where(Order.order_id == order_id).with_for_update()
+            order = (await session.execute(stmt)).scalar_one_or_none()
+            if not order or order.status != OrderState.RESERVING:
+                return 0
+
+            released = await inventory_service.release(session, order_id)
+            order.status = OrderState.FAILED
+            order.updated_at = datetime.utcnow()
+            await order_event_bus.publish(
+                session, order_id, OrderState.FAILED, OrderEvent.FAILED
+            )
+            await session.commit()
+
+            logger.warning(
+                f"Released {released} serials of abandoned large order {order_id}"
+            )
+            return released
+
+
+# Global instance
+large_order_service = LargeOrderService()
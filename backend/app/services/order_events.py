@@ -0,0 +1,248 @@
+"""Order state change events over Postgres LISTEN/NOTIFY."""
+
+import asyncio
+import json
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.models.orders import OrderState
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_CHANNEL = "order_events"
+
+# NOTIFY is transactional: events are delivered when the publishing
+# transaction commits and dropped if it rolls back
+NOTIFY_SQL = text(
+    """
+    SELECT pg_notify(:channel, payload)
+    FROM unnest(CAST(:payloads AS text[])) AS payload
+"""
+)
+
+
+class OrderEvent(str, Enum):
+    RESERVING = "reserving"  # Large order created or one of its chunks reserved
+    RESERVED = "reserved"
+    PAYMENT_QUEUED = "payment_queued"
+    PAYMENT_RECORDED = "payment_recorded"
+    DISTRIBUTING = "distributing"
+    RETIRED = "retired"
+    FAILED = "failed"
+    EXPIRED = "expired"
+    # Sent to every subscriber after the listener reconnects: events may
+    # have been missed, so current state has to be reread
+    RESYNC = "resync"
+
+
+class OrderEventBus:
+    """Publishes order transitions and fans them out to in-process subscribers.
+
+    Publishers NOTIFY from inside the transaction that changes the order, so
+    every API worker and background process sees the same events. Each process
+    holds one dedicated LISTEN connection, started with the app, and hands
+    every event to the subscribers of that order and to the subscribers of all
+    orders. Events carry no state beyond the order's new OrderState; consumers
+    reread what they need.
+    """
+
+    def __init__(self):
+        self.queue_size = settings.order_events_queue_size
+        self.reconnect_seconds = settings.order_events_reconnect_seconds
+        self.health_check_seconds = settings.order_events_health_check_seconds
+        self.connected = False
+        self._subscribers: dict[Optional[str], set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._received = 0
+        self._dropped = 0
+        self._reconnects = 0
+
+    async def publish(
+        self,
+        session: AsyncSession,
+        order_id: str,
+        state: OrderState,
+        event: OrderEvent,
+    ) -> None:
+        """
+        Publish a transition of one order with the session's transaction.
+
+        Args:
+            session: Session whose transaction changes the order
+            order_id: Order that changed
+            state: The order's state after the change
+            event: What happened to the order
+        """
+        await self.publish_many(session, [order_id], state, event)
+
+    async def publish_many(
+        self,
+        session: AsyncSession,
+        order_ids: list[str],
+        state: OrderState,
+        event: OrderEvent,
+    ) -> None:
+        """
+        Publish the same transition of several orders in one statement.
+
+        Args:
+            session: Session whose transaction changes the orders
+            order_ids: Orders that changed
+            state: The orders' state after the change
+            event: What happened to the orders
+        """
+        if not order_ids:
+            return
+
+        payloads = [
+            json.dumps(
+                {"order_id": order_id, "state": state.value, "event": event.value}
+            )
+            for order_id in order_ids
+        ]
+        await session.execute(
+            NOTIFY_SQL, {"channel": ORDER_EVENTS_CHANNEL, "payloads": payloads}
+        )
+
+    @contextmanager
+    def subscribe(self, order_id: Optional[str] = None) -> Iterator[asyncio.Queue]:
+        """
+        Receive the events of one order, or of all orders, while in the block.
+
+        Each event is a dict with ``order_id``, ``state`` and ``event``. When a
+        subscriber falls ``order_events_queue_size`` events behind, further
+        events are dropped for it; the queued ones already tell it to reread.
+
+        Args:
+            order_id: Order to follow, or None for every order
+
+        Yields:
+            Queue the events are put on
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(order_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(order_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[order_id]
+
+    def dispatch(self, event: dict[str, Optional[str]]) -> None:
+        """Hand an event to the subscribers of its order and of all orders."""
+        if event.get("event") == OrderEvent.RESYNC.value:
+            queues = [
+                q for subscribers in self._subscribers.values() for q in subscribers
+            ]
+        else:
+            queues = [
+                *self._subscribers.get(event.get("order_id"), ()),
+                *self._subscribers.get(None, ()),
+            ]
+
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._dropped += 1
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed order event: {payload!r}")
+            return
+        self._received += 1
+        self.dispatch(event)
+
+    async def start(self) -> None:
+        """Start listening for order events in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop listening and close the listener connection."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _listen(self) -> None:
+        """Hold the LISTEN connection, reconnecting whenever it is lost."""
+        engine = create_async_engine(settings.database_url, poolclass=NullPool)
+        try:
+            while True:
+                connection: Optional[AsyncConnection] = None
+                try:
+                    connection = await engine.connect()
+                    raw = await connection.get_raw_connection()
+                    listener = raw.driver_connection
+
+                    lost = asyncio.Event()
+                    listener.add_termination_listener(lambda _, lost=lost: lost.set())
+                    await listener.add_listener(ORDER_EVENTS_CHANNEL, self._on_notify)
+                    self.connected = True
+                    logger.info("Listening for order events")
+
+                    # Whatever was published while disconnected is gone
+                    if self._reconnects:
+                        self.dispatch(
+                            {"order_id": None, "event": OrderEvent.RESYNC.value}
+                        )
+
+                    while not lost.is_set():
+                        try:
+                            await asyncio.wait_for(
+                                lost.wait(), self.health_check_seconds
+                            )
+                        except asyncio.TimeoutError:
+                            # A half-open connection never reports termination
+                            await asyncio.wait_for(
+                                listener.fetchval("SELECT 1"), self.health_check_seconds
+                            )
+                    logger.warning("Order event listener connection closed")
+
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Order event listener failed: {str(e)}")
+                finally:
+                    self.connected = False
+                    if connection is not None:
+                        try:
+                            await connection.close()
+                        except Exception:
+                            pass
+
+                self._reconnects += 1
+                await asyncio.sleep(self.reconnect_seconds)
+        finally:
+            await engine.dispose()
+
+    def stats(self) -> dict[str, any]:
+        """Listener state and event counters for health checks."""
+        return {
+            "connected": self.connected,
+            "subscribers": sum(len(q) for q in self._subscribers.values()),
+            "received": self._received,
+            "dropped": self._dropped,
+            "reconnects": self._reconnects,
+        }
+
+
+# Global instance
+order_event_bus = OrderEventBus()
@@ -0,0 +1,415 @@
+"""Durable queue of confirmed payments, validated and fulfilled by workers."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import settings
+from app.database import async_session
+from app.models.orders import Order, OrderState
+from app.models.payment_jobs import PaymentJob, PaymentJobState
+from app.services.alchemy import alchemy_service
+from app.services.order_events import OrderEvent, order_event_bus
+from app.services.payment_validator import payment_validator
+from app.services.transaction_monitor import transaction_monitor
+from app.utils.cache import MISSING, BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionReplayError(Exception):
+    """Raised when a transaction is already registered to another order."""
+
+    def __init__(self, tx_hash: str):
+        self.tx_hash = tx_hash
+        super().__init__("Transaction was already used for another order")
+
+
+# Queue a payment for an order. A failed job is requeued in place with the new
+# transaction; a queued or finished one is left alone and nothing is returned.
+ENQUEUE_JOB_SQL = text(
+    """
+    INSERT INTO payment_jobs (
+        order_id, tx_hash, status, attempts, run_at, created_at, updated_at
+    )
+    VALUES (
+        :order_id, :tx_hash, 'QUEUED', 0,
+        CAST(:now AS timestamp), CAST(:now AS timestamp), CAST(:now AS timestamp)
+    )
+    ON CONFLICT (order_id) DO UPDATE
+    SET tx_hash = EXCLUDED.tx_hash,
+        status = 'QUEUED',
+        attempts = 0,
+        run_at = EXCLUDED.run_at,
+        locked_until = NULL,
+        last_error = NULL,
+        updated_at = EXCLUDED.updated_at
+    WHERE payment_jobs.status = 'FAILED'
+    RETURNING order_id
+"""
+)
+
+# Lease due jobs to this worker. Jobs leased by a live worker are invisible
+# until their lease runs out; rows locked by a concurrent lease are skipped.
+LEASE_JOBS_SQL = text(
+    """
+    UPDATE payment_jobs AS j
+    SET attempts = j.attempts + 1,
+        locked_until = CAST(:locked_until AS timestamp),
+        updated_at = CAST(:now AS timestamp)
+    FROM (
+        SELECT order_id
+        FROM payment_jobs
+        WHERE status = 'QUEUED'
+          AND run_at <= CAST(:now AS timestamp)
+          AND (locked_until IS NULL OR locked_until <= CAST(:now AS timestamp))
+        ORDER BY run_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) AS due
+    WHERE j.order_id = due.order_id
+    RETURNING j.order_id, j.tx_hash, j.attempts
+"""
+)
+
+# Record the outcome of one attempt. The attempt number guards against a
+# worker whose lease expired overwriting the job after another worker took it.
+FINISH_JOB_SQL = text(
+    """
+    UPDATE payment_jobs
+    SET status = CAST(:status AS paymentjobstate),
+        run_at = CAST(:run_at AS timestamp),
+        locked_until = NULL,
+        last_error = :error,
+        updated_at = CAST(:now AS timestamp)
+    WHERE order_id = :order_id AND attempts = :attempts
+"""
+)
+
+
+class PaymentJobService:
+    """Service that validates and fulfils confirmed payments off the request path.
+
+    The confirm endpoint only stores the order's transaction as a queued job.
+    Workers lease due jobs with ``FOR UPDATE SKIP LOCKED``, so any number of
+    processes can share the queue. A lease hides a job for the visibility
+    timeout; a worker that dies mid-job simply lets it lapse and the job runs
+    again, so every job runs at least once. Validating and recording the
+    payment are safe to repeat; token distribution is claimed atomically on
+    the order, so a repeated run never sends $PR twice. No session is held
+    across chain calls: each database step is its own short transaction.
+    Retryable failures are pushed back with exponential backoff until the
+    attempts run out; a payment whose order ended failed or expired fails
+    the job.
+    """
+
+    def __init__(self):
+        self.batch_size = settings.payment_job_batch_size
+        self.max_attempts = settings.payment_job_max_attempts
+        self.retry_base = settings.payment_job_retry_base_seconds
+        self.retry_max = settings.payment_job_retry_max_seconds
+        self.visibility_timeout = timedelta(
+            seconds=settings.payment_job_visibility_timeout_seconds
+        )
+        self._tasks: set[asyncio.Task] = set()
+        # Hashes recently found registered, mapped to their order, so replays
+        # are turned away without a database round trip
+        self.used_hashes = BoundedTTLCache(settings.used_tx_hash_cache_max_entries)
+        self.used_hash_ttl = settings.used_tx_hash_cache_seconds
+
+    async def check_replay(
+        self, session: AsyncSession, order_id: str, tx_hash: str
+    ) -> None:
+        """
+        Reject a transaction already registered to another order.
+
+        Runs before any chain call: a hit in the recent-replay cache answers at
+        once, otherwise one probe of the unique tx_hash index does.
+
+        Args:
+            session: Database session
+            order_id: Order the payment is being confirmed for
+            tx_hash: Payment transaction hash
+
+        Raises:
+            TransactionReplayError: If another order already holds the transaction
+        """
+        owner = self.used_hashes.get(tx_hash)
+        if owner is MISSING:
+            result = await session.execute(
+                select(PaymentJob.order_id).where(PaymentJob.tx_hash == tx_hash)
+            )
+            owner = result.scalar_one_or_none()
+
+        if owner is not None and owner != order_id:
+            self.used_hashes.set(tx_hash, owner, ttl=self.used_hash_ttl)
+            logger.warning(
+                f"CRITICAL: Transaction replay rejected | tx_hash={tx_hash} | "
+                f"order_id={order_id} | registered_order_id={owner}"
+            )
+            raise TransactionReplayError(tx_hash)
+
+    async def enqueue(self, session: AsyncSession, order_id: str, tx_hash: str) -> bool:
+        """
+        Queue a payment inside the caller's transaction.
+
+        Args:
+            session: Database session
+            order_id: Order the payment is for
+            tx_hash: Payment transaction hash
+
+        Returns:
+            True if the job was queued, False if the order already has one
+
+        Raises:
+            TransactionReplayError: If a concurrent confirm registered the
+                transaction to another order first
+        """
+        try:
+            result = await session.execute(
+                ENQUEUE_JOB_SQL,
+                {"order_id": order_id, "tx_hash": tx_hash, "now": datetime.utcnow()},
+            )
+        except IntegrityError as e:
+            if "ix_payment_jobs_tx_hash" not in str(e.orig):
+                raise
+            raise TransactionReplayError(tx_hash) from e
+        return result.scalar_one_or_none() is not None
+
+    async def get_job(
+        self, session: AsyncSession, order_id: str
+    ) -> Optional[PaymentJob]:
+        """Return the payment job of an order, if any."""
+        return await session.get(PaymentJob, order_id)
+
+    async def lease(self, limit: int) -> list[tuple[str, str, int]]:
+        """Lease up to ``limit`` due jobs; returns (order_id, tx_hash, attempt)."""
+        now = datetime.utcnow()
+        async with async_session() as session:
+            result = await session.execute(
+                LEASE_JOBS_SQL,
+                {
+                    "now": now,
+                    "locked_until": now + self.visibility_timeout,
+                    "limit": limit,
+                },
+            )
+            jobs = [tuple(row) for row in result.all()]
+            await session.commit()
+        return jobs
+
+    async def poll(self) -> int:
+        """
+        Lease due jobs and start running them without waiting for them.
+
+        At most ``batch_size`` jobs run at once in this process.
+
+        Returns:
+            Number of jobs started
+        """
+        capacity = self.batch_size - len(self._tasks)
+        if capacity <= 0:
+            return 0
+
+        jobs = await self.lease(capacity)
+        for order_id, tx_hash, attempt in jobs:
+            task = asyncio.create_task(self.run_job(order_id, tx_hash, attempt))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(jobs)
+
+    async def run_due_jobs(self) -> dict[str, any]:
+        """Lease due jobs and run them to completion (used by the admin trigger)."""
+        jobs = await self.lease(self.batch_size)
+        results = await asyncio.gather(*(self.run_job(*job) for job in jobs))
+        return {
+            "success": True,
+            "processed": len(jobs),
+            "completed": sum(1 for result in results if result["success"]),
+        }
+
+    async def stop(self) -> None:
+        """Cancel running jobs; their leases lapse and another worker retries them."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run_job(
+        self, order_id: str, tx_hash: str, attempt: int
+    ) -> dict[str, any]:
+        """
+        Run one leased attempt of a job and record its outcome.
+
+        Args:
+            order_id: Order the payment is for
+            tx_hash: Payment transaction hash
+            attempt: Attempt number given by the lease
+
+        Returns:
+            Dict with the attempt result
+        """
+        try:
+            result = await self._process(order_id, tx_hash)
+        except Exception as e:
+            logger.error(f"Payment job for order {order_id} raised: {str(e)}")
+            result = {"success": False, "retry": True, "error": str(e)}
+
+        now = datetime.utcnow()
+        error = result.get("error")
+        if result["success"]:
+            job_status, run_at = PaymentJobState.DONE, now
+        elif result.get("retry") and attempt < self.max_attempts:
+            delay = min(self.retry_base * 2 ** (attempt - 1), self.retry_max)
+            job_status, run_at = PaymentJobState.QUEUED, now + timedelta(seconds=delay)
+        else:
+            job_status, run_at = PaymentJobState.FAILED, now
+
+        async with async_session() as session:
+            await session.execute(
+                FINISH_JOB_SQL,
+                {
+                    "order_id": order_id,
+                    "attempts": attempt,
+                    "status": job_status.value,
+                    "run_at": run_at,
+                    "error": error[:500] if error else None,
+                    "now": now,
+                },
+            )
+            await session.commit()
+
+        if job_status == PaymentJobState.QUEUED:
+            logger.info(
+                f"Payment job for order {order_id} will retry at {run_at.isoformat()} "
+                f"(attempt {attempt}): {error}"
+            )
+        elif job_status == PaymentJobState.FAILED:
+            logger.error(
+                f"CRITICAL: Payment job failed | order_id={order_id} | "
+                f"tx_hash={tx_hash} | attempts={attempt} | error={error}"
+            )
+        return result
+
+    async def _process(self, order_id: str, tx_hash: str) -> dict[str, any]:
+        """Validate a queued payment, record it on the order and fulfil it."""
+        async with async_session() as session:
+            order = await session.get(Order, order_id)
+        outcome = self._order_outcome(order)
+        if outcome:
+            return outcome
+
+        if order.tx_hash is None:
+            # Chain calls are made with no session open
+            async with alchemy_service.fetch_context():
+                validation = await payment_validator.validate_payment_transaction(
+                    tx_hash=tx_hash,
+                    num_allowances=order.num_allowances,
+                    quote_wei=int(order.quote_wei) if order.quote_wei else None,
+                    quote_expires_at=order.quote_expires_at,
+                    # A job that waited in the queue keeps the quote it was sent with
+                    submitted_at=order.paid_at,
+                )
+
+            if "valid" not in validation:
+                # The chain or the price could not be read; the payment may still be good
+                return {
+                    "success": False,
+                    "retry": True,
+                    "error": f"Payment validation failed: {validation.get('error')}",
+                }
+            if not validation["valid"]:
+                if validation.get("status") == "pending":
+                    return {
+                        "success": False,
+                        "retry": True,
+                        "error": "Transaction is pending confirmation",
+                    }
+                # Wrong recipient or amount, failed or missing transaction
+                return {
+                    "success": False,
+                    "retry": False,
+                    "error": f"Invalid payment: {validation.get('error')}",
+                }
+
+            async with async_session() as session:
+                stmt = select(Order).where(Order.order_id == order_id).with_for_update()
+                order = (await session.execute(stmt)).scalar_one_or_none()
+                outcome = self._order_outcome(order)
+                if outcome:
+                    return outcome
+                if order.tx_hash is None:
+                    order.tx_hash = tx_hash
+                    order.updated_at = datetime.utcnow()
+                    await order_event_bus.publish(
+                        session,
+                        order_id,
+                        OrderState.RESERVED,
+                        OrderEvent.PAYMENT_RECORDED,
+                    )
+                await session.commit()
+
+            logger.info(
+                f"CRITICAL: Payment confirmed and stored | "
+                f"order_id={order_id} | tx_hash={tx_hash} | "
+                f"wallet={order.wallet} | num_allowances={order.num_allowances}"
+            )
+
+        if order.tx_hash != tx_hash:
+            return {
+                "success": False,
+                "retry": False,
+                "error": "Order was paid with another transaction",
+            }
+
+        # Distribution and retirement; the transaction monitor keeps watching
+        # the order if the payment is not final yet
+        result = await transaction_monitor.process_single_order(order_id)
+        if not result["success"]:
+            # The next attempt finishes at once if the order has moved on meanwhile
+            return {"success": False, "retry": True, "error": result.get("error")}
+        if result.get("status") in (OrderState.FAILED, OrderState.EXPIRED):
+            return {
+                "success": False,
+                "retry": False,
+                "error": f"Order ended {result['status'].value} while fulfilling the payment",
+            }
+        return result
+
+    def _order_outcome(self, order: Optional[Order]) -> Optional[dict[str, any]]:
+        """Result of a job whose order no longer awaits payment, else None."""
+        if order is None:
+            return {"success": False, "retry": False, "error": "Order not found"}
+        if order.status == OrderState.RESERVED:
+            return None
+        if order.status == OrderState.RETIRED:
+            return {"success": True, "message": "Order is already retired"}
+        # Failed or expired by an earlier run or cleanup; the payment is kept
+        # on the failed job for follow-up
+        return {
+            "success": False,
+            "retry": False,
+            "error": f"Order is {order.status.value}, payment was not fulfilled",
+        }
+
+    async def get_queue_stats(self) -> dict[str, int]:
+        """Count payment jobs by state."""
+        async with async_session() as session:
+            result = await session.execute(
+                select(PaymentJob.status, func.count()).group_by(PaymentJob.status)
+            )
+            stats = {state.value.lower(): 0 for state in PaymentJobState}
+            for job_status, count in result.all():
+                stats[job_status.value.lower()] = count
+        stats["running"] = len(self._tasks)
+        return stats
+
+
+# Global instance
+payment_job_service = PaymentJobService()
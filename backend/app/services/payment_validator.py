@@ -1,6 +1,7 @@
 """Payment validation service for enhanced payment confirmation."""
 
 import logging
+from datetime import datetime
 from typing import Dict, Optional
 
 from app.config import settings
@@ -29,71 +30,88 @@ class PaymentValidator:
             Dict with validation result
         """
         try:
-            # Check format
-            if not tx_hash.startswith("0x") or len(tx_hash) != 66:
-                return {
-                    "success": False,
-                    "valid": False,
-                    "error": "Invalid transaction hash format",
-                    "details": {
-                        "expected_format": "0x followed by 64 hexadecimal characters",
-                        "received_length": len(tx_hash),
-                        "received_format": tx_hash[:10] + "..." if len(tx_hash) > 10 else tx_hash
-                    }
-                }
+            format_error = self._check_hash_format(tx_hash)
+            if format_error:
+                return format_error
             
             # Check if transaction exists
             transaction_details = await alchemy_service.get_transaction_details(tx_hash)
             
-            if not transaction_details:
-                return {
-                    "success": False,
-                    "valid": False,
-                    "error": "Transaction not found on blockchain",
-                    "details": {
-                        "tx_hash": tx_hash,
-                        "network": "Sepolia testnet"
-                    }
-                }
-            
-            transaction = transaction_details.get("transaction")
-            receipt = transaction_details.get("receipt")
+            return self._check_transaction_exists(tx_hash, transaction_details)
             
-            if not transaction:
-                return {
-                    "success": False,
-                    "valid": False,
-                    "error": "Transaction details not available",
-                    "details": {
-                        "tx_hash": tx_hash,
-                        "status": "transaction_not_found"
-                    }
+        except Exception as e:
+            logger.error(f"Error validating transaction hash {tx_hash}: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Transaction validation error: {str(e)}"
+            }
+
+    @staticmethod
+    def _check_hash_format(tx_hash: str) -> Optional[Dict[str, any]]:
+        """Return a validation failure if the hash is malformed, otherwise None."""
+        if not tx_hash.startswith("0x") or len(tx_hash) != 66:
+            return {
+                "success": False,
+                "valid": False,
+                "error": "Invalid transaction hash format",
+                "details": {
+                    "expected_format": "0x followed by 64 hexadecimal characters",
+                    "received_length": len(tx_hash),
+                    "received_format": tx_hash[:10] + "..." if len(tx_hash) > 10 else tx_hash
                 }
-            
+            }
+        return None
+
+    @staticmethod
+    def _check_transaction_exists(
+        tx_hash: str, transaction_details: Optional[Dict]
+    ) -> Dict[str, any]:
+        """Validate that fetched transaction details describe an existing transaction."""
+        if not transaction_details:
             return {
-                "success": True,
-                "valid": True,
-                "message": "Transaction hash is valid and exists",
+                "success": False,
+                "valid": False,
+                "error": "Transaction not found on blockchain",
                 "details": {
                     "tx_hash": tx_hash,
-                    "transaction_exists": True,
-                    "has_receipt": receipt is not None,
-                    "confirmed": transaction_details.get("confirmed", False),
-                    "successful": transaction_details.get("successful")
+                    "network": "Sepolia testnet"
                 }
             }
-            
-        except Exception as e:
-            logger.error(f"Error validating transaction hash {tx_hash}: {str(e)}")
+
+        transaction = transaction_details.get("transaction")
+        receipt = transaction_details.get("receipt")
+
+        if not transaction:
             return {
                 "success": False,
-                "error": f"Transaction validation error: {str(e)}"
+                "valid": False,
+                "error": "Transaction details not available",
+                "details": {
+                    "tx_hash": tx_hash,
+                    "status": "transaction_not_found"
+                }
+            }
+
+        return {
+            "success": True,
+            "valid": True,
+            "message": "Transaction hash is valid and exists",
+            "details": {
+                "tx_hash": tx_hash,
+                "transaction_exists": True,
+                "has_receipt": receipt is not None,
+                "confirmed": transaction_details.get("confirmed", False),
+                "successful": transaction_details.get("successful")
             }
+        }
 
     async def validate_payment_transaction(
         self, 
         tx_hash: str, 
-        num_allowances: int
+        num_allowances: int,
+        quote_wei: Optional[int] = None,
+        quote_expires_at: Optional[datetime] = None,
+        submitted_at: Optional[datetime] = None,
     ) -> Dict[str, any]:
         """
         Comprehensive payment transaction validation.
@@ -101,26 +119,27 @@ class PaymentValidator:
         Args:
             tx_hash: Transaction hash to validate
             num_allowances: Number of allowances being purchased
+            quote_wei: ETH amount quoted at reservation, in wei
+            quote_expires_at: When the quoted amount stops being honoured
+            submitted_at: When the payment was submitted for confirmation;
+                the quote is honoured if it was live then. Defaults to now
             
         Returns:
             Dict with complete validation result
         """
         try:
-            # Step 1: Validate transaction hash format and existence
-            tx_validation = await self.validate_transaction_hash(tx_hash)
+            # Step 1: Validate transaction hash format
+            format_error = self._check_hash_format(tx_hash)
+            if format_error:
+                return format_error
             
-            if not tx_validation["success"] or not tx_validation["valid"]:
-                return tx_validation
-            
-            # Step 2: Get transaction details
+            # Step 2: Fetch transaction and receipt once, concurrently, and
+            # validate everything below from that single fetch
             transaction_details = await alchemy_service.get_transaction_details(tx_hash)
             
-            if not transaction_details:
-                return {
-                    "success": False,
-                    "valid": False,
-                    "error": "Unable to retrieve transaction details"
-                }
+            tx_validation = self._check_transaction_exists(tx_hash, transaction_details)
+            if not tx_validation["success"] or not tx_validation["valid"]:
+                return tx_validation
             
             transaction = transaction_details.get("transaction")
             receipt = transaction_details.get("receipt")
@@ -166,13 +185,29 @@ class PaymentValidator:
                     }
                 }
             
-            # Step 6: Validate payment amount
+            # Step 6: Validate payment amount against the locked quote, or
+            # against the live price if the order has no quote or it had
+            # expired when the payment was submitted
             payment_amount_wei = int(transaction.get("value", "0"), 16)
-            
-            amount_validation = await price_service.validate_payment_amount(
-                num_allowances=num_allowances,
-                payment_amount_wei=payment_amount_wei
-            )
+            submitted_at = submitted_at or datetime.utcnow()
+
+            if quote_wei and quote_expires_at and quote_expires_at > submitted_at:
+                amount_validation = price_service.check_payment_amount(
+                    expected_wei=quote_wei,
+                    payment_amount_wei=payment_amount_wei
+                )
+            else:
+                amount_validation = await price_service.validate_payment_amount(
+                    num_allowances=num_allowances,
+                    payment_amount_wei=payment_amount_wei
+                )
+
+            if "valid" not in amount_validation:
+                # The price could not be looked up, which says nothing about the payment
+                return {
+                    "success": False,
+                    "error": f"Payment amount validation error: {amount_validation.get('error')}"
+                }
             
             if not amount_validation["success"] or not amount_validation.get("valid", False):
                 return {
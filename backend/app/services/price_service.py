@@ -1,10 +1,12 @@
 """Real-time pricing service for payment calculations."""
 
 import logging
-from typing import Dict, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
 from app.config import settings
 from app.services.oneinch import oneinch_service
+from app.utils.cache import MISSING, BoundedTTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +17,9 @@ class PriceService:
     def __init__(self):
         self.allowance_price_usd = settings.allowance_price_usd
         self.slippage_tolerance = settings.price_slippage_tolerance
+        self.quote_ttl = timedelta(minutes=settings.price_quote_ttl_minutes)
+        self.price_cache_seconds = settings.eth_price_cache_seconds
+        self.price_cache = BoundedTTLCache(max_entries=1)
 
     async def get_current_eth_price_usd(self) -> Dict[str, any]:
         """
@@ -24,16 +29,23 @@ class PriceService:
             Dict with price information
         """
         try:
+            # Reservations quote a price each, so a fetched price is reused briefly
+            cached = self.price_cache.get("ETH")
+            if cached is not MISSING:
+                return cached
+
             # Try 1inch first, fallback to CoinGecko
             price_result = await oneinch_service.get_eth_price_in_usd()
             
             if price_result["success"]:
-                return {
+                price = {
                     "success": True,
                     "price_usd": price_result["price_usd"],
                     "source": "coingecko",
                     "timestamp": "now"
                 }
+                self.price_cache.set("ETH", price, ttl=self.price_cache_seconds)
+                return price
             else:
                 # Fallback to a reasonable default if both APIs fail
                 logger.warning(f"Price API failed: {price_result.get('error')}, using fallback price")
@@ -134,63 +146,118 @@ class PriceService:
                 return calculation
             
             payment_calc = calculation["payment_calculation"]
-            min_required_wei = payment_calc["min_eth_wei"]
-            max_accepted_wei = payment_calc["max_eth_wei"]
-            expected_wei = payment_calc["eth_amount_wei"]
-            
-            # Validate payment amount
-            if payment_amount_wei < min_required_wei:
-                return {
-                    "success": False,
-                    "valid": False,
-                    "error": "Insufficient payment amount",
-                    "details": {
-                        "payment_amount_wei": payment_amount_wei,
-                        "payment_amount_eth": payment_amount_wei / 10**18,
-                        "required_min_wei": min_required_wei,
-                        "required_min_eth": min_required_wei / 10**18,
-                        "shortfall_wei": min_required_wei - payment_amount_wei,
-                        "shortfall_eth": (min_required_wei - payment_amount_wei) / 10**18
-                    }
-                }
-            
-            if payment_amount_wei > max_accepted_wei:
-                return {
-                    "success": False,
-                    "valid": False,
-                    "error": "Payment amount exceeds maximum accepted (outside slippage tolerance)",
-                    "details": {
-                        "payment_amount_wei": payment_amount_wei,
-                        "payment_amount_eth": payment_amount_wei / 10**18,
-                        "max_accepted_wei": max_accepted_wei,
-                        "max_accepted_eth": max_accepted_wei / 10**18,
-                        "excess_wei": payment_amount_wei - max_accepted_wei,
-                        "excess_eth": (payment_amount_wei - max_accepted_wei) / 10**18
-                    }
-                }
+            validation = self.check_payment_amount(
+                payment_calc["eth_amount_wei"], payment_amount_wei
+            )
+            if validation["valid"]:
+                validation["price_info"] = payment_calc
+            return validation
             
+        except Exception as e:
+            logger.error(f"Error validating payment amount: {str(e)}")
             return {
-                "success": True,
-                "valid": True,
-                "message": "Payment amount is valid",
+                "success": False,
+                "error": f"Payment validation error: {str(e)}"
+            }
+
+    def check_payment_amount(
+        self, expected_wei: int, payment_amount_wei: int
+    ) -> Dict[str, any]:
+        """
+        Check a payment against an expected amount within the slippage tolerance.
+
+        This is a local comparison; no price is fetched.
+
+        Args:
+            expected_wei: Amount the payment should be, in wei
+            payment_amount_wei: Payment amount in wei
+
+        Returns:
+            Dict with validation result
+        """
+        min_required_wei = int(expected_wei * (1 - self.slippage_tolerance))
+        max_accepted_wei = int(expected_wei * (1 + self.slippage_tolerance))
+
+        if payment_amount_wei < min_required_wei:
+            return {
+                "success": False,
+                "valid": False,
+                "error": "Insufficient payment amount",
                 "details": {
                     "payment_amount_wei": payment_amount_wei,
                     "payment_amount_eth": payment_amount_wei / 10**18,
-                    "expected_wei": expected_wei,
-                    "expected_eth": expected_wei / 10**18,
-                    "within_tolerance": True,
-                    "slippage_used": abs(payment_amount_wei - expected_wei) / expected_wei
-                },
-                "price_info": payment_calc
+                    "required_min_wei": min_required_wei,
+                    "required_min_eth": min_required_wei / 10**18,
+                    "shortfall_wei": min_required_wei - payment_amount_wei,
+                    "shortfall_eth": (min_required_wei - payment_amount_wei) / 10**18
+                }
             }
-            
-        except Exception as e:
-            logger.error(f"Error validating payment amount: {str(e)}")
+
+        if payment_amount_wei > max_accepted_wei:
             return {
                 "success": False,
-                "error": f"Payment validation error: {str(e)}"
+                "valid": False,
+                "error": "Payment amount exceeds maximum accepted (outside slippage tolerance)",
+                "details": {
+                    "payment_amount_wei": payment_amount_wei,
+                    "payment_amount_eth": payment_amount_wei / 10**18,
+                    "max_accepted_wei": max_accepted_wei,
+                    "max_accepted_eth": max_accepted_wei / 10**18,
+                    "excess_wei": payment_amount_wei - max_accepted_wei,
+                    "excess_eth": (payment_amount_wei - max_accepted_wei) / 10**18
+                }
             }
 
+        return {
+            "success": True,
+            "valid": True,
+            "message": "Payment amount is valid",
+            "details": {
+                "payment_amount_wei": payment_amount_wei,
+                "payment_amount_eth": payment_amount_wei / 10**18,
+                "expected_wei": expected_wei,
+                "expected_eth": expected_wei / 10**18,
+                "within_tolerance": True,
+                "slippage_used": abs(payment_amount_wei - expected_wei) / expected_wei
+            }
+        }
+
+    async def quote_payments(self, quantities: List[int]) -> List[Optional[Dict[str, any]]]:
+        """
+        Quote the ETH amount of each order, to be locked in at reservation.
+
+        One price lookup serves every quote. No quote is made from the fallback
+        price; those orders are checked against the live price at confirmation.
+
+        Args:
+            quantities: Number of allowances of each order
+
+        Returns:
+            One quote dict per order, or None where no quote could be made
+        """
+        price_result = await self.get_current_eth_price_usd()
+        if not price_result["success"] or price_result.get("source") == "fallback":
+            logger.warning(
+                f"No reliable ETH price for quotes: {price_result.get('error', 'fallback price')}"
+            )
+            return [None] * len(quantities)
+
+        eth_price_usd = price_result["price_usd"]
+        expires_at = datetime.utcnow() + self.quote_ttl
+        quotes = []
+        for num_allowances in quantities:
+            total_usd = num_allowances * self.allowance_price_usd
+            eth_amount = total_usd / eth_price_usd
+            quotes.append({
+                "eth_amount_wei": int(eth_amount * 10**18),
+                "eth_amount_formatted": f"{eth_amount:.6f} ETH",
+                "eth_price_usd": eth_price_usd,
+                "total_usd": total_usd,
+                "price_source": price_result["source"],
+                "expires_at": expires_at,
+            })
+        return quotes
+
     async def get_payment_estimate(self, num_allowances: int) -> Dict[str, any]:
         """
         Get payment estimate for frontend display.
@@ -0,0 +1,237 @@
+"""Streaming export of the retirement ledger.
+
+Parquet export needs pyarrow, which is not a required dependency; without it
+Parquet exports are refused and the other formats keep working.
+"""
+
+import csv
+import io
+import json
+import logging
+from collections.abc import AsyncIterator, Sequence
+from enum import Enum
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.utils.serials import compact_serials
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+# Every completed retirement, oldest first. The order is that of
+# ix_retirement_history_completed_at and cursors are planned for a fast
+# start, so rows stream off the index without a sort of the whole ledger.
+EXPORT_RETIREMENTS_SQL = text(
+    """
+    SELECT
+        order_id, wallet, message, reward_tx_hash,
+        num_allowances, serial_ranges, completed_at
+    FROM retirement_history
+    ORDER BY completed_at, order_id
+"""
+)
+
+EXPORT_COLUMNS = [
+    "order_id",
+    "wallet",
+    "message",
+    "reward_tx_hash",
+    "num_allowances",
+    "serial_ranges",
+    "completed_at",
+]
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailableError(Exception):
+    """Raised when an export format needs a library that is not installed."""
+
+    def __init__(self, export_format: ExportFormat):
+        self.export_format = export_format
+        super().__init__(
+            f"{export_format.value} export is not available on this server"
+        )
+
+
+class _ChunkSink:
+    """Write-only file that hands over what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class RetirementExportService:
+    """Service for streaming every completed retirement in bulk formats."""
+
+    def __init__(self):
+        self.chunk_size = settings.export_chunk_size
+
+    def media_type(self, export_format: ExportFormat) -> str:
+        """Content type of an export format."""
+        return MEDIA_TYPES[export_format]
+
+    def check_available(self, export_format: ExportFormat) -> None:
+        """
+        Check an export format can be produced before streaming starts.
+
+        Raises:
+            ExportUnavailableError: If the format's library is not installed
+        """
+        if export_format == ExportFormat.PARQUET and pq is None:
+            raise ExportUnavailableError(export_format)
+
+    async def stream(
+        self, session: AsyncSession, export_format: ExportFormat
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream the ledger, encoded chunk by chunk as it is fetched.
+
+        Rows are read through a server-side cursor ``export_chunk_size`` at a
+        time, so memory stays flat whatever the size of the ledger.
+
+        Args:
+            session: Database session, held for the whole export
+            export_format: Encoding of the export
+
+        Yields:
+            Encoded bytes, at least one chunk per fetch
+        """
+        self.check_available(export_format)
+        encode = {
+            ExportFormat.NDJSON: self._ndjson,
+            ExportFormat.CSV: self._csv,
+            ExportFormat.PARQUET: self._parquet,
+        }[export_format]
+
+        try:
+            async for chunk in encode(self._fetch_chunks(session)):
+                yield chunk
+        finally:
+            # The cursor lives in a transaction that only reads
+            await session.rollback()
+
+    async def _fetch_chunks(
+        self, session: AsyncSession
+    ) -> AsyncIterator[Sequence[Any]]:
+        """Fetch the ledger through a server-side cursor, one chunk at a time."""
+        result = await session.stream(
+            EXPORT_RETIREMENTS_SQL, execution_options={"yield_per": self.chunk_size}
+        )
+        exported = 0
+        async for rows in result.partitions(self.chunk_size):
+            exported += len(rows)
+            yield rows
+        logger.info(f"Exported {exported} retirements")
+
+    async def _ndjson(
+        self, chunks: AsyncIterator[Sequence[Any]]
+    ) -> AsyncIterator[bytes]:
+        async for rows in chunks:
+            yield "".join(
+                json.dumps(self._record(row), ensure_ascii=False, separators=(",", ":"))
+                + "\n"
+                for row in rows
+            ).encode("utf-8")
+
+    async def _csv(self, chunks: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        async for rows in chunks:
+            for row in rows:
+                record = self._record(row)
+                # Runs of serials as "start-end", separated by semicolons
+                record["serial_ranges"] = ";".join(
+                    compact_serials(record["serial_ranges"])
+                )
+                writer.writerow([record[column] for column in EXPORT_COLUMNS])
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    async def _parquet(
+        self, chunks: AsyncIterator[Sequence[Any]]
+    ) -> AsyncIterator[bytes]:
+        schema = pa.schema(
+            [
+                ("order_id", pa.string()),
+                ("wallet", pa.string()),
+                ("message", pa.string()),
+                ("reward_tx_hash", pa.string()),
+                ("num_allowances", pa.int64()),
+                ("serial_ranges", pa.list_(pa.list_(pa.int64()))),
+                ("completed_at", pa.timestamp("us")),
+            ]
+        )
+        sink = _ChunkSink()
+        # One row group per fetched chunk; the footer closes the file
+        with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+            async for rows in chunks:
+                columns = {
+                    name: [getattr(row, name) for row in rows] for name in schema.names
+                }
+                writer.write_table(pa.table(columns, schema=schema))
+                yield sink.drain()
+        yield sink.drain()
+
+    def _record(self, row) -> dict[str, Any]:
+        """One exported retirement as plain values."""
+        return {
+            "order_id": row.order_id,
+            "wallet": row.wallet,
+            "message": row.message,
+            "reward_tx_hash": row.reward_tx_hash,
+            "num_allowances": row.num_allowances,
+            "serial_ranges": [[start, end] for start, end in row.serial_ranges],
+            "completed_at": row.completed_at.isoformat(),
+        }
+
+
+# Global instance
+retirement_export_service = RetirementExportService()
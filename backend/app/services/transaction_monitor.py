@@ -5,18 +5,36 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.config import settings
 from app.database import get_session
-from app.models.allowances import Allowance, AllowanceStatus
+from app.models.orders import Order, OrderState
 from app.services.alchemy import alchemy_service
 from app.services.blockchain import blockchain_service
+from app.services.history import history_service
+from app.services.inventory import inventory_service
+from app.services.order_events import OrderEvent, order_event_bus
 from app.services.thirdweb import thirdweb_service
 
 logger = logging.getLogger(__name__)
 
+# Claim a paid order's token distribution. Only one caller gets the row back,
+# so a retried job, an expired lease and the monitor can never all send $PR.
+# A claim whose worker died before the order was settled is never retried;
+# the cleanup job reports it for reconciliation.
+CLAIM_DISTRIBUTION_SQL = text("""
+    UPDATE orders
+    SET distribution_started_at = CAST(:now AS timestamp),
+        updated_at = CAST(:now AS timestamp)
+    WHERE order_id = :order_id
+      AND status = 'RESERVED'
+      AND distribution_started_at IS NULL
+    RETURNING order_id
+""")
+
 
 class TransactionMonitorService:
     """Service for monitoring pending transactions and processing payments."""
@@ -30,19 +48,21 @@ class TransactionMonitorService:
         """Monitor all pending transactions for confirmation."""
         try:
             async for session in get_session():
-                # Find orders with tx_hash but still in reserved status
-                stmt = select(Allowance).where(
-                    Allowance.status == AllowanceStatus.RESERVED,
-                    Allowance.tx_hash.is_not(None)
-                ).distinct(Allowance.order_id)
+                # Find orders with tx_hash but still in reserved status,
+                # leaving out those whose distribution is already under way
+                stmt = select(Order).where(
+                    Order.status == OrderState.RESERVED,
+                    Order.tx_hash.is_not(None),
+                    Order.distribution_started_at.is_(None)
+                )
                 
                 result = await session.execute(stmt)
                 pending_orders = result.scalars().all()
                 
                 logger.info(f"Monitoring {len(pending_orders)} pending transactions")
                 
-                for allowance in pending_orders:
-                    await self._process_pending_order(session, allowance)
+                for order in pending_orders:
+                    await self._process_pending_order(session, order)
                 
                 break  # Exit the async generator
                 
@@ -52,23 +72,30 @@ class TransactionMonitorService:
     async def _process_pending_order(
         self, 
         session: AsyncSession, 
-        allowance: Allowance
+        order: Order
     ) -> None:
         """Process a single pending order."""
+        order_id = order.order_id
         try:
-            order_id = allowance.order_id
-            tx_hash = allowance.tx_hash
+            tx_hash = order.tx_hash
             
             if not tx_hash:
                 logger.warning(f"Order {order_id} has no tx_hash, skipping")
                 return
             
+            if order.distribution_started_at:
+                logger.info(f"Order {order_id} distribution already started, skipping")
+                return
+
             # Check if order has timed out
-            if self._is_order_timed_out(allowance):
+            if self._is_order_timed_out(order):
                 logger.warning(f"Order {order_id} timed out, marking as failed")
                 await self._mark_order_as_failed(session, order_id, "Payment timeout")
                 return
             
+            # No transaction stays open across the chain call
+            await session.commit()
+
             # Check transaction status
             is_confirmed = await alchemy_service.is_transaction_confirmed(tx_hash)
             
@@ -88,7 +115,7 @@ class TransactionMonitorService:
                 return
                 
         except Exception as e:
-            logger.error(f"Error processing pending order {allowance.order_id}: {str(e)}")
+            logger.error(f"Error processing pending order {order_id}: {str(e)}")
 
     async def _process_confirmed_payment(
         self, 
@@ -96,30 +123,51 @@ class TransactionMonitorService:
         order_id: str
     ) -> None:
         """Process a confirmed payment by distributing tokens and retiring allowances."""
+        distributing = False
         try:
-            # Get all allowances for this order
-            stmt = select(Allowance).where(Allowance.order_id == order_id)
-            result = await session.execute(stmt)
-            allowances = result.scalars().all()
+            order = await session.get(Order, order_id)
             
-            if not allowances:
-                logger.error(f"No allowances found for order {order_id}")
+            if not order:
+                logger.error(f"Order {order_id} not found")
                 return
             
-            first_allowance = allowances[0]
-            num_allowances = len(allowances)
-            wallet_address = first_allowance.wallet
+            # Get all allowance ranges for this order
+            allowance_ranges = await inventory_service.get_order_ranges(session, order_id)
+
+            num_allowances = order.num_allowances
+            serial_numbers = [s for r in allowance_ranges for s in r.serial_numbers()]
+            wallet_address = order.wallet
             
             if not wallet_address:
                 logger.error(f"No wallet address for order {order_id}")
                 await self._mark_order_as_failed(session, order_id, "Missing wallet address")
                 return
             
+            # Claim the distribution; status readers show it as started
+            claim = await session.execute(
+                CLAIM_DISTRIBUTION_SQL,
+                {"order_id": order_id, "now": datetime.utcnow()},
+            )
+            if claim.scalar_one_or_none() is None:
+                await session.rollback()
+                logger.info(
+                    f"Order {order_id} distribution already claimed or order moved on, "
+                    f"not sending tokens again"
+                )
+                return
+            await order_event_bus.publish(
+                session, order_id, OrderState.RESERVED, OrderEvent.DISTRIBUTING
+            )
+            # The claim is committed before any tokens move; the transfer and
+            # its wait run with no transaction open
+            await session.commit()
+            distributing = True
+
             # Distribute reward tokens
             logger.info(
                 f"CRITICAL: Starting token distribution | "
                 f"order_id={order_id} | wallet={wallet_address} | "
-                f"tokens={num_allowances} | serial_numbers={[a.serial_number for a in allowances]}"
+                f"tokens={num_allowances} | serial_numbers={serial_numbers}"
             )
             
             token_result = await thirdweb_service.transfer_tokens(
@@ -143,7 +191,12 @@ class TransactionMonitorService:
                 except Exception as email_error:
                     logger.error(f"Failed to send token transfer failure alert: {email_error}")
                 
-                await self._mark_order_as_failed(session, order_id, f"Token transfer failed: {token_result.get('error')}")
+                await self._mark_order_as_failed(
+                    session,
+                    order_id,
+                    f"Token transfer failed: {token_result.get('error')}",
+                    distributing=True,
+                )
                 return
             
             # Wait for token transfer to complete
@@ -171,18 +224,27 @@ class TransactionMonitorService:
                     except Exception as email_error:
                         logger.error(f"Failed to send token transfer wait failure alert: {email_error}")
                     
-                    await self._mark_order_as_failed(session, order_id, f"Token transfer incomplete: {wait_result.get('error')}")
+                    await self._mark_order_as_failed(
+                        session,
+                        order_id,
+                        f"Token transfer incomplete: {wait_result.get('error')}",
+                        distributing=True,
+                    )
                     return
                 
                 reward_tx_hash = wait_result.get("transaction_hash")
             else:
                 reward_tx_hash = token_result.get("transaction_hash")
             
-            # Mark allowances as retired and store reward transaction hash
-            for allowance in allowances:
-                allowance.status = AllowanceStatus.RETIRED
-                allowance.reward_tx_hash = reward_tx_hash
-                allowance.updated_at = datetime.utcnow()
+            # Mark the order and its allowances as retired
+            order.status = OrderState.RETIRED
+            order.reward_tx_hash = reward_tx_hash
+            order.updated_at = datetime.utcnow()
+            await inventory_service.retire(session, order_id)
+            await history_service.record(session, order)
+            await order_event_bus.publish(
+                session, order_id, OrderState.RETIRED, OrderEvent.RETIRED
+            )
             
             await session.commit()
             
@@ -190,36 +252,55 @@ class TransactionMonitorService:
                 f"CRITICAL: Order completed successfully | "
                 f"order_id={order_id} | wallet={wallet_address} | "
                 f"tokens={num_allowances} | reward_tx={reward_tx_hash} | "
-                f"retired_allowances={[a.serial_number for a in allowances]}"
+                f"retired_allowances={serial_numbers}"
             )
             
         except Exception as e:
             logger.error(f"Error processing confirmed payment for order {order_id}: {str(e)}")
             await session.rollback()
-            await self._mark_order_as_failed(session, order_id, f"Processing error: {str(e)}")
+            await self._mark_order_as_failed(
+                session, order_id, f"Processing error: {str(e)}", distributing=distributing
+            )
 
     async def _mark_order_as_failed(
         self, 
         session: AsyncSession, 
         order_id: str, 
-        reason: str
+        reason: str,
+        distributing: bool = False
     ) -> None:
-        """Mark an order as failed and release the allowances."""
+        """
+        Mark an order as failed and release the allowances.
+
+        Only a reserved order is failed. Once its distribution is claimed,
+        tokens may already be on their way, so only the claiming caller
+        (``distributing``) may fail it.
+        """
         try:
-            # Get all allowances for this order
-            stmt = select(Allowance).where(Allowance.order_id == order_id)
-            result = await session.execute(stmt)
-            allowances = result.scalars().all()
+            stmt = (
+                select(Order)
+                .where(Order.order_id == order_id)
+                .with_for_update()
+                .execution_options(populate_existing=True)
+            )
+            order = (await session.execute(stmt)).scalar_one_or_none()
+            if (
+                not order
+                or order.status != OrderState.RESERVED
+                or (order.distribution_started_at and not distributing)
+            ):
+                await session.rollback()
+                logger.info(f"Order {order_id} left as is, not failing it for: {reason}")
+                return
             
-            # Release allowances back to available
-            for allowance in allowances:
-                allowance.status = AllowanceStatus.AVAILABLE
-                allowance.order_id = None
-                allowance.wallet = None
-                allowance.message = None
-                allowance.tx_hash = None
-                allowance.reward_tx_hash = None
-                allowance.updated_at = datetime.utcnow()
+            order.status = OrderState.FAILED
+            order.updated_at = datetime.utcnow()
+
+            # Release allowance ranges back to available
+            await inventory_service.release(session, order_id)
+            await order_event_bus.publish(
+                session, order_id, OrderState.FAILED, OrderEvent.FAILED
+            )
             
             await session.commit()
             
@@ -229,47 +310,50 @@ class TransactionMonitorService:
             logger.error(f"Error marking order {order_id} as failed: {str(e)}")
             await session.rollback()
 
-    def _is_order_timed_out(self, allowance: Allowance) -> bool:
-        """Check if an order has timed out."""
-        if not allowance.timestamp:
+    def _is_order_timed_out(self, order: Order) -> bool:
+        """Check if an order's payment has gone unconfirmed for too long."""
+        if not order.paid_at:
             return False
         
         timeout_threshold = datetime.utcnow() - timedelta(minutes=self.timeout_minutes)
-        return allowance.timestamp < timeout_threshold
+        return order.paid_at < timeout_threshold
 
     async def process_single_order(self, order_id: str) -> Dict[str, any]:
         """Process a single order manually (for testing or immediate processing)."""
         try:
             async for session in get_session():
-                stmt = select(Allowance).where(Allowance.order_id == order_id)
-                result = await session.execute(stmt)
-                allowances = result.scalars().all()
+                order = await session.get(Order, order_id)
                 
-                if not allowances:
+                if not order:
                     return {
                         "success": False,
                         "error": f"Order {order_id} not found"
                     }
                 
-                first_allowance = allowances[0]
-                
-                if first_allowance.status != AllowanceStatus.RESERVED:
+                if order.status != OrderState.RESERVED:
                     return {
                         "success": False,
                         "error": f"Order {order_id} is not in reserved status"
                     }
                 
-                if not first_allowance.tx_hash:
+                if not order.tx_hash:
                     return {
                         "success": False,
                         "error": f"Order {order_id} has no transaction hash"
                     }
                 
-                await self._process_pending_order(session, first_allowance)
+                await self._process_pending_order(session, order)
+
+                # Read back where the order ended up, whoever moved it
+                order = await session.get(
+                    Order, order_id, populate_existing=True
+                )
+                await session.commit()
                 
                 return {
                     "success": True,
-                    "message": f"Order {order_id} processed"
+                    "message": f"Order {order_id} processed",
+                    "status": order.status if order else None
                 }
                 
         except Exception as e:
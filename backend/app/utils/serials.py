@@ -0,0 +1,82 @@
+"""Serial number representations shared by the API responses."""
+
+from collections.abc import Iterable, Sequence
+from enum import Enum
+from typing import Optional
+
+
+class SerialFormat(str, Enum):
+    LIST = "list"  # Every serial on its own: ["100", "101", "102"]
+    RANGES = "ranges"  # Consecutive serials collapsed: ["100-102"]
+
+
+# Accept parameter asking for the compact variant,
+# e.g. ``Accept: application/json; serials=ranges``
+ACCEPT_PARAMETER = "serials"
+
+
+def negotiate_serial_format(
+    requested: Optional[SerialFormat], accept: Optional[str]
+) -> SerialFormat:
+    """
+    Pick the serial representation of a response.
+
+    Args:
+        requested: Format named in the query string, which wins
+        accept: Accept header, whose ``serials`` parameter is honoured
+
+    Returns:
+        The requested format, LIST by default
+    """
+    if requested is not None:
+        return requested
+    for media_range in (accept or "").split(","):
+        for parameter in media_range.split(";")[1:]:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == ACCEPT_PARAMETER:
+                try:
+                    return SerialFormat(value.strip().strip('"').lower())
+                except ValueError:
+                    continue
+    return SerialFormat.LIST
+
+
+def merge_ranges(ranges: Iterable[Sequence[int]]) -> list[tuple[int, int]]:
+    """Sort inclusive ``[start, end]`` ranges and join the ones that touch."""
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted((start, end) for start, end in ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compact_serials(ranges: Iterable[Sequence[int]]) -> list[str]:
+    """Consecutive serials as ``"start-end"``; a lone serial as itself."""
+    return [
+        str(start) if start == end else f"{start}-{end}"
+        for start, end in merge_ranges(ranges)
+    ]
+
+
+def format_serials(
+    ranges: Iterable[Sequence[int]], serial_format: SerialFormat
+) -> list[str]:
+    """
+    Serial numbers of inclusive ``[start, end]`` ranges, in serial order.
+
+    Args:
+        ranges: Ranges of serials, in any order
+        serial_format: Representation to use
+
+    Returns:
+        One entry per serial, or one per run of consecutive serials
+    """
+    if serial_format == SerialFormat.RANGES:
+        return compact_serials(ranges)
+    return [
+        str(serial)
+        for start, end in merge_ranges(ranges)
+        for serial in range(start, end + 1)
+    ]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Backfill the retirement_history projection from existing orders.
+
+Retirements write their history row as they happen; orders retired before the
+projection existed are added by this script. Run it once after upgrading the
+database. It commits one batch at a time, skips orders that are already in the
+history and can be rerun or interrupted safely.
+
+Usage:
+    python scripts/backfill_retirement_history.py --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session
+from app.services.history import history_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Orders projected per transaction"
+    )
+    return parser.parse_args()
+
+
+async def main():
+    """Main backfill function"""
+    args = parse_args()
+    logger.info("Backfilling retirement history...")
+
+    async with async_session() as session:
+        added = await history_service.backfill(session, batch_size=args.batch_size)
+
+    logger.info(f"✅ Added {added} retirements to the history")
+    return True
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Checkout benchmark for the reservation critical path.
+
+Seeds a scratch schema in a local Postgres with a configurable number of free
+serials, then fires concurrent ``POST /api/retirements`` and
+``POST /api/retirements/confirm`` requests through the ASGI app and reports
+per-endpoint latency percentiles, reservations/sec, lock waits and rows scanned
+as JSON, so runs can be compared over time.
+
+Confirm only queues the payment, and the job queue is not run, so no RPCs or
+payouts happen. The ETH price lookup that quotes each reservation is replaced
+by a fixed price; ``--price-latency-ms`` models a slow price API instead.
+
+Usage:
+    python scripts/benchmark_checkout.py \\
+        --database-url postgresql+asyncpg://postgres@localhost/ultracivic_bench \\
+        --inventory 100000 --concurrency 32 --requests 2000 --output run.json
+
+The database defaults to ``BENCHMARK_DATABASE_URL`` (or ``TEST_DATABASE_URL``).
+Everything is created in its own schema, which is dropped afterwards unless
+``--keep-schema`` is given.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import create_tables, get_session
+from app.main import app
+from app.middleware.rate_limit import limiter
+from app.services.inventory import inventory_service
+from app.services.oneinch import oneinch_service
+from app.services.price_service import price_service
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+FIRST_SERIAL = 1000000
+WALLET = "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b"
+
+LOCK_WAITERS_SQL = text(
+    """
+    SELECT count(*)
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND wait_event_type = 'Lock'
+"""
+)
+
+DEADLOCKS_SQL = text(
+    """
+    SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()
+"""
+)
+
+TABLE_STATS_SQL = text(
+    """
+    SELECT
+        relname,
+        coalesce(seq_scan, 0) AS seq_scan,
+        coalesce(seq_tup_read, 0) AS seq_tup_read,
+        coalesce(idx_scan, 0) AS idx_scan,
+        coalesce(idx_tup_fetch, 0) AS idx_tup_fetch
+    FROM pg_stat_user_tables
+    WHERE schemaname = :schema
+"""
+)
+
+SEED_RANGES_SQL = text(
+    """
+    INSERT INTO allowance_ranges (start_serial, end_serial, status, bucket, created_at, updated_at)
+    SELECT
+        :first + i * :range_size,
+        :first + least((i + 1) * :range_size, :inventory) - 1,
+        'AVAILABLE', 0, now(), now()
+    FROM generate_series(0, (:inventory - 1) / :range_size) AS i
+"""
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the checkout critical path")
+    parser.add_argument(
+        "--database-url",
+        default=os.environ.get("BENCHMARK_DATABASE_URL")
+        or os.environ.get("TEST_DATABASE_URL"),
+        help="Scratch Postgres database (postgresql+asyncpg://...)",
+    )
+    parser.add_argument("--schema", default="checkout_benchmark")
+    parser.add_argument(
+        "--inventory", type=int, default=10000, help="Free serials to seed"
+    )
+    parser.add_argument(
+        "--range-size", type=int, default=500, help="Serials per seeded range"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Concurrent clients"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=500, help="Checkouts to attempt"
+    )
+    parser.add_argument("--min-quantity", type=int, default=1)
+    parser.add_argument("--max-quantity", type=int, default=5)
+    parser.add_argument(
+        "--no-confirm", action="store_true", help="Only reserve, never confirm"
+    )
+    parser.add_argument(
+        "--price-latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated ETH price API latency when quoting a reservation",
+    )
+    parser.add_argument(
+        "--sample-interval-ms",
+        type=float,
+        default=10.0,
+        help="How often lock waiters are sampled",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="Random seed for quantities"
+    )
+    parser.add_argument(
+        "--label", default=None, help="Free-form label stored in the report"
+    )
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--keep-schema", action="store_true")
+    return parser.parse_args()
+
+
+def make_engine(args: argparse.Namespace, pool_size: int = 5):
+    return create_async_engine(
+        args.database_url,
+        pool_size=pool_size,
+        max_overflow=0,
+        connect_args={"server_settings": {"search_path": args.schema}},
+    )
+
+
+async def seed(args: argparse.Namespace) -> None:
+    """Create the schema and load ``--inventory`` free serials, bucketed and counted."""
+    engine = make_engine(args)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {args.schema}"))
+        await create_tables(conn)
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        await session.execute(
+            SEED_RANGES_SQL,
+            {
+                "first": FIRST_SERIAL,
+                "range_size": args.range_size,
+                "inventory": args.inventory,
+            },
+        )
+        await inventory_service.rebucket(session)
+        await inventory_service.rebuild_counters(session)
+        await session.commit()
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+    await engine.dispose()
+    logger.info(f"Seeded {args.inventory} serials into schema {args.schema}")
+
+
+async def drop(args: argparse.Namespace) -> None:
+    engine = make_engine(args)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE"))
+    await engine.dispose()
+
+
+async def table_stats(engine, schema: str) -> dict[str, dict[str, int]]:
+    async with engine.connect() as conn:
+        result = await conn.execute(TABLE_STATS_SQL, {"schema": schema})
+        return {row.relname: dict(row._mapping) for row in result}
+
+
+async def deadlocks(engine) -> int:
+    async with engine.connect() as conn:
+        return int((await conn.execute(DEADLOCKS_SQL)).scalar_one())
+
+
+class LockSampler:
+    """Poll ``pg_stat_activity`` for sessions waiting on a heavyweight lock."""
+
+    def __init__(self, engine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiters = 0
+        self._stopped = asyncio.Event()
+
+    async def run(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            while not self._stopped.is_set():
+                waiters = int((await conn.execute(LOCK_WAITERS_SQL)).scalar_one())
+                self.samples += 1
+                self.waiting_samples += waiters
+                self.max_waiters = max(self.max_waiters, waiters)
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def report(self) -> dict[str, float]:
+        return {
+            "samples": self.samples,
+            "sample_interval_ms": self.interval * 1000,
+            "waiting_samples": self.waiting_samples,
+            "max_waiters": self.max_waiters,
+            "mean_waiters": round(self.waiting_samples / self.samples, 3)
+            if self.samples
+            else 0.0,
+            # Each waiter seen in a sample stands for one interval of waiting
+            "estimated_wait_seconds": round(self.waiting_samples * self.interval, 3),
+        }
+
+
+def latency_summary(latencies: list[float]) -> dict[str, Optional[float]]:
+    """p50/p95/p99, mean and max in milliseconds."""
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ms = [latency * 1000 for latency in latencies]
+    if len(ms) == 1:
+        p50 = p95 = p99 = ms[0]
+    else:
+        cuts = statistics.quantiles(ms, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {
+        "p50": round(p50, 3),
+        "p95": round(p95, 3),
+        "p99": round(p99, 3),
+        "mean": round(statistics.fmean(ms), 3),
+        "max": round(max(ms), 3),
+    }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.status_codes: dict[str, int] = {}
+
+    def record(self, started: float, status_code: int) -> None:
+        self.latencies.append(time.perf_counter() - started)
+        key = str(status_code)
+        self.status_codes[key] = self.status_codes.get(key, 0) + 1
+
+    def report(self) -> dict:
+        return {
+            "count": len(self.latencies),
+            "status_codes": self.status_codes,
+            "latency_ms": latency_summary(self.latencies),
+        }
+
+
+def patch_external_calls(price_latency: float) -> None:
+    """Keep the run on the database path: no price API calls or rate limits."""
+
+    async def get_eth_price_in_usd():
+        if price_latency:
+            await asyncio.sleep(price_latency)
+        return {"success": True, "price_usd": 2500.0}
+
+    # Fetched prices are still cached by the price service as in production
+    oneinch_service.get_eth_price_in_usd = get_eth_price_in_usd
+    price_service.price_cache.clear()
+    limiter.enabled = False
+
+
+async def run_load(args: argparse.Namespace) -> dict:
+    engine = make_engine(args, pool_size=args.concurrency)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def benchmark_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = benchmark_session
+    patch_external_calls(args.price_latency_ms / 1000)
+
+    stats_engine = make_engine(args, pool_size=2)
+    sampler = LockSampler(stats_engine, args.sample_interval_ms / 1000)
+    tables_before = await table_stats(stats_engine, args.schema)
+    deadlocks_before = await deadlocks(stats_engine)
+
+    rng = random.Random(args.seed)
+    quantities = [
+        rng.randint(args.min_quantity, args.max_quantity) for _ in range(args.requests)
+    ]
+    pending = iter(quantities)
+    create = EndpointStats()
+    confirm = EndpointStats()
+    reserved_serials = 0
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        nonlocal reserved_serials
+        for quantity in pending:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/retirements/",
+                json={
+                    "num_allowances": quantity,
+                    "wallet": WALLET,
+                    "message": "benchmark",
+                },
+            )
+            create.record(started, response.status_code)
+            if response.status_code != 200:
+                continue
+            reserved_serials += quantity
+            if args.no_confirm:
+                continue
+
+            order_id = response.json()["order_id"]
+            tx_hash = "0x" + hashlib.sha256(order_id.encode()).hexdigest()
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/retirements/confirm",
+                json={"order_id": order_id, "tx_hash": tx_hash},
+            )
+            confirm.record(started, response.status_code)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        sampler_task = asyncio.create_task(sampler.run())
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        duration = time.perf_counter() - started
+        sampler.stop()
+        await sampler_task
+
+    # Backends flush their table statistics when they disconnect
+    await engine.dispose()
+    await asyncio.sleep(1)
+    tables_after = await table_stats(stats_engine, args.schema)
+    deadlocks_after = await deadlocks(stats_engine)
+    async with stats_engine.connect() as conn:
+        server_version = (await conn.execute(text("SHOW server_version"))).scalar_one()
+    await stats_engine.dispose()
+    app.dependency_overrides.pop(get_session, None)
+
+    tables = {}
+    for relname, after in tables_after.items():
+        before = tables_before.get(relname, {})
+        tables[relname] = {
+            column: after[column] - before.get(column, 0)
+            for column in ("seq_scan", "seq_tup_read", "idx_scan", "idx_tup_fetch")
+        }
+    rows_scanned = sum(
+        table["seq_tup_read"] + table["idx_tup_fetch"] for table in tables.values()
+    )
+    reservations = create.status_codes.get("200", 0)
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "label": args.label,
+        "postgres_version": server_version,
+        "config": {
+            "inventory": args.inventory,
+            "range_size": args.range_size,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "min_quantity": args.min_quantity,
+            "max_quantity": args.max_quantity,
+            "confirm": not args.no_confirm,
+            "price_latency_ms": args.price_latency_ms,
+            "allocation_buckets": inventory_service.allocation_buckets,
+            "seed": args.seed,
+        },
+        "duration_seconds": round(duration, 3),
+        "reservations": {
+            "attempted": args.requests,
+            "succeeded": reservations,
+            "serials": reserved_serials,
+            "per_second": round(reservations / duration, 3) if duration else 0.0,
+        },
+        "endpoints": {
+            "create": create.report(),
+            "confirm": confirm.report(),
+        },
+        "lock_waits": {
+            **sampler.report(),
+            "deadlocks": deadlocks_after - deadlocks_before,
+        },
+        "rows_scanned": {
+            "total": rows_scanned,
+            "per_reservation": round(rows_scanned / reservations, 3)
+            if reservations
+            else None,
+            "tables": tables,
+        },
+    }
+
+
+async def main() -> bool:
+    args = parse_args()
+    if not args.database_url:
+        logger.error(
+            "❌ Set --database-url, BENCHMARK_DATABASE_URL or TEST_DATABASE_URL"
+        )
+        return False
+
+    # Request logging would dominate the measurement
+    for name in ("app", "audit", "httpx", "sqlalchemy.engine"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    await seed(args)
+    try:
+        report = await run_load(args)
+    finally:
+        if not args.keep_schema:
+            await drop(args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        logger.info(f"✅ Report written to {args.output}")
+    else:
+        print(output)
+    return True
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    sys.exit(0 if success else 1)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Database seeding script for Ultra Civic allowances table.
-Populates the allowances table with serial numbers from allowances_available.csv.
+Populates the allowance_ranges table with the serial ranges from allowances_available.csv.
 """
 
 import asyncio
@@ -15,13 +15,17 @@ from typing import List, Tuple
 # Add the parent directory to the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.config import settings
-from app.database import engine
-from app.models.allowances import Allowance, AllowanceStatus
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import select
 
+from app.config import settings
+from app.database import engine
+from app.models.allowance_ranges import AllowanceRange
+from app.models.allowances import AllowanceStatus
+from app.services.inventory import inventory_service
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,50 +57,51 @@ def parse_csv_ranges(csv_file_path: str) -> List[Tuple[int, int, str, str]]:
     return ranges
 
 
-def generate_serial_numbers(ranges: List[Tuple[int, int, str, str]]) -> List[str]:
-    """Generate all individual serial numbers from ranges"""
-    all_serials = []
+def build_allowance_ranges(ranges: List[Tuple[int, int, str, str]]) -> List[AllowanceRange]:
+    """Build one available inventory range per CSV row"""
+    allowance_ranges = []
     
     for start, end, state, year in ranges:
         count = end - start + 1
-        logger.info(f"Generating {count} serials for {state} {year}: {start}-{end}")
-        
-        for serial in range(start, end + 1):
-            all_serials.append(str(serial))
-    
-    return all_serials
+        logger.info(f"Preparing {count} serials for {state} {year}: {start}-{end}")
+
+        allowance_ranges.append(
+            AllowanceRange(
+                start_serial=start,
+                end_serial=end,
+                status=AllowanceStatus.AVAILABLE,
+                originating_state=state,
+                allocation_year=int(year),
+            )
+        )
+
+    return allowance_ranges
 
 
 async def check_existing_allowances(session: AsyncSession) -> int:
     """Check if allowances already exist in the database"""
-    stmt = select(Allowance)
+    stmt = select(
+        func.coalesce(
+            func.sum(AllowanceRange.end_serial - AllowanceRange.start_serial + 1), 0
+        )
+    )
     result = await session.execute(stmt)
-    existing_count = len(result.scalars().all())
-    return existing_count
+    return int(result.scalar_one())
 
 
-async def seed_allowances(serial_numbers: List[str], session: AsyncSession) -> None:
-    """Seed the allowances table with serial numbers"""
-    logger.info(f"Seeding {len(serial_numbers)} allowances...")
-    
-    # Create allowance objects
-    allowances = []
-    for serial in serial_numbers:
-        allowance = Allowance(
-            serial_number=serial,
-            status=AllowanceStatus.AVAILABLE,
-            order_id=None,
-            timestamp=None,
-            wallet=None,
-            message=None,
-        )
-        allowances.append(allowance)
+async def seed_allowances(allowance_ranges: List[AllowanceRange], session: AsyncSession) -> None:
+    """Seed the allowance_ranges table with serial ranges"""
+    total = sum(r.quantity for r in allowance_ranges)
+    logger.info(f"Seeding {total} allowances in {len(allowance_ranges)} ranges...")
     
     # Bulk insert
     try:
-        session.add_all(allowances)
+        session.add_all(allowance_ranges)
+        await session.flush()
+        await inventory_service.rebucket(session)
+        await inventory_service.rebuild_counters(session)
         await session.commit()
-        logger.info(f"✅ Successfully seeded {len(allowances)} allowances")
+        logger.info(f"✅ Successfully seeded {total} allowances")
     except Exception as e:
         await session.rollback()
         logger.error(f"❌ Failed to seed allowances: {e}")
@@ -108,27 +113,28 @@ async def validate_seeded_data(session: AsyncSession, expected_count: int) -> No
     logger.info("Validating seeded data...")
     
     # Count total allowances
-    stmt = select(Allowance)
+    stmt = select(AllowanceRange).order_by(AllowanceRange.start_serial)
     result = await session.execute(stmt)
-    all_allowances = result.scalars().all()
-    total_count = len(all_allowances)
+    all_ranges = result.scalars().all()
+    total_count = sum(r.quantity for r in all_ranges)
     
     if total_count != expected_count:
         logger.error(f"❌ Expected {expected_count} allowances, found {total_count}")
         return False
     
     # Check all are available
-    available_count = sum(1 for a in all_allowances if a.status == AllowanceStatus.AVAILABLE)
+    available_count = sum(
+        r.quantity for r in all_ranges if r.status == AllowanceStatus.AVAILABLE
+    )
     if available_count != expected_count:
         logger.error(f"❌ Expected {expected_count} available allowances, found {available_count}")
         return False
-    
-    # Check for duplicates
-    serial_numbers = [a.serial_number for a in all_allowances]
-    unique_serials = set(serial_numbers)
-    if len(unique_serials) != len(serial_numbers):
-        logger.error(f"❌ Found duplicate serial numbers")
-        return False
+
+    # Check for overlapping ranges (duplicate serial numbers)
+    for previous, current in zip(all_ranges, all_ranges[1:]):
+        if current.start_serial <= previous.end_serial:
+            logger.error("❌ Found duplicate serial numbers")
+            return False
     
     logger.info(f"✅ Data validation passed: {total_count} unique available allowances")
     return True
@@ -149,10 +155,11 @@ async def main():
     logger.info(f"Parsing CSV file: {csv_file_path}")
     ranges = parse_csv_ranges(str(csv_file_path))
     logger.info(f"Found {len(ranges)} ranges in CSV")
-    
-    # Generate serial numbers
-    serial_numbers = generate_serial_numbers(ranges)
-    logger.info(f"Generated {len(serial_numbers)} unique serial numbers")
+
+    # Build inventory ranges
+    allowance_ranges = build_allowance_ranges(ranges)
+    total_serials = sum(r.quantity for r in allowance_ranges)
+    logger.info(f"Prepared {total_serials} serial numbers in {len(allowance_ranges)} ranges")
     
     # Create database session
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
@@ -169,10 +176,10 @@ async def main():
                 return False
         
         # Seed the database
-        await seed_allowances(serial_numbers, session)
+        await seed_allowances(allowance_ranges, session)
         
         # Validate the seeded data
-        total_expected = existing_count + len(serial_numbers)
+        total_expected = existing_count + total_serials
         await validate_seeded_data(session, total_expected)
     
     logger.info("✅ Seeding completed successfully!")
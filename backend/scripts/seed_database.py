@@ -47,21 +47,36 @@ def parse_csv_ranges(csv_file_path: str) -> List[Tuple[int, int, str, str]]:
     return ranges
 
 
-def generate_serial_numbers(ranges: List[Tuple[int, int, str, str]]) -> List[str]:
-    """Generate all individual serial numbers from ranges"""
-    all_serials = []
+# Defaults of settings.allocation_buckets / bucket_min_chunk_size
+ALLOCATION_BUCKETS = 16
+BUCKET_MIN_CHUNK_SIZE = 50
+
+
+def split_into_buckets(
+    ranges: List[Tuple[int, int, str, str]]
+) -> List[Tuple[int, int, str, str, int]]:
+    """Cut ranges, laid end to end in serial order, into one equal run per allocation bucket"""
+    ranges = sorted(ranges)
+    total = sum(end - start + 1 for start, end, _, _ in ranges)
+    share = max(BUCKET_MIN_CHUNK_SIZE, -(-total // ALLOCATION_BUCKETS))
     
+    chunks = []
+    position = 0
     for start, end, state, year in ranges:
-        count = end - start + 1
-        logger.info(f"Generating {count} serials for {state} {year}: {start}-{end}")
-        
-        for serial in range(start, end + 1):
-            all_serials.append(str(serial))
+        chunk_start = start
+        while chunk_start <= end:
+            offset = position + chunk_start - start
+            chunk_end = min(end, chunk_start + share - offset % share - 1)
+            chunks.append((chunk_start, chunk_end, state, year, (offset // share) % ALLOCATION_BUCKETS))
+            chunk_start = chunk_end + 1
+        position += end - start + 1
     
-    return all_serials
+    return chunks
 
 
-async def seed_database_with_raw_sql(database_url: str, serial_numbers: List[str]) -> bool:
+async def seed_database_with_raw_sql(
+    database_url: str, ranges: List[Tuple[int, int, str, str]]
+) -> bool:
     """Seed the database using raw SQL for better performance"""
     try:
         import asyncpg
@@ -71,7 +86,7 @@ async def seed_database_with_raw_sql(database_url: str, serial_numbers: List[str
         
         # Check if table exists and has data
         existing_count = await conn.fetchval(
-            "SELECT COUNT(*) FROM allowances"
+            "SELECT COALESCE(SUM(end_serial - start_serial + 1), 0) FROM allowance_ranges"
         )
         
         if existing_count > 0:
@@ -82,29 +97,53 @@ async def seed_database_with_raw_sql(database_url: str, serial_numbers: List[str
                 return False
         
         # Prepare batch insert data
-        logger.info(f"Preparing to insert {len(serial_numbers)} allowances...")
+        logger.info(f"Preparing to insert {len(ranges)} allowance ranges...")
         
         # Create the SQL and data for batch insert
         insert_sql = """
-            INSERT INTO allowances (serial_number, status, created_at, updated_at)
-            VALUES ($1, $2, NOW(), NOW())
-            ON CONFLICT (serial_number) DO NOTHING
+            INSERT INTO allowance_ranges (
+                start_serial, end_serial, status, originating_state,
+                allocation_year, bucket, created_at, updated_at
+            )
+            VALUES ($1, $2, 'AVAILABLE', $3, $4, $5, NOW(), NOW())
+            ON CONFLICT (start_serial) DO NOTHING
         """
         
         # Execute batch insert
-        batch_data = [(serial, 'AVAILABLE') for serial in serial_numbers]
+        batch_data = [
+            (start, end, state, int(year), bucket)
+            for start, end, state, year, bucket in split_into_buckets(ranges)
+        ]
+
+        # Keep the inventory counters in step with the inserted ranges
+        sync_counters_sql = """
+            UPDATE inventory_counters c
+            SET count = COALESCE(t.total, 0)
+            FROM inventory_counters k
+            LEFT JOIN (
+                SELECT
+                    status,
+                    CASE WHEN status = 'AVAILABLE' THEN bucket ELSE 0 END AS slot,
+                    SUM(end_serial - start_serial + 1) AS total
+                FROM allowance_ranges
+                GROUP BY 1, 2
+            ) t ON t.status = k.status AND t.slot = k.slot
+            WHERE c.status = k.status AND c.slot = k.slot
+        """
         
         async with conn.transaction():
             await conn.executemany(insert_sql, batch_data)
+            await conn.execute(sync_counters_sql)
         
         # Verify insertion
         final_count = await conn.fetchval(
-            "SELECT COUNT(*) FROM allowances WHERE status = 'AVAILABLE'"
+            "SELECT COALESCE(SUM(end_serial - start_serial + 1), 0) "
+            "FROM allowance_ranges WHERE status = 'AVAILABLE'"
         )
         
         await conn.close()
         
-        logger.info(f"✅ Successfully seeded database")
+        logger.info("✅ Successfully seeded database")
         logger.info(f"Total available allowances: {final_count}")
         
         return True
@@ -136,16 +175,16 @@ async def main():
     ranges = parse_csv_ranges(str(csv_file_path))
     logger.info(f"Found {len(ranges)} ranges in CSV")
     
-    # Generate serial numbers
-    serial_numbers = generate_serial_numbers(ranges)
-    logger.info(f"Generated {len(serial_numbers)} unique serial numbers")
+    # Count serial numbers covered by the ranges
+    total_serials = sum(end - start + 1 for start, end, _, _ in ranges)
+    logger.info(f"Found {total_serials} serial numbers")
     
-    if len(serial_numbers) != 999:
-        logger.error(f"❌ Expected 999 serial numbers, got {len(serial_numbers)}")
+    if total_serials != 999:
+        logger.error(f"❌ Expected 999 serial numbers, got {total_serials}")
         return False
     
     # Seed the database
-    success = await seed_database_with_raw_sql(database_url, serial_numbers)
+    success = await seed_database_with_raw_sql(database_url, ranges)
     
     if success:
         logger.info("✅ Database seeding completed successfully!")
@@ -1,10 +1,16 @@
 """Test configuration and fixtures."""
 
 import os
+from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
 
 # Set test environment before importing app
 os.environ.update(
@@ -20,13 +26,43 @@ os.environ.update(
         "ALERT_EMAIL": "test@example.com",
         "FRONTEND_URL": "http://localhost:3000",
         "RATE_LIMIT_REQUESTS": "100",
+        "ONEINCH_API_KEY": "test_key",
     }
 )
 
-from app.database import get_session
+from app.database import create_tables, get_session
 from app.main import app
 
 
+@asynccontextmanager
+async def scratch_schema(schema: str):
+    """Engine on a fresh ``schema`` of TEST_DATABASE_URL with every table, dropped on exit."""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=NullPool,
+        connect_args={"server_settings": {"search_path": schema}},
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+            await create_tables(conn)
+        yield engine
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await engine.dispose()
+
+
+@pytest.fixture
+async def db_engine(request):
+    """Local Postgres engine on a scratch schema named after the test module."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    async with scratch_schema(request.module.__name__.rpartition(".")[2]) as engine:
+        yield engine
+
+
 # Mock database session for testing
 @pytest.fixture
 def mock_session():
@@ -0,0 +1,209 @@
+"""Alchemy fetch context, chain cache and payment validation RPC tests."""
+
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.alchemy import alchemy_service
+from app.services.payment_validator import payment_validator
+from app.services.price_service import price_service
+from app.utils.cache import MISSING, BoundedTTLCache
+
+TX_HASH = "0x" + "ab" * 32
+TREASURY = "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b"
+
+
+@pytest.fixture(autouse=True)
+def empty_chain_cache():
+    """Every test starts without cached chain data."""
+    for cache in (
+        alchemy_service.receipt_cache,
+        alchemy_service.transaction_cache,
+        alchemy_service.block_number_cache,
+    ):
+        cache.clear()
+    with patch.object(
+        alchemy_service, "_fetch_block_number", AsyncMock(return_value=0x10)
+    ):
+        yield
+
+
+def _rpc_mocks(block_number="0x10"):
+    transaction = {"to": TREASURY, "value": hex(10**18), "blockNumber": block_number}
+    receipt = {"status": "0x1", "blockNumber": block_number, "gasUsed": "0x5208"}
+    return (
+        patch.object(
+            alchemy_service, "_fetch_transaction", AsyncMock(return_value=transaction)
+        ),
+        patch.object(
+            alchemy_service,
+            "_fetch_transaction_receipt",
+            AsyncMock(return_value=receipt),
+        ),
+    )
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_fetch_context_deduplicates_rpcs():
+    """Identical RPCs in one context share a single call, concurrent or not."""
+    tx_mock, receipt_mock = _rpc_mocks()
+    with tx_mock as fetch_transaction, receipt_mock as fetch_receipt:
+        async with alchemy_service.fetch_context():
+            await asyncio.gather(
+                alchemy_service.get_transaction_details(TX_HASH),
+                alchemy_service.get_transaction_details(TX_HASH),
+            )
+            await alchemy_service.is_transaction_confirmed(TX_HASH)
+
+    assert fetch_transaction.await_count == 1
+    assert fetch_receipt.await_count == 1
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_shallow_receipt_expires_after_pending_ttl():
+    """Receipts without enough confirmations are only reused briefly."""
+    tx_mock, receipt_mock = _rpc_mocks(block_number="0x10")
+    with tx_mock, receipt_mock as fetch_receipt, patch.object(
+        alchemy_service, "pending_ttl", 0
+    ):
+        await alchemy_service.get_transaction_receipt(TX_HASH)
+        await alchemy_service.get_transaction_receipt(TX_HASH)
+
+    assert fetch_receipt.await_count == 2
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_final_receipt_is_cached_permanently():
+    """Receipts buried under enough blocks are never fetched again."""
+    tx_mock, receipt_mock = _rpc_mocks(block_number="0x1")
+    with tx_mock, receipt_mock as fetch_receipt, patch.object(
+        alchemy_service, "pending_ttl", 0
+    ):
+        first = await alchemy_service.get_transaction_receipt(TX_HASH)
+        second = await alchemy_service.get_transaction_receipt(TX_HASH)
+
+    assert first == second
+    assert fetch_receipt.await_count == 1
+    assert alchemy_service.receipt_cache.hits >= 1
+
+
+@pytest.mark.smoke
+def test_bounded_cache_evicts_least_recently_used():
+    """The cache never grows past its size and drops the coldest entry."""
+    cache = BoundedTTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", None)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_validate_payment_fetches_transaction_once():
+    """Payment validation sends one transaction and one receipt RPC."""
+    tx_mock, receipt_mock = _rpc_mocks()
+    amount_check = AsyncMock(return_value={"success": True, "valid": True})
+    with tx_mock as fetch_transaction, receipt_mock as fetch_receipt, patch.object(
+        price_service, "validate_payment_amount", amount_check
+    ), patch.object(payment_validator, "treasury_address", TREASURY):
+        result = await payment_validator.validate_payment_transaction(TX_HASH, 5)
+
+    assert result["valid"] is True
+    assert fetch_transaction.await_count == 1
+    assert fetch_receipt.await_count == 1
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_validate_payment_uses_locked_quote():
+    """A live quote is checked locally, without a price lookup."""
+    tx_mock, receipt_mock = _rpc_mocks()
+    live_check = AsyncMock()
+    with tx_mock, receipt_mock, patch.object(
+        price_service, "validate_payment_amount", live_check
+    ), patch.object(payment_validator, "treasury_address", TREASURY):
+        result = await payment_validator.validate_payment_transaction(
+            TX_HASH,
+            5,
+            quote_wei=10**18,
+            quote_expires_at=datetime.utcnow() + timedelta(minutes=5),
+        )
+        short = await payment_validator.validate_payment_transaction(
+            TX_HASH,
+            5,
+            quote_wei=2 * 10**18,
+            quote_expires_at=datetime.utcnow() + timedelta(minutes=5),
+        )
+
+    assert result["valid"] is True
+    assert short["valid"] is False
+    assert short["amount_error"] == "Insufficient payment amount"
+    live_check.assert_not_awaited()
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_validate_payment_expired_quote_uses_live_price():
+    """An expired quote falls back to the live price check."""
+    tx_mock, receipt_mock = _rpc_mocks()
+    live_check = AsyncMock(return_value={"success": True, "valid": True})
+    with tx_mock, receipt_mock, patch.object(
+        price_service, "validate_payment_amount", live_check
+    ), patch.object(payment_validator, "treasury_address", TREASURY):
+        result = await payment_validator.validate_payment_transaction(
+            TX_HASH,
+            5,
+            quote_wei=10**18,
+            quote_expires_at=datetime.utcnow() - timedelta(seconds=1),
+        )
+
+    assert result["valid"] is True
+    live_check.assert_awaited_once()
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_validate_payment_honours_quote_live_at_submission():
+    """A quote that expired while the payment was queued is still honoured."""
+    tx_mock, receipt_mock = _rpc_mocks()
+    live_check = AsyncMock()
+    submitted_at = datetime.utcnow() - timedelta(minutes=10)
+    with tx_mock, receipt_mock, patch.object(
+        price_service, "validate_payment_amount", live_check
+    ), patch.object(payment_validator, "treasury_address", TREASURY):
+        result = await payment_validator.validate_payment_transaction(
+            TX_HASH,
+            5,
+            quote_wei=10**18,
+            quote_expires_at=submitted_at + timedelta(minutes=5),
+            submitted_at=submitted_at,
+        )
+
+    assert result["valid"] is True
+    live_check.assert_not_awaited()
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_validate_payment_price_lookup_error_is_not_a_verdict():
+    """A failed price lookup is reported as an error, not as an invalid payment."""
+    tx_mock, receipt_mock = _rpc_mocks()
+    lookup_error = {"success": False, "error": "Payment validation error: timed out"}
+    with tx_mock, receipt_mock, patch.object(
+        price_service, "validate_payment_amount", AsyncMock(return_value=lookup_error)
+    ), patch.object(payment_validator, "treasury_address", TREASURY):
+        result = await payment_validator.validate_payment_transaction(TX_HASH, 5)
+
+    assert result["success"] is False
+    assert "valid" not in result
+    assert "timed out" in result["error"]
@@ -1,9 +1,80 @@
 """Basic API endpoint smoke tests."""
 
-from unittest.mock import MagicMock
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from app.models.allowances import AllowanceStatus
+
+from app.config import settings
+from app.models.idempotency import IdempotencyRecord
+from app.models.large_order_jobs import LargeOrderJob
+from app.models.orders import Order, OrderState
+from app.services import history as history_module
+from app.services.history import history_service
+from app.services.idempotency import idempotency_service
+from app.services.inventory import inventory_service
+from app.services.large_orders import large_order_service
+from app.services.payment_jobs import payment_job_service
+from app.services.price_service import price_service
+
+
+@pytest.fixture(autouse=True)
+def fixed_quotes():
+    """Quote every order at 0.01 ETH per allowance without a price lookup."""
+
+    async def quote_payments(quantities):
+        return [
+            {
+                "eth_amount_wei": quantity * 10**16,
+                "eth_amount_formatted": f"{quantity / 100:.6f} ETH",
+                "eth_price_usd": 2400.0,
+                "total_usd": quantity * 24.0,
+                "price_source": "coingecko",
+                "expires_at": datetime.utcnow() + timedelta(minutes=15),
+            }
+            for quantity in quantities
+        ]
+
+    with patch.object(price_service, "quote_payments", side_effect=quote_payments):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_replay_cache():
+    """Every test starts without remembered transaction replays."""
+    payment_job_service.used_hashes.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_history_cache():
+    """Every test starts without cached history pages."""
+    history_service.page_cache.clear()
+
+
+@pytest.fixture
+def history_reads(mock_session):
+    """History pages are read through the mocked session too."""
+
+    @asynccontextmanager
+    async def async_session():
+        yield mock_session
+
+    with patch.object(history_module, "async_session", async_session):
+        yield mock_session
+
+
+def _unregistered_tx():
+    """Result of the replay probe when no order holds the transaction."""
+    return _scalar(None)
+
+
+def _scalar(value):
+    """Result of a statement selecting a single value."""
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = value
+    return result
 
 
 @pytest.mark.smoke
@@ -14,15 +85,29 @@ def test_health_endpoint(client):
     assert response.json() == {"status": "ok", "message": "Ultra Civic API is running"}
 
 
+@pytest.mark.api
+def test_get_inventory(client, mock_session):
+    """Test inventory endpoint reports counts per status."""
+    mock_result = MagicMock()
+    mock_result.all.return_value = [
+        ("AVAILABLE", 900),
+        ("RESERVED", 40),
+        ("RETIRED", 59),
+    ]
+    mock_session.execute.return_value = mock_result
+
+    response = client.get("/api/retirements/inventory")
+
+    assert response.status_code == 200
+    assert response.json() == {"available": 900, "reserved": 40, "retired": 59}
+
+
 @pytest.mark.api
 def test_create_retirement_success(client, mock_session, sample_retirement_request):
     """Test successful retirement creation."""
-    # Mock successful database response
+    # Mock successful reservation statement returning one serial range
     mock_result = MagicMock()
-    mock_allowances = [MagicMock() for _ in range(5)]
-    for allowance in mock_allowances:
-        allowance.status = AllowanceStatus.AVAILABLE
-    mock_result.scalars.return_value.all.return_value = mock_allowances
+    mock_result.all.return_value = [MagicMock(start_serial=1000, end_serial=1004)]
     mock_session.execute.return_value = mock_result
 
     response = client.post("/api/retirements/", json=sample_retirement_request)
@@ -31,6 +116,45 @@ def test_create_retirement_success(client, mock_session, sample_retirement_reque
     data = response.json()
     assert "order_id" in data
     assert data["message"] == "Allowances reserved successfully"
+    # The quote is returned and stored with the order in the reservation statement
+    assert data["quote"]["eth_amount_wei"] == str(5 * 10**16)
+    assert data["quote"]["price_source"] == "coingecko"
+    params = mock_session.execute.await_args_list[0].args[1]
+    assert params["quote_wei"] == 5 * 10**16
+    assert params["quote_source"] == "coingecko"
+
+
+@pytest.mark.api
+def test_create_retirement_replay_skips_price_lookup(
+    client, mock_session, sample_retirement_request
+):
+    """A replayed request is answered from the stored response, unpriced."""
+    stored = IdempotencyRecord(
+        key="retry-1",
+        scope="create_retirement",
+        request_hash="",
+        status_code=200,
+        response_body=b'{"order_id":"550e8400-e29b-41d4-a716-446655440000"}',
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    )
+
+    with patch.object(
+        idempotency_service, "claim", AsyncMock(return_value=stored)
+    ), patch.object(
+        price_service,
+        "quote_payments",
+        AsyncMock(side_effect=RuntimeError("price down")),
+    ) as quote:
+        response = client.post(
+            "/api/retirements/",
+            json=sample_retirement_request,
+            headers={"Idempotency-Key": "retry-1"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.json() == {"order_id": "550e8400-e29b-41d4-a716-446655440000"}
+    quote.assert_not_awaited()
 
 
 @pytest.mark.api
@@ -38,18 +162,17 @@ def test_create_retirement_insufficient_allowances(
     client, mock_session, sample_retirement_request
 ):
     """Test retirement creation with insufficient allowances."""
-    # Mock insufficient allowances
-    mock_result = MagicMock()
-    mock_result.scalars.return_value.all.return_value = [
-        MagicMock(),
-        MagicMock(),
-    ]  # Only 2 allowances
-    mock_session.execute.return_value = mock_result
+    # Mock reservation writing nothing and only 2 allowances available
+    reserve_result = MagicMock()
+    reserve_result.all.return_value = []
+    stock_result = MagicMock()
+    stock_result.all.return_value = [(0, 2)]
+    mock_session.execute.side_effect = [reserve_result, stock_result]
 
     response = client.post("/api/retirements/", json=sample_retirement_request)
 
     assert response.status_code == 400
-    assert "Only 2 allowances available" in response.json()["detail"]
+    assert "Only 2 allowances available" in response.json()["error"]
 
 
 @pytest.mark.api
@@ -62,20 +185,158 @@ def test_create_retirement_invalid_wallet(client, sample_retirement_request):
     assert response.status_code == 422  # Validation error
 
 
+@pytest.mark.api
+def test_create_retirement_batch_best_effort(
+    client, mock_session, sample_retirement_request
+):
+    """Test best-effort batch reports which entries got an order."""
+
+    async def fill_first(session, entries, all_or_nothing):
+        return {entries[0]["order_id"]: [(1000, 1004)]}
+
+    batch = {"entries": [sample_retirement_request] * 2, "mode": "best_effort"}
+    with patch.object(
+        inventory_service, "reserve_batch", AsyncMock(side_effect=fill_first)
+    ):
+        response = client.post("/api/retirements/batch", json=batch)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["reserved"] == 1
+    assert data["failed"] == 1
+    assert data["results"][0]["reserved"] is True
+    assert data["results"][0]["order_id"]
+    assert data["results"][1]["reserved"] is False
+    assert data["results"][1]["order_id"] is None
+
+
+@pytest.mark.api
+def test_create_retirement_batch_insufficient_allowances(
+    client, mock_session, sample_retirement_request
+):
+    """Test all-or-nothing batch fails when the whole batch cannot be covered."""
+    # Only 8 of the 10 requested allowances are in stock
+    stock_result = MagicMock()
+    stock_result.all.return_value = [(0, 8)]
+    mock_session.execute.return_value = stock_result
+
+    batch = {"entries": [sample_retirement_request] * 2}
+    response = client.post("/api/retirements/batch", json=batch)
+
+    assert response.status_code == 400
+    assert "Only 8 allowances available" in response.json()["error"]
+
+
+@pytest.mark.api
+def test_create_large_retirement_accepted(
+    client, mock_session, sample_retirement_request
+):
+    """Test a large order is accepted and its fill queued with it."""
+    stock_result = MagicMock()
+    stock_result.scalar_one.return_value = 5000
+    mock_session.execute.return_value = stock_result
+    mock_session.add = MagicMock()
+    sample_retirement_request["num_allowances"] = 1500
+
+    with patch.object(large_order_service, "fill", AsyncMock()) as fill:
+        response = client.post("/api/retirements/large", json=sample_retirement_request)
+
+    assert response.status_code == 202
+    data = response.json()
+    assert data["num_allowances"] == 1500
+    fill.assert_not_awaited()
+    order, job = (call.args[0] for call in mock_session.add.call_args_list)
+    assert order.status == OrderState.RESERVING
+    assert order.num_reserved == 0
+    assert isinstance(job, LargeOrderJob)
+    assert job.order_id == data["order_id"]
+    mock_session.commit.assert_awaited()
+
+
+@pytest.mark.api
+def test_create_large_retirement_over_limit(client, sample_retirement_request):
+    """Test a large order above the configured maximum is rejected."""
+    sample_retirement_request["num_allowances"] = large_order_service.max_allowances + 1
+
+    response = client.post("/api/retirements/large", json=sample_retirement_request)
+
+    assert response.status_code == 400
+
+
 @pytest.mark.api
 def test_confirm_payment_success(client, mock_session, sample_confirm_request):
-    """Test successful payment confirmation."""
+    """Test payment confirmation is queued and accepted at once."""
     # Mock order exists
     mock_result = MagicMock()
-    mock_result.scalars.return_value.all.return_value = [MagicMock()]
-    mock_session.execute.return_value = mock_result
+    mock_result.scalar_one_or_none.return_value = MagicMock(
+        status=OrderState.RESERVED, tx_hash=None, num_allowances=5
+    )
+    mock_session.execute.side_effect = [_unregistered_tx(), mock_result, MagicMock()]
 
-    response = client.post("/api/retirements/confirm", json=sample_confirm_request)
+    with patch.object(
+        payment_job_service, "enqueue", AsyncMock(return_value=True)
+    ) as enqueue:
+        response = client.post("/api/retirements/confirm", json=sample_confirm_request)
 
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["message"] == "Payment confirmation received"
     assert data["status"] == "processing"
+    enqueue.assert_awaited_once_with(
+        mock_session,
+        sample_confirm_request["order_id"],
+        sample_confirm_request["tx_hash"],
+    )
+    # Status streams hear about the queued payment once the request commits
+    notify_params = mock_session.execute.await_args_list[2].args[1]
+    assert json.loads(notify_params["payloads"][0]) == {
+        "order_id": sample_confirm_request["order_id"],
+        "state": "RESERVED",
+        "event": "payment_queued",
+    }
+    mock_session.commit.assert_awaited()
+
+
+@pytest.mark.api
+def test_confirm_payment_other_transaction_queued(
+    client, mock_session, sample_confirm_request
+):
+    """Test a second transaction for an order with a queued payment is rejected."""
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = MagicMock(
+        status=OrderState.RESERVED, tx_hash=None, num_allowances=5
+    )
+    mock_session.execute.side_effect = [_unregistered_tx(), mock_result]
+    queued = MagicMock(tx_hash="0x" + "f" * 64)
+
+    with patch.object(
+        payment_job_service, "enqueue", AsyncMock(return_value=False)
+    ), patch.object(payment_job_service, "get_job", AsyncMock(return_value=queued)):
+        response = client.post("/api/retirements/confirm", json=sample_confirm_request)
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "Payment already confirmed for this order"
+
+
+@pytest.mark.api
+def test_confirm_payment_replayed_transaction(
+    client, mock_session, sample_confirm_request
+):
+    """Test a transaction registered to another order is rejected up front."""
+    registered = MagicMock()
+    registered.scalar_one_or_none.return_value = "650e8400-e29b-41d4-a716-446655440000"
+    mock_session.execute.return_value = registered
+
+    with patch.object(payment_job_service, "enqueue", AsyncMock()) as enqueue:
+        first = client.post("/api/retirements/confirm", json=sample_confirm_request)
+        second = client.post("/api/retirements/confirm", json=sample_confirm_request)
+
+    assert first.status_code == 400
+    assert first.json()["error"] == "Transaction was already used for another order"
+    assert second.status_code == 400
+    # The second replay is answered from memory, before the order is even read
+    assert mock_session.execute.await_count == 1
+    enqueue.assert_not_awaited()
 
 
 @pytest.mark.api
@@ -83,13 +344,13 @@ def test_confirm_payment_order_not_found(client, mock_session, sample_confirm_re
     """Test payment confirmation for non-existent order."""
     # Mock order doesn't exist
     mock_result = MagicMock()
-    mock_result.scalars.return_value.all.return_value = []
+    mock_result.scalar_one_or_none.return_value = None
     mock_session.execute.return_value = mock_result
 
     response = client.post("/api/retirements/confirm", json=sample_confirm_request)
 
     assert response.status_code == 404
-    assert response.json()["detail"] == "Order not found"
+    assert response.json()["error"] == "Order not found"
 
 
 @pytest.mark.api
@@ -98,14 +359,16 @@ def test_get_order_status_success(client, mock_session):
     order_id = "550e8400-e29b-41d4-a716-446655440000"
 
     # Mock order exists
-    mock_allowance = MagicMock()
-    mock_allowance.status = AllowanceStatus.RESERVED
-    mock_allowance.message = "Test message"
-    mock_allowance.serial_number = "ABC123"
-
-    mock_result = MagicMock()
-    mock_result.scalars.return_value.all.return_value = [mock_allowance]
-    mock_session.execute.return_value = mock_result
+    mock_order = MagicMock()
+    mock_order.order_id = order_id
+    mock_order.status = OrderState.RESERVED
+    mock_order.message = "Test message"
+    mock_order.tx_hash = None
+    mock_order.reward_tx_hash = None
+    mock_order.distribution_started_at = None
+    mock_order.updated_at = datetime(2026, 1, 1)
+    mock_session.execute.return_value = _scalar(mock_order.updated_at)
+    mock_session.get.return_value = mock_order
 
     response = client.get(f"/api/retirements/status/{order_id}")
 
@@ -114,6 +377,83 @@ def test_get_order_status_success(client, mock_session):
     assert data["order_id"] == order_id
     assert data["status"] == "pending"
     assert data["message"] == "Test message"
+    assert response.headers["ETag"] == '"1767225600000000"'
+
+
+@pytest.mark.api
+def test_get_order_status_not_modified(client, mock_session):
+    """Test a poll with the current ETag is answered without loading the order."""
+    order_id = "550e8400-e29b-41d4-a716-446655440000"
+    mock_session.execute.return_value = _scalar(datetime(2026, 1, 1))
+
+    response = client.get(
+        f"/api/retirements/status/{order_id}",
+        headers={"If-None-Match": 'W/"1", "1767225600000000"'},
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"1767225600000000"'
+    mock_session.get.assert_not_awaited()
+
+
+@pytest.mark.api
+def test_get_order_status_serial_ranges(client, mock_session):
+    """Test a completed order lists runs of serials when asked through Accept."""
+    order_id = "550e8400-e29b-41d4-a716-446655440000"
+
+    mock_order = MagicMock()
+    mock_order.order_id = order_id
+    mock_order.status = OrderState.RETIRED
+    mock_order.message = None
+    mock_order.tx_hash = "0x" + "a" * 64
+    mock_order.reward_tx_hash = "0x" + "b" * 64
+    mock_order.updated_at = datetime(2026, 1, 1)
+    mock_session.execute.return_value = _scalar(mock_order.updated_at)
+    mock_session.get.return_value = mock_order
+    ranges = [
+        MagicMock(start_serial=100, end_serial=149),
+        MagicMock(start_serial=150, end_serial=198),
+        MagicMock(start_serial=300, end_serial=300),
+    ]
+
+    with patch.object(
+        inventory_service, "get_order_ranges", AsyncMock(return_value=ranges)
+    ):
+        response = client.get(
+            f"/api/retirements/status/{order_id}",
+            headers={"Accept": "application/json; serials=ranges"},
+        )
+
+    assert response.status_code == 200
+    assert response.json()["serial_numbers"] == ["100-198", "300"]
+    assert response.headers["ETag"] == '"1767225600000000-ranges"'
+    assert response.headers["Vary"] == "Accept"
+
+
+@pytest.mark.api
+def test_get_order_status_reserving(client, mock_session):
+    """Test a large order reports its reservation progress."""
+    order_id = "550e8400-e29b-41d4-a716-446655440000"
+
+    mock_order = MagicMock()
+    mock_order.order_id = order_id
+    mock_order.status = OrderState.RESERVING
+    mock_order.message = None
+    mock_order.tx_hash = None
+    mock_order.reward_tx_hash = None
+    mock_order.num_allowances = 1500
+    mock_order.num_reserved = 396
+    mock_order.updated_at = datetime(2026, 1, 1)
+    mock_session.execute.return_value = _scalar(mock_order.updated_at)
+    mock_session.get.return_value = mock_order
+
+    response = client.get(f"/api/retirements/status/{order_id}")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "reserving"
+    assert data["num_allowances"] == 1500
+    assert data["reserved_allowances"] == 396
 
 
 @pytest.mark.api
@@ -122,11 +462,364 @@ def test_get_order_status_not_found(client, mock_session):
     order_id = "550e8400-e29b-41d4-a716-446655440000"
 
     # Mock order doesn't exist
-    mock_result = MagicMock()
-    mock_result.scalars.return_value.all.return_value = []
-    mock_session.execute.return_value = mock_result
+    mock_session.execute.return_value = _scalar(None)
 
     response = client.get(f"/api/retirements/status/{order_id}")
 
     assert response.status_code == 404
-    assert response.json()["detail"] == "Order not found"
+    assert response.json()["error"] == "Order not found"
+
+
+@pytest.mark.api
+def test_get_retirement_history_not_modified(client, mock_session):
+    """Test a history poll with the current ETag skips the history queries."""
+    mock_session.execute.return_value = _scalar(42)
+
+    response = client.get(
+        "/api/retirements/history", headers={"If-None-Match": '"retirements-42"'}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"retirements-42"'
+    assert mock_session.execute.await_count == 1
+
+
+@pytest.mark.api
+def test_get_retirement_history_etag_changes_with_retirements(
+    client, mock_session, history_reads
+):
+    """Test an outdated history ETag gets the full page and the new ETag."""
+    no_orders = MagicMock()
+    no_orders.all.return_value = [MagicMock(total=0, order_id=None)]
+    mock_session.execute.side_effect = [_scalar(43), no_orders]
+
+    response = client.get(
+        "/api/retirements/history", headers={"If-None-Match": '"retirements-42"'}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"retirements-43"'
+    assert response.json() == {"retirements": [], "total": 0, "next_cursor": None}
+
+
+def _history_row(second, order_id, **fields):
+    """A row of the history page statement."""
+    row = {
+        "total": 7,
+        "order_id": order_id,
+        "wallet": "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b",
+        "message": "For the planet",
+        "reward_tx_hash": "0x" + "b" * 64,
+        "completed_at": datetime(2026, 1, 1) + timedelta(seconds=second),
+    }
+    return MagicMock(**{**row, **fields})
+
+
+@pytest.mark.api
+def test_get_retirement_history_page(client, mock_session, history_reads):
+    """Test one history page is read in a single statement after the ETag."""
+    page = MagicMock()
+    page.all.return_value = [
+        _history_row(
+            2,
+            "650e8400-e29b-41d4-a716-446655440000",
+            serial_ranges=[[100, 101], [200, 200]],
+        ),
+        # The extra row only tells that another page follows
+        _history_row(
+            1, "550e8400-e29b-41d4-a716-446655440000", serial_ranges=[[300, 300]]
+        ),
+    ]
+    mock_session.execute.side_effect = [_scalar(43), page]
+
+    response = client.get("/api/retirements/history?limit=1&offset=3")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 7
+    [item] = data["retirements"]
+    assert item["serial_numbers"] == ["100", "101", "200"]
+    assert item["timestamp"] == "2026-01-01T00:00:02"
+    assert item["etherscan_link"] == "https://sepolia.etherscan.io/tx/0x" + "b" * 64
+    assert mock_session.execute.await_args_list[1].args[1] == {"limit": 1, "offset": 3}
+    assert data["next_cursor"]
+
+
+@pytest.mark.api
+def test_get_retirement_history_without_wallet(client, mock_session, history_reads):
+    """Test a retirement with no wallet is served as the declared schema allows."""
+    page = MagicMock()
+    page.all.return_value = [
+        _history_row(
+            1,
+            "550e8400-e29b-41d4-a716-446655440000",
+            serial_ranges=[[300, 300]],
+            wallet=None,
+        )
+    ]
+    mock_session.execute.side_effect = [_scalar(43), page]
+
+    response = client.get("/api/retirements/history?limit=1")
+
+    assert response.status_code == 200
+    [item] = response.json()["retirements"]
+    assert item["wallet"] is None
+    assert item["message"] == "For the planet"
+
+
+@pytest.mark.api
+def test_get_retirement_history_cursor(client, mock_session, history_reads):
+    """Test a cursor seeks past the last order of the previous page."""
+    cursor = history_service.encode_cursor(
+        datetime(2026, 1, 1, 0, 0, 2), "650e8400-e29b-41d4-a716-446655440000"
+    )
+    page = MagicMock()
+    page.all.return_value = [
+        _history_row(
+            1, "550e8400-e29b-41d4-a716-446655440000", serial_ranges=[[300, 300]]
+        )
+    ]
+    mock_session.execute.side_effect = [_scalar(43), page]
+
+    response = client.get(f"/api/retirements/history?limit=1&cursor={cursor}")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["serial_numbers"] for item in data["retirements"]] == [["300"]]
+    assert data["next_cursor"] is None
+    params = mock_session.execute.await_args_list[1].args[1]
+    assert params["after_completed_at"] == datetime(2026, 1, 1, 0, 0, 2)
+    assert params["after_order_id"] == "650e8400-e29b-41d4-a716-446655440000"
+
+
+@pytest.mark.api
+def test_get_retirement_history_cached_until_retirement(
+    client, mock_session, history_reads
+):
+    """Test a page is served from cache until the retirement version moves."""
+    page = MagicMock()
+    page.all.return_value = [
+        _history_row(
+            2, "650e8400-e29b-41d4-a716-446655440000", serial_ranges=[[100, 100]]
+        )
+    ]
+    mock_session.execute.side_effect = [
+        _scalar(43),
+        page,
+        _scalar(43),
+        _scalar(44),
+        page,
+    ]
+
+    first = client.get("/api/retirements/history?limit=1")
+    cached = client.get("/api/retirements/history?limit=1")
+    assert mock_session.execute.await_count == 3
+    assert cached.content == first.content
+    assert cached.headers["ETag"] == '"retirements-43"'
+    assert cached.headers["content-type"] == "application/json"
+
+    retired = client.get("/api/retirements/history?limit=1")
+    assert mock_session.execute.await_count == 5
+    assert retired.headers["ETag"] == '"retirements-44"'
+    assert retired.json()["total"] == 7
+
+
+@pytest.mark.api
+def test_get_retirement_history_serial_ranges(client, mock_session, history_reads):
+    """Test the compact history variant is cached and tagged apart from the full one."""
+    page = MagicMock()
+    page.all.return_value = [
+        _history_row(
+            2,
+            "650e8400-e29b-41d4-a716-446655440000",
+            serial_ranges=[[100, 101], [102, 150], [200, 200]],
+        ),
+    ]
+    mock_session.execute.side_effect = [_scalar(43), page, _scalar(43), page]
+
+    compact = client.get("/api/retirements/history?serials=ranges")
+    full = client.get("/api/retirements/history")
+
+    assert compact.json()["retirements"][0]["serial_numbers"] == ["100-150", "200"]
+    assert compact.headers["ETag"] == '"retirements-43-ranges"'
+    assert compact.headers["Vary"] == "Accept"
+    assert len(full.json()["retirements"][0]["serial_numbers"]) == 52
+    assert full.headers["ETag"] == '"retirements-43"'
+
+
+@pytest.mark.api
+def test_get_wallet_retirements(client, mock_session):
+    """Test a wallet's page and totals are read in a single statement after the ETag."""
+    totals = {
+        "retirements": 3,
+        "tons_retired": 12,
+        "pr_earned": 12,
+        "first_retired_at": datetime(2026, 1, 1),
+        "last_retired_at": datetime(2026, 1, 1, 0, 0, 2),
+    }
+    page = MagicMock()
+    page.all.return_value = [
+        _history_row(
+            2,
+            "650e8400-e29b-41d4-a716-446655440000",
+            serial_ranges=[[100, 101]],
+            **totals,
+        ),
+    ]
+    mock_session.execute.side_effect = [_scalar(43), page]
+
+    response = client.get(
+        "/api/retirements/wallet/0x742D35CC6634C0532925A3B8D11D2D7D2AE30B2B?limit=5"
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"retirements-43"'
+    data = response.json()
+    assert data["wallet"] == "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b"
+    assert (data["total"], data["tons_retired"], data["pr_earned"]) == (3, 12, 12)
+    assert data["last_retired_at"] == "2026-01-01T00:00:02"
+    assert [item["serial_numbers"] for item in data["retirements"]] == [["100", "101"]]
+    assert data["next_cursor"] is None
+    params = mock_session.execute.await_args_list[1].args[1]
+    assert params == {
+        "wallet": "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b",
+        "limit": 5,
+    }
+
+
+@pytest.mark.api
+def test_get_wallet_retirements_invalid_address(client, mock_session):
+    """Test a malformed wallet address is rejected before any query."""
+    response = client.get("/api/retirements/wallet/0x1234")
+
+    assert response.status_code == 422
+    mock_session.execute.assert_not_awaited()
+
+
+@pytest.mark.api
+def test_export_rejects_unknown_format(client, mock_session):
+    """Test only the supported export formats are accepted."""
+    response = client.get("/api/retirements/export?format=xlsx")
+
+    assert response.status_code == 422
+    mock_session.stream.assert_not_called()
+
+
+@pytest.mark.api
+def test_export_parquet_unavailable(client, mock_session):
+    """Test Parquet is refused up front when pyarrow is not installed."""
+    with patch("app.services.retirement_export.pq", None):
+        response = client.get("/api/retirements/export?format=parquet")
+
+    assert response.status_code == 501
+    assert response.json()["error"] == "parquet export is not available on this server"
+
+
+@pytest.mark.api
+def test_get_retirement_history_invalid_cursor(client, mock_session):
+    """Test a cursor that was not issued by the server is rejected."""
+    mock_session.execute.return_value = _scalar(43)
+
+    response = client.get("/api/retirements/history?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "Invalid history cursor"
+
+
+def _order_at(second, **fields):
+    """An order last updated ``second`` seconds into 2026."""
+    return Order(
+        order_id="550e8400-e29b-41d4-a716-446655440000",
+        num_allowances=5,
+        updated_at=datetime(2026, 1, 1) + timedelta(seconds=second),
+        **fields,
+    )
+
+
+def _stream_events(body):
+    """Parse the events of a Server-Sent Events body into (id, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1)
+            for line in block.splitlines()
+            if not line.startswith(":")
+        )
+        if "data" in fields:
+            events.append((int(fields["id"]), json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.api
+def test_stream_order_status_until_completed(client, mock_session):
+    """Test the status stream pushes each transition once and ends when settled."""
+    order_id = "550e8400-e29b-41d4-a716-446655440000"
+    pending = _order_at(1, status=OrderState.RESERVED)
+    paid = _order_at(2, status=OrderState.RESERVED, tx_hash="0x" + "a" * 64)
+    distributing = _order_at(
+        3,
+        status=OrderState.RESERVED,
+        tx_hash="0x" + "a" * 64,
+        distribution_started_at=datetime(2026, 1, 1),
+    )
+    retired = _order_at(4, status=OrderState.RETIRED, tx_hash="0x" + "a" * 64)
+    mock_session.get.side_effect = [
+        pending,
+        pending,
+        pending,
+        paid,
+        distributing,
+        retired,
+    ]
+    no_ranges = MagicMock()
+    no_ranges.scalars.return_value.all.return_value = []
+    mock_session.execute.return_value = no_ranges
+
+    with patch.object(settings, "order_stream_poll_seconds", 0):
+        response = client.get(f"/api/retirements/status/{order_id}/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _stream_events(response.text)
+    assert [data["status"] for _, data in events] == [
+        "pending",
+        "paid_but_not_retired",
+        "distributing",
+        "completed",
+    ]
+    ids = [event_id for event_id, _ in events]
+    assert ids == sorted(ids)
+
+
+@pytest.mark.api
+def test_stream_order_status_resumes_after_last_event(client, mock_session):
+    """Test a reconnecting client only gets what it has not seen."""
+    order_id = "550e8400-e29b-41d4-a716-446655440000"
+    paid = _order_at(2, status=OrderState.RESERVED, tx_hash="0x" + "a" * 64)
+    failed = _order_at(3, status=OrderState.FAILED, tx_hash="0x" + "a" * 64)
+    mock_session.get.side_effect = [paid, paid, failed]
+    seen = (paid.updated_at - datetime(1970, 1, 1)).total_seconds() * 1_000_000
+
+    with patch.object(settings, "order_stream_poll_seconds", 0):
+        response = client.get(
+            f"/api/retirements/status/{order_id}/stream",
+            headers={"Last-Event-ID": str(int(seen))},
+        )
+
+    assert [data["status"] for _, data in _stream_events(response.text)] == ["error"]
+
+
+@pytest.mark.api
+def test_stream_order_status_already_seen_final(client, mock_session):
+    """Test a client that saw the final status is told to stop reconnecting."""
+    order_id = "550e8400-e29b-41d4-a716-446655440000"
+    retired = _order_at(4, status=OrderState.RETIRED)
+    mock_session.get.return_value = retired
+    seen = (retired.updated_at - datetime(1970, 1, 1)).total_seconds() * 1_000_000
+
+    response = client.get(
+        f"/api/retirements/status/{order_id}/stream",
+        headers={"Last-Event-ID": str(int(seen))},
+    )
+
+    assert response.status_code == 204
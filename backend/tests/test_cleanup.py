@@ -0,0 +1,158 @@
+"""Reservation cleanup tests."""
+
+import os
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import cleanup_service as cleanup_module
+from app.services.cleanup_service import CleanupService
+from app.services.email import email_service
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = [
+    pytest.mark.db,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"),
+]
+
+
+async def _seed(engine, orders, jobs):
+    async with engine.begin() as conn:
+        for order_id, tx_hash, reserved_at, paid_at in orders:
+            await conn.execute(
+                text(
+                    """
+                INSERT INTO orders (
+                    order_id, status, num_allowances, tx_hash, timestamp, paid_at,
+                    created_at, updated_at
+                )
+                VALUES (:order_id, 'RESERVED', 1, :tx_hash, :reserved_at, :paid_at, now(), now())
+            """
+                ),
+                {
+                    "order_id": order_id,
+                    "tx_hash": tx_hash,
+                    "reserved_at": reserved_at,
+                    "paid_at": paid_at,
+                },
+            )
+        for order_id, tx_hash, job_status in jobs:
+            await conn.execute(
+                text(
+                    """
+                INSERT INTO payment_jobs (
+                    order_id, tx_hash, status, attempts, run_at, created_at, updated_at
+                )
+                VALUES (:order_id, :tx_hash, CAST(:status AS paymentjobstate), 1, now(), now(), now())
+            """
+                ),
+                {"order_id": order_id, "tx_hash": tx_hash, "status": job_status},
+            )
+
+
+async def _run_cleanup(engine, orders, jobs):
+    """Run both reservation cleanups against seeded orders; returns their states."""
+    await _seed(engine, orders, jobs)
+
+    async def get_session():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    service = CleanupService()
+    with patch.object(cleanup_module, "get_session", get_session):
+        await service.cleanup_expired_reservations()
+        await service.cleanup_orphaned_transactions()
+
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT order_id, status FROM orders"))
+        return dict(result.all())
+
+
+async def test_only_unpaid_reservations_expire(db_engine):
+    """Paid orders and orders with a queued payment keep their serials."""
+    timeout = CleanupService().reservation_timeout_minutes
+    now = datetime.utcnow()
+    expired = now - timedelta(minutes=timeout + 1)
+    states = await _run_cleanup(
+        db_engine,
+        orders=[
+            ("unpaid", None, expired, None),
+            ("queued", None, expired, now),
+            ("rejected", None, expired, now),
+            ("paid", "0x" + "01" * 32, expired, now),
+            (
+                "stuck",
+                "0x" + "02" * 32,
+                expired,
+                now - timedelta(minutes=timeout * 2 + 1),
+            ),
+            ("fresh", None, now, None),
+        ],
+        jobs=[
+            ("queued", "0x" + "03" * 32, "QUEUED"),
+            ("rejected", "0x" + "04" * 32, "FAILED"),
+        ],
+    )
+
+    assert states == {
+        "unpaid": "EXPIRED",
+        "queued": "RESERVED",
+        "rejected": "EXPIRED",
+        "paid": "RESERVED",
+        "stuck": "FAILED",
+        "fresh": "RESERVED",
+    }
+
+
+async def test_stalled_distributions_are_reported_and_left_alone(db_engine):
+    """Orders claimed for distribution long ago are alerted on and counted in stats."""
+    service = CleanupService()
+    now = datetime.utcnow()
+    stalled_at = now - timedelta(minutes=service.distribution_stall_minutes + 1)
+    async with db_engine.begin() as conn:
+        for order_id, started_at in [
+            ("stalled", stalled_at),
+            ("sending", now),
+            ("unclaimed", None),
+        ]:
+            await conn.execute(
+                text(
+                    """
+                INSERT INTO orders (
+                    order_id, status, num_allowances, tx_hash, paid_at,
+                    distribution_started_at, created_at, updated_at
+                )
+                VALUES (:order_id, 'RESERVED', 1, :tx_hash, now(), :started_at, now(), now())
+            """
+                ),
+                {
+                    "order_id": order_id,
+                    "tx_hash": "0x" + order_id.encode().hex().ljust(64, "0"),
+                    "started_at": started_at,
+                },
+            )
+
+    async def get_session():
+        async with AsyncSession(db_engine) as session:
+            yield session
+
+    with patch.object(cleanup_module, "get_session", get_session), patch.object(
+        cleanup_module.inventory_service,
+        "count_by_status",
+        AsyncMock(return_value={"AVAILABLE": 0, "RESERVED": 3, "RETIRED": 0}),
+    ), patch.object(email_service, "send_system_error_alert", AsyncMock()) as alert:
+        result = await service.check_stalled_distributions()
+        stats = await service.get_cleanup_stats()
+
+    assert result["order_ids"] == ["stalled"]
+    assert alert.await_args.kwargs["context"] == {"order_ids": ["stalled"]}
+    assert stats["stats"]["stalled_distributions"] == 1
+    async with db_engine.connect() as conn:
+        statuses = set(
+            (await conn.execute(text("SELECT status::text FROM orders"))).scalars()
+        )
+    assert statuses == {"RESERVED"}
@@ -0,0 +1,212 @@
+"""Retirement history projection tests."""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.orders import Order, OrderState
+from app.services import history as history_module
+from app.services.history import HistoryService, history_service
+from app.services.inventory import inventory_service
+from app.services.thirdweb import thirdweb_service
+from app.services.transaction_monitor import transaction_monitor
+
+ORDER_ID = "550e8400-e29b-41d4-a716-446655440000"
+WALLET = "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b"
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_retirement_is_recorded_in_the_retiring_transaction():
+    """The history row is written after the serials are retired, before commit."""
+    order = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RESERVED,
+        num_allowances=2,
+        wallet=WALLET,
+        tx_hash="0x" + "a" * 64,
+    )
+    session = AsyncMock()
+    session.get = AsyncMock(return_value=order)
+    steps = MagicMock()
+    steps.attach_mock(session.commit, "commit")
+    retire, record = AsyncMock(), AsyncMock()
+    steps.attach_mock(retire, "retire")
+    steps.attach_mock(record, "record")
+
+    with patch.object(
+        inventory_service, "get_order_ranges", AsyncMock(return_value=[])
+    ), patch.object(inventory_service, "retire", retire), patch.object(
+        history_service, "record", record
+    ), patch.object(
+        thirdweb_service,
+        "transfer_tokens",
+        AsyncMock(return_value={"success": True, "transaction_hash": "0x" + "b" * 64}),
+    ):
+        await transaction_monitor._process_confirmed_payment(session, ORDER_ID)
+
+    assert order.status == OrderState.RETIRED
+    names = [name for name, _, _ in steps.mock_calls]
+    # Distribution start, then retirement and projection in one commit
+    assert names == ["commit", "retire", "record", "commit"]
+    record.assert_awaited_once_with(session, order)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_page_misses_share_one_read():
+    """Requests missing the same page wait for a single read and serialization.
+
+    The read has a session of its own, open only while the page is built, so
+    the first request finishing or being cancelled does not close it.
+    """
+    service = HistoryService()
+    released = asyncio.Event()
+    sessions = []
+
+    @asynccontextmanager
+    async def async_session():
+        session = MagicMock(open=True)
+        sessions.append(session)
+        yield session
+        session.open = False
+
+    async def get_page(session, limit, offset, cursor, serial_format):
+        await released.wait()
+        assert session.open
+        return [], 0, None
+
+    with patch.object(history_module, "async_session", async_session), patch.object(
+        service, "get_page", AsyncMock(side_effect=get_page)
+    ) as read:
+        waiting = [
+            asyncio.ensure_future(service.get_page_json(7, limit=50)) for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        # The request that started the read goes away before it completes
+        waiting[0].cancel()
+        released.set()
+        bodies = await asyncio.gather(*waiting[1:])
+
+        assert waiting[0].cancelled()
+        assert read.await_count == 1
+        assert read.await_args.args[0] is sessions[0]
+        assert not sessions[0].open
+        assert set(bodies) == {b'{"retirements":[],"total":0,"next_cursor":null}'}
+
+        # Cached for this version; a retirement moves on to the next one
+        await service.get_page_json(7, limit=50)
+        assert read.await_count == 1
+        await service.get_page_json(8, limit=50)
+        assert read.await_count == 2
+        assert len(sessions) == 2
+        assert service.page_cache.stats()["entries"] == 1
+
+
+async def _seed(engine):
+    async with engine.begin() as conn:
+        # Order i holds ranges [i*100, i*100+1] and [i*100+10, i*100+10];
+        # orders 1-3 are retired, order 4 is still reserved
+        await conn.execute(
+            text(
+                """
+            INSERT INTO orders (order_id, status, wallet, num_allowances, created_at, updated_at)
+            SELECT
+                'order-' || i,
+                CASE WHEN i = 4 THEN 'RESERVED' ELSE 'RETIRED' END::orderstate,
+                :wallet, 3,
+                now(), TIMESTAMP '2026-01-01' + i * interval '1 minute'
+            FROM generate_series(1, 4) AS i
+        """
+            ),
+            {"wallet": WALLET},
+        )
+        await conn.execute(
+            text(
+                """
+            INSERT INTO allowance_ranges (start_serial, end_serial, status, bucket, created_at, updated_at)
+            SELECT s, s + CASE WHEN s % 100 = 0 THEN 1 ELSE 0 END, 'RETIRED', 0, now(), now()
+            FROM generate_series(1, 4) AS i, LATERAL (VALUES (i * 100), (i * 100 + 10)) v(s)
+        """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+            INSERT INTO order_allowances (order_id, range_id)
+            SELECT 'order-' || (r.start_serial / 100), r.id FROM allowance_ranges r
+        """
+            )
+        )
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_backfill_then_record_builds_the_history(db_engine):
+    """Backfill projects past retirements once; new ones are recorded as they land.
+
+    Each wallet's totals follow both.
+    """
+
+    await _seed(db_engine)
+    async with AsyncSession(db_engine, expire_on_commit=False) as session:
+        version = await inventory_service.retirement_version(session)
+
+        assert await history_service.backfill(session, batch_size=2) == 3
+        assert await history_service.backfill(session) == 0
+        assert await inventory_service.retirement_version(session) > version
+
+        items, total, cursor = await history_service.get_page(session, limit=2)
+        assert total == 3
+        assert [item["order_id"] for item in items] == ["order-3", "order-2"]
+        assert items[0]["serial_numbers"] == ["300", "301", "310"]
+        assert items[0]["timestamp"] == "2026-01-01T00:03:00"
+
+        items, _, cursor = await history_service.get_page(session, 2, cursor=cursor)
+        assert [item["order_id"] for item in items] == ["order-1"]
+        assert cursor is None
+
+        # The fourth order retires through the regular path
+        order = await session.get(Order, "order-4")
+        order.status = OrderState.RETIRED
+        order.reward_tx_hash = "0x" + "b" * 64
+        order.updated_at = datetime(2026, 1, 2)
+        await inventory_service.retire(session, order.order_id)
+        await history_service.record(session, order)
+        await session.commit()
+
+        items, total, _ = await history_service.get_page(session, limit=1)
+        assert total == 4
+        assert items[0]["order_id"] == "order-4"
+        assert items[0]["serial_numbers"] == ["400", "401", "410"]
+        assert items[0]["etherscan_link"].endswith("0x" + "b" * 64)
+
+        # Recording again changes nothing
+        await history_service.record(session, order)
+        await session.commit()
+
+        items, totals, cursor = await history_service.get_wallet_page(
+            session, WALLET.upper().replace("0X", "0x"), limit=3
+        )
+        assert [item["order_id"] for item in items] == ["order-4", "order-3", "order-2"]
+        assert cursor is not None
+        assert totals == {
+            "retirements": 4,
+            "tons_retired": 12,
+            "pr_earned": 12,
+            "first_retired_at": datetime(2026, 1, 1, 0, 1),
+            "last_retired_at": datetime(2026, 1, 2),
+        }
+
+        items, totals, _ = await history_service.get_wallet_page(
+            session, "0x" + "0" * 40, limit=3
+        )
+        assert items == []
+        assert totals["retirements"] == 0
+        assert totals["last_retired_at"] is None
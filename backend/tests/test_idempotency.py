@@ -0,0 +1,91 @@
+"""Idempotency-Key service tests."""
+
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.models.idempotency import IdempotencyRecord
+from app.services.idempotency import (
+    IdempotencyInProgressError,
+    IdempotencyKeyReuseError,
+    idempotency_service,
+)
+
+BODY = '{"num_allowances":2}'
+
+
+def _session_with_existing(record):
+    """Session whose claim finds an existing live record."""
+    claim_result = MagicMock()
+    claim_result.first.return_value = None
+    lookup_result = MagicMock()
+    lookup_result.scalar_one.return_value = record
+
+    session = AsyncMock()
+    session.execute = AsyncMock(side_effect=[claim_result, lookup_result])
+    return session
+
+
+def _record(request_hash, response_body=b'{"order_id":"abc"}'):
+    return IdempotencyRecord(
+        key="key-1",
+        scope="create_retirement",
+        request_hash=request_hash,
+        status_code=200,
+        response_body=response_body,
+        expires_at=datetime.utcnow(),
+    )
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_claim_new_key_returns_none():
+    """Test the first request with a key owns it."""
+    claim_result = MagicMock()
+    claim_result.first.return_value = ("key-1",)
+    session = AsyncMock()
+    session.execute = AsyncMock(return_value=claim_result)
+
+    assert (
+        await idempotency_service.claim(session, "key-1", "create_retirement", BODY)
+        is None
+    )
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_claim_replays_stored_bytes():
+    """Test a retry gets the original response byte-for-byte."""
+    record = _record(idempotency_service.hash_request(BODY))
+    session = _session_with_existing(record)
+
+    stored = await idempotency_service.claim(
+        session, "key-1", "create_retirement", BODY
+    )
+    response = idempotency_service.replay(stored)
+
+    assert response.status_code == 200
+    assert response.body == b'{"order_id":"abc"}'
+    assert response.headers["idempotent-replayed"] == "true"
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_claim_rejects_different_body():
+    """Test a key cannot be reused for a different request."""
+    session = _session_with_existing(_record(idempotency_service.hash_request("{}")))
+
+    with pytest.raises(IdempotencyKeyReuseError):
+        await idempotency_service.claim(session, "key-1", "create_retirement", BODY)
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_claim_without_stored_response():
+    """Test a key with no stored response is reported as in progress."""
+    record = _record(idempotency_service.hash_request(BODY), response_body=None)
+    session = _session_with_existing(record)
+
+    with pytest.raises(IdempotencyInProgressError):
+        await idempotency_service.claim(session, "key-1", "create_retirement", BODY)
@@ -0,0 +1,178 @@
+"""Allowance range inventory tests."""
+
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.allowance_ranges import AllowanceRange
+from app.services.inventory import InventoryService
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest.mark.smoke
+def test_range_quantity_and_serial_numbers():
+    """Test a range expands to its inclusive serial numbers."""
+    allowance_range = AllowanceRange(start_serial=2165975047, end_serial=2165975049)
+
+    assert allowance_range.quantity == 3
+    assert allowance_range.serial_numbers() == [
+        "2165975047",
+        "2165975048",
+        "2165975049",
+    ]
+
+
+@pytest.mark.smoke
+def test_bucket_rotation_starts_at_request_bucket():
+    """Test buckets are tried round-robin from the start bucket, then together."""
+    service = InventoryService()
+    service.allocation_buckets = 4
+
+    rotation = service._bucket_rotation({0: 10, 1: 2, 2: 10, 3: 10}, 5, start_bucket=2)
+
+    assert rotation == [[2], [3], [0], [0, 1, 2, 3]]
+
+
+async def _in_schema(engine, work):
+    """Run ``work(service, session)`` on the scratch schema with four buckets."""
+    service = InventoryService()
+    service.allocation_buckets = 4
+    async with AsyncSession(engine) as session:
+        await work(service, session)
+        await session.commit()
+
+        ranges = await session.execute(
+            text(
+                """
+            SELECT start_serial, end_serial, status::text, bucket
+            FROM allowance_ranges ORDER BY start_serial
+        """
+            )
+        )
+        counters = await session.execute(
+            text(
+                """
+            SELECT slot, count FROM inventory_counters
+            WHERE status = 'AVAILABLE' ORDER BY slot
+        """
+            )
+        )
+        return [tuple(row) for row in ranges.all()], dict(counters.all())
+
+
+async def _insert_range(session, start, end, status, bucket, order_id=None):
+    result = await session.execute(
+        text(
+            """
+        INSERT INTO allowance_ranges (
+            start_serial, end_serial, status, bucket, created_at, updated_at
+        )
+        VALUES (:start, :end, CAST(:status AS allowancestatus), :bucket, now(), now())
+        RETURNING id
+    """
+        ),
+        {"start": start, "end": end, "status": status, "bucket": bucket},
+    )
+    if order_id:
+        await session.execute(
+            text(
+                """
+            INSERT INTO orders (order_id, status, num_allowances, created_at, updated_at)
+            VALUES (:order_id, 'RESERVED', :quantity, now(), now())
+            ON CONFLICT DO NOTHING
+        """
+            ),
+            {"order_id": order_id, "quantity": end - start + 1},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO order_allowances (order_id, range_id) VALUES (:order_id, :id)"
+            ),
+            {"order_id": order_id, "id": result.scalar_one()},
+        )
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_rebucket_gives_each_bucket_one_run_of_stock(db_engine):
+    """Free stock is split into equal contiguous shares, one per bucket."""
+
+    async def work(service, session):
+        await _insert_range(session, 1000, 1999, "AVAILABLE", 0)
+        await _insert_range(session, 3000, 3599, "AVAILABLE", 0)
+        await service.rebucket(session)
+        await service.rebuild_counters(session)
+
+    ranges, counters = await _in_schema(db_engine, work)
+
+    assert ranges == [
+        (1000, 1399, "AVAILABLE", 0),
+        (1400, 1799, "AVAILABLE", 1),
+        (1800, 1999, "AVAILABLE", 2),
+        (3000, 3199, "AVAILABLE", 2),
+        (3200, 3599, "AVAILABLE", 3),
+    ]
+    assert counters == {0: 400, 1: 400, 2: 400, 3: 400}
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_release_into_empty_bucket_merges_across_buckets(db_engine):
+    """A range released into an emptied bucket rejoins its free neighbour."""
+
+    async def work(service, session):
+        # Bucket 0 has nothing else free; bucket 2 still has stock
+        await _insert_range(session, 1000, 1099, "RESERVED", 0, order_id="order-1")
+        await _insert_range(session, 1100, 1199, "AVAILABLE", 1)
+        await _insert_range(session, 2000, 2099, "RESERVED", 2, order_id="order-2")
+        await _insert_range(session, 2100, 2199, "AVAILABLE", 3)
+        await _insert_range(session, 4000, 4099, "AVAILABLE", 2)
+        await service.rebuild_counters(session)
+
+        await service.release(session, "order-1")
+        await service.release(session, "order-2")
+
+    ranges, counters = await _in_schema(db_engine, work)
+
+    assert ranges == [
+        (1000, 1199, "AVAILABLE", 1),
+        (2000, 2099, "AVAILABLE", 2),
+        (2100, 2199, "AVAILABLE", 3),
+        (4000, 4099, "AVAILABLE", 2),
+    ]
+    assert counters == {0: 0, 1: 200, 2: 200, 3: 100}
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_best_effort_batch_skips_entries_that_do_not_fit(db_engine):
+    """A large entry that cannot be filled does not block smaller ones after it."""
+    reserved = {}
+
+    async def work(service, session):
+        await _insert_range(session, 1000, 1049, "AVAILABLE", 0)
+        await service.rebuild_counters(session)
+
+        entries = [
+            {
+                "order_id": order_id,
+                "quantity": quantity,
+                "wallet": None,
+                "message": None,
+            }
+            for order_id, quantity in [("large", 80), ("small", 30), ("smaller", 20)]
+        ]
+        reserved.update(
+            await service.reserve_batch(session, entries, all_or_nothing=False)
+        )
+
+    ranges, counters = await _in_schema(db_engine, work)
+
+    assert sorted(reserved) == ["small", "smaller"]
+    assert sum(end - start + 1 for start, end in reserved["small"]) == 30
+    assert sum(end - start + 1 for start, end in reserved["smaller"]) == 20
+    assert [r for r in ranges if r[2] == "AVAILABLE"] == []
+    assert counters[0] == 0
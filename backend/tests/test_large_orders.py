@@ -0,0 +1,119 @@
+"""Large order fill tests."""
+
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import large_orders as large_orders_module
+from app.services.inventory import inventory_service
+from app.services.large_orders import LargeOrderService
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = [
+    pytest.mark.db,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"),
+]
+
+
+async def _seed(engine, service, order_id, quantity):
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                """
+            INSERT INTO allowance_ranges (
+                start_serial, end_serial, status, bucket, created_at, updated_at
+            )
+            VALUES (1, 1000, 'AVAILABLE', 0, now(), now())
+        """
+            )
+        )
+
+    async with AsyncSession(engine) as session:
+        await inventory_service.rebucket(session)
+        await inventory_service.rebuild_counters(session)
+        await service.create(
+            session, order_id=order_id, quantity=quantity, wallet=None, message=None
+        )
+        await session.commit()
+
+
+async def test_interrupted_fill_resumes_after_its_lease_lapses(db_engine):
+    """A fill killed mid-way is leased again and finishes from where it stopped."""
+    order_id = "large-order"
+    engine = db_engine
+    service = LargeOrderService()
+    service.chunk_size = 100
+    await _seed(engine, service, order_id, 250)
+
+    def async_session():
+        return AsyncSession(engine)
+
+    async def state():
+        async with engine.connect() as conn:
+            order = (
+                await conn.execute(
+                    text(
+                        """
+                SELECT o.status, o.num_reserved,
+                       (SELECT sum(r.end_serial - r.start_serial + 1)
+                        FROM order_allowances oa
+                        JOIN allowance_ranges r ON r.id = oa.range_id
+                        WHERE oa.order_id = o.order_id)
+                FROM orders o WHERE o.order_id = :order_id
+            """
+                    ),
+                    {"order_id": order_id},
+                )
+            ).one()
+            job = (
+                await conn.execute(
+                    text(
+                        """
+                SELECT status::text, attempts FROM large_order_jobs
+                WHERE order_id = :order_id
+            """
+                    ),
+                    {"order_id": order_id},
+                )
+            ).one()
+            return tuple(order), tuple(job)
+
+    reserve = inventory_service.reserve
+    calls = 0
+
+    async def reserve_until_killed(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            # The worker is stopped between two chunks
+            raise asyncio.CancelledError()
+        return await reserve(*args, **kwargs)
+
+    with patch.object(large_orders_module, "async_session", async_session):
+        [(leased_id, attempt)] = await service.lease(1)
+        assert (leased_id, attempt) == (order_id, 1)
+        with patch.object(inventory_service, "reserve", reserve_until_killed):
+            with pytest.raises(asyncio.CancelledError):
+                await service.run_job(order_id, attempt)
+
+        assert await state() == (("RESERVING", 100, 100), ("QUEUED", 1))
+        # Nobody else takes the fill over while its lease holds
+        assert await service.lease(1) == []
+
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "UPDATE large_order_jobs SET locked_until = now() - interval '1 second'"
+                )
+            )
+        [(_, attempt)] = await service.lease(1)
+        result = await service.run_job(order_id, attempt)
+
+    assert attempt == 2
+    assert result["success"] and result["chunks"] == 2
+    assert await state() == (("RESERVED", 250, 250), ("DONE", 2))
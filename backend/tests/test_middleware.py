@@ -0,0 +1,33 @@
+"""Request middleware tests."""
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.middleware.audit import AuditMiddleware
+from app.middleware.validation import ValidationMiddleware
+
+
+@pytest.fixture
+def echo_client():
+    """App with the body-reading middleware in front of an echo endpoint."""
+    echo_app = FastAPI()
+    echo_app.add_middleware(AuditMiddleware)
+    echo_app.add_middleware(ValidationMiddleware)
+
+    @echo_app.post("/api/retirements/echo")
+    async def echo(request: Request):
+        return await request.json()
+
+    return TestClient(echo_app)
+
+
+@pytest.mark.smoke
+def test_body_reaches_endpoint_after_middleware(echo_client):
+    """Both middlewares read the body and the endpoint still receives it."""
+    response = echo_client.post(
+        "/api/retirements/echo", json={"num_allowances": 3}, timeout=5
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"num_allowances": 3}
@@ -0,0 +1,149 @@
+"""Migration chain tests."""
+
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+SCHEMA = "migration_chain"
+BASELINE = "e24cbb1d809e"
+
+pytestmark = [
+    pytest.mark.db,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"),
+]
+
+
+@pytest.fixture
+def baseline_database(monkeypatch):
+    """A scratch schema holding the per-serial schema of the baseline revision."""
+    url = TEST_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql+psycopg2://")
+    url += ("&" if "?" in url else "?") + f"options=-csearch_path%3D{SCHEMA}"
+    engine = create_engine(url, poolclass=NullPool)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(
+            text(
+                "CREATE TYPE allowancestatus AS ENUM ('AVAILABLE', 'RESERVED', 'RETIRED')"
+            )
+        )
+        conn.execute(
+            text(
+                """
+            CREATE TABLE allowances (
+                serial_number varchar(32) PRIMARY KEY,
+                status allowancestatus NOT NULL,
+                order_id varchar(36),
+                timestamp timestamp,
+                wallet varchar(42),
+                message varchar(100),
+                tx_hash varchar(66),
+                reward_tx_hash varchar(66),
+                created_at timestamp NOT NULL,
+                updated_at timestamp NOT NULL
+            )
+        """
+            )
+        )
+        conn.execute(text("CREATE INDEX ix_allowances_status ON allowances (status)"))
+        conn.execute(
+            text("CREATE INDEX ix_allowances_timestamp ON allowances (timestamp)")
+        )
+
+        # Serials 1-100: a retired order, a reserved order and free stock
+        conn.execute(
+            text(
+                """
+            INSERT INTO allowances (
+                serial_number, status, order_id, timestamp, wallet,
+                reward_tx_hash, created_at, updated_at
+            )
+            SELECT
+                i::text,
+                CASE WHEN i <= 10 THEN 'RETIRED' WHEN i <= 15 THEN 'RESERVED'
+                     ELSE 'AVAILABLE' END::allowancestatus,
+                CASE WHEN i <= 10 THEN 'order-retired' WHEN i <= 15 THEN 'order-reserved' END,
+                CASE WHEN i <= 15 THEN now() END,
+                CASE WHEN i <= 15 THEN '0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b' END,
+                CASE WHEN i <= 10 THEN '0x' || repeat('b', 64) END,
+                now(), now()
+            FROM generate_series(1, 100) AS i
+        """
+            )
+        )
+
+    config = Config()
+    config.set_main_option(
+        "script_location", str(Path(__file__).parent.parent / "alembic")
+    )
+    monkeypatch.setenv("DATABASE_URL", url)
+    command.stamp(config, BASELINE)
+    try:
+        yield config, engine
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+def test_upgrade_from_baseline_in_one_go(baseline_database):
+    """The whole chain applies in a single run, as a deploy would run it."""
+    config, engine = baseline_database
+
+    command.upgrade(config, "head")
+
+    with engine.connect() as conn:
+        assert conn.execute(
+            text("SELECT version_num FROM alembic_version")
+        ).scalar_one() == (ScriptDirectory.from_config(config).get_current_head())
+        counts = dict(
+            conn.execute(
+                text("SELECT status::text, count(*) FROM allowances GROUP BY status")
+            ).all()
+        )
+        orders = dict(
+            conn.execute(text("SELECT order_id, status::text FROM orders")).all()
+        )
+
+    assert counts == {"RETIRED": 10, "RESERVED": 5, "AVAILABLE": 85}
+    assert orders == {"order-retired": "RETIRED", "order-reserved": "RESERVED"}
+
+
+def test_downgrade_to_baseline_restores_its_schema(baseline_database):
+    """Going back down the chain leaves the per-serial table as it was."""
+    config, engine = baseline_database
+    schema_sql = text(
+        """
+        SELECT
+            (SELECT array_agg(indexname::text ORDER BY indexname)
+             FROM pg_indexes WHERE schemaname = :schema AND tablename = 'allowances'),
+            (SELECT array_agg(column_name || ' ' || data_type || ' ' || is_nullable
+                              ORDER BY column_name)
+             FROM information_schema.columns
+             WHERE table_schema = :schema AND table_name = 'allowances')
+    """
+    )
+    rows_sql = text(
+        """
+        SELECT serial_number, status::text, order_id FROM allowances ORDER BY serial_number
+    """
+    )
+    with engine.connect() as conn:
+        baseline_schema = conn.execute(schema_sql, {"schema": SCHEMA}).one()
+        baseline_rows = conn.execute(rows_sql).all()
+
+    command.upgrade(config, "head")
+    command.downgrade(config, BASELINE)
+
+    with engine.connect() as conn:
+        assert conn.execute(schema_sql, {"schema": SCHEMA}).one() == baseline_schema
+        assert conn.execute(rows_sql).all() == baseline_rows
@@ -0,0 +1,166 @@
+"""Order event bus tests."""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.retirements import _order_status_events
+from app.config import settings
+from app.models.orders import Order, OrderState
+from app.services.order_events import OrderEvent, OrderEventBus
+
+ORDER_ID = "550e8400-e29b-41d4-a716-446655440000"
+OTHER_ORDER_ID = "650e8400-e29b-41d4-a716-446655440000"
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+def _event(order_id, event=OrderEvent.RETIRED):
+    return {
+        "order_id": order_id,
+        "state": OrderState.RETIRED.value,
+        "event": event.value,
+    }
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_events_reach_order_and_global_subscribers():
+    """An event goes to its order's subscribers and to those of every order."""
+    bus = OrderEventBus()
+
+    with bus.subscribe(ORDER_ID) as mine, bus.subscribe(
+        OTHER_ORDER_ID
+    ) as other, bus.subscribe() as everything:
+        bus.dispatch(_event(ORDER_ID))
+
+        assert mine.get_nowait()["order_id"] == ORDER_ID
+        assert everything.get_nowait()["order_id"] == ORDER_ID
+        assert other.empty()
+
+        # A reconnect tells every subscriber to reread
+        bus.dispatch({"order_id": None, "event": OrderEvent.RESYNC.value})
+        assert all(q.qsize() == 1 for q in (mine, other, everything))
+
+    assert bus.stats()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_events():
+    """A subscriber that stops reading does not grow without bound."""
+    bus = OrderEventBus()
+    bus.queue_size = 2
+
+    with bus.subscribe(ORDER_ID) as events:
+        for _ in range(5):
+            bus.dispatch(_event(ORDER_ID))
+
+        assert events.qsize() == 2
+        assert bus.stats()["dropped"] == 3
+
+
+@pytest.mark.asyncio
+async def test_publish_many_notifies_in_one_statement():
+    """Several orders are published with a single NOTIFY statement."""
+    bus = OrderEventBus()
+    session = AsyncMock()
+
+    await bus.publish_many(
+        session, [ORDER_ID, OTHER_ORDER_ID], OrderState.EXPIRED, OrderEvent.EXPIRED
+    )
+    await bus.publish_many(session, [], OrderState.EXPIRED, OrderEvent.EXPIRED)
+
+    session.execute.assert_awaited_once()
+    params = session.execute.await_args.args[1]
+    assert params["channel"] == "order_events"
+    assert [json.loads(p)["order_id"] for p in params["payloads"]] == [
+        ORDER_ID,
+        OTHER_ORDER_ID,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_status_stream_waits_for_events():
+    """With the bus connected, a stream rereads its order only when told to."""
+    bus = OrderEventBus()
+    bus.connected = True
+    pending = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RESERVED,
+        num_allowances=5,
+        updated_at=datetime(2026, 1, 1),
+    )
+    retired = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RETIRED,
+        num_allowances=5,
+        updated_at=datetime(2026, 1, 1) + timedelta(seconds=1),
+    )
+    session = AsyncMock()
+    session.get = AsyncMock(side_effect=[pending, retired])
+    no_ranges = MagicMock()
+    no_ranges.scalars.return_value.all.return_value = []
+    session.execute = AsyncMock(return_value=no_ranges)
+
+    with patch("app.api.retirements.order_event_bus", bus), patch.object(
+        settings, "order_stream_poll_seconds", 60
+    ):
+        stream = _order_status_events(session, ORDER_ID, None)
+        assert (await stream.__anext__()).startswith("retry:")
+        assert '"status":"pending"' in await stream.__anext__()
+
+        waiting = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        assert session.get.await_count == 1
+
+        bus.dispatch(_event(ORDER_ID))
+        assert '"status":"completed"' in await asyncio.wait_for(waiting, 1)
+
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+
+
+@pytest.mark.db
+@pytest.mark.asyncio
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_committed_events_reach_listener():
+    """Events are delivered through Postgres on commit and dropped on rollback."""
+    bus = OrderEventBus()
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+
+    with patch.object(
+        settings, "database_url", TEST_DATABASE_URL
+    ), bus.subscribe() as events:
+        await bus.start()
+        try:
+            for _ in range(100):
+                if bus.connected:
+                    break
+                await asyncio.sleep(0.05)
+            assert bus.connected
+
+            async with AsyncSession(engine) as session:
+                await bus.publish(
+                    session, OTHER_ORDER_ID, OrderState.FAILED, OrderEvent.FAILED
+                )
+                await session.rollback()
+                await bus.publish(
+                    session, ORDER_ID, OrderState.RETIRED, OrderEvent.RETIRED
+                )
+                await session.commit()
+
+            event = await asyncio.wait_for(events.get(), 5)
+            assert event == _event(ORDER_ID)
+            await asyncio.sleep(0.1)
+            assert events.empty()
+        finally:
+            await bus.stop()
+            await engine.dispose()
+
+    assert not bus.connected
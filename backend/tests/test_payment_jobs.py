@@ -0,0 +1,322 @@
+"""Payment job queue tests."""
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.orders import Order, OrderState
+from app.models.payment_jobs import PaymentJobState
+from app.services import payment_jobs
+from app.services.alchemy import alchemy_service
+from app.services.inventory import inventory_service
+from app.services.payment_jobs import payment_job_service
+from app.services.payment_validator import payment_validator
+from app.services.thirdweb import thirdweb_service
+from app.services.transaction_monitor import transaction_monitor
+
+ORDER_ID = "550e8400-e29b-41d4-a716-446655440000"
+TX_HASH = "0x" + "ab" * 32
+
+
+def _sessions(order=None):
+    """Patch the worker's sessions; returns the patch and the shared session."""
+    session = AsyncMock()
+    session.get = AsyncMock(return_value=order)
+    locked = MagicMock()
+    locked.scalar_one_or_none.return_value = order
+    session.execute = AsyncMock(return_value=locked)
+    session.open = 0
+
+    @asynccontextmanager
+    async def async_session():
+        session.open += 1
+        try:
+            yield session
+        finally:
+            session.open -= 1
+
+    return patch.object(payment_jobs, "async_session", async_session), session
+
+
+def _finish_params(session):
+    """Parameters of the statement recording the attempt's outcome."""
+    return session.execute.await_args_list[-1].args[1]
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_pending_payment_is_retried_with_backoff():
+    """A pending transaction puts the job back in the queue for later."""
+    order = Order(order_id=ORDER_ID, status=OrderState.RESERVED, num_allowances=2)
+    sessions, session = _sessions(order)
+    pending = {"success": True, "valid": False, "status": "pending"}
+
+    with sessions, patch.object(
+        payment_validator,
+        "validate_payment_transaction",
+        AsyncMock(return_value=pending),
+    ):
+        result = await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=3)
+
+    params = _finish_params(session)
+    assert result["retry"] is True
+    assert params["status"] == PaymentJobState.QUEUED.value
+    assert params["attempts"] == 3
+    delay = (params["run_at"] - params["now"]).total_seconds()
+    assert delay == min(
+        payment_job_service.retry_base * 4, payment_job_service.retry_max
+    )
+    assert order.tx_hash is None
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_invalid_payment_fails_without_retry():
+    """A payment that can never be valid fails the job at once."""
+    order = Order(order_id=ORDER_ID, status=OrderState.RESERVED, num_allowances=2)
+    sessions, session = _sessions(order)
+    # What the validator returns for an amount outside the tolerance
+    invalid = {
+        "success": False,
+        "valid": False,
+        "error": "Payment amount validation failed",
+        "amount_error": "Insufficient payment amount",
+    }
+
+    with sessions, patch.object(
+        payment_validator,
+        "validate_payment_transaction",
+        AsyncMock(return_value=invalid),
+    ):
+        result = await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=1)
+
+    params = _finish_params(session)
+    assert result["retry"] is False
+    assert params["status"] == PaymentJobState.FAILED.value
+    assert params["attempts"] == 1
+    assert "Payment amount validation failed" in params["error"]
+    assert order.tx_hash is None
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_unreadable_payment_is_retried():
+    """A chain or price lookup error leaves the payment to be checked again."""
+    order = Order(order_id=ORDER_ID, status=OrderState.RESERVED, num_allowances=2)
+    sessions, session = _sessions(order)
+    error = {"success": False, "error": "Payment validation error: timed out"}
+
+    with sessions, patch.object(
+        payment_validator, "validate_payment_transaction", AsyncMock(return_value=error)
+    ):
+        result = await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=1)
+
+    assert result["retry"] is True
+    assert _finish_params(session)["status"] == PaymentJobState.QUEUED.value
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_valid_payment_is_stored_and_fulfilled():
+    """A valid payment is recorded on the order before fulfilment starts."""
+    order = Order(order_id=ORDER_ID, status=OrderState.RESERVED, num_allowances=2)
+    sessions, session = _sessions(order)
+    valid = {"success": True, "valid": True}
+
+    with sessions, patch.object(
+        payment_validator, "validate_payment_transaction", AsyncMock(return_value=valid)
+    ), patch.object(
+        transaction_monitor,
+        "process_single_order",
+        AsyncMock(return_value={"success": True}),
+    ) as fulfil:
+        await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=1)
+
+    assert order.tx_hash == TX_HASH
+    fulfil.assert_awaited_once_with(ORDER_ID)
+    assert _finish_params(session)["status"] == PaymentJobState.DONE.value
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_chain_calls_run_with_no_session_open():
+    """Validation happens between the worker's short transactions."""
+    order = Order(order_id=ORDER_ID, status=OrderState.RESERVED, num_allowances=2)
+    sessions, session = _sessions(order)
+    open_sessions = []
+
+    async def validate(**kwargs):
+        open_sessions.append(session.open)
+        return {"success": True, "valid": True}
+
+    with sessions, patch.object(
+        payment_validator, "validate_payment_transaction", validate
+    ), patch.object(
+        transaction_monitor,
+        "process_single_order",
+        AsyncMock(return_value={"success": True}),
+    ):
+        await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=1)
+
+    assert open_sessions == [0]
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_payment_for_order_that_failed_fails_the_job():
+    """A payment whose order ended failed is kept on a failed job."""
+    order = Order(
+        order_id=ORDER_ID, status=OrderState.RESERVED, num_allowances=2, tx_hash=TX_HASH
+    )
+    sessions, session = _sessions(order)
+    failed = {"success": True, "status": OrderState.FAILED}
+
+    with sessions, patch.object(
+        transaction_monitor, "process_single_order", AsyncMock(return_value=failed)
+    ):
+        result = await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=1)
+
+    params = _finish_params(session)
+    assert result["success"] is False
+    assert params["status"] == PaymentJobState.FAILED.value
+    assert "FAILED" in params["error"]
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_redelivered_job_for_expired_order_fails():
+    """A job delivered after its order expired is not reported as done."""
+    order = Order(order_id=ORDER_ID, status=OrderState.EXPIRED, num_allowances=2)
+    sessions, session = _sessions(order)
+
+    with sessions:
+        result = await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=2)
+
+    assert result["retry"] is False
+    assert _finish_params(session)["status"] == PaymentJobState.FAILED.value
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_claimed_distribution_is_not_sent_again():
+    """A second run finds the distribution claimed and sends no tokens."""
+    order = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RESERVED,
+        wallet="0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b",
+        num_allowances=2,
+        tx_hash=TX_HASH,
+    )
+    session = AsyncMock()
+    session.get = AsyncMock(return_value=order)
+    claim = MagicMock()
+    claim.scalar_one_or_none.return_value = None
+    session.execute = AsyncMock(return_value=claim)
+    transfer = AsyncMock()
+
+    with patch.object(
+        inventory_service, "get_order_ranges", AsyncMock(return_value=[])
+    ), patch.object(thirdweb_service, "transfer_tokens", transfer):
+        await transaction_monitor._process_confirmed_payment(session, ORDER_ID)
+
+    transfer.assert_not_awaited()
+    session.commit.assert_not_awaited()
+    assert order.status == OrderState.RESERVED
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_claimed_distribution_is_not_failed_by_others():
+    """Only the distributor may fail an order whose tokens may be on their way."""
+    order = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RESERVED,
+        num_allowances=2,
+        tx_hash=TX_HASH,
+        distribution_started_at=datetime.utcnow(),
+    )
+    session = AsyncMock()
+    locked = MagicMock()
+    locked.scalar_one_or_none.return_value = order
+    session.execute = AsyncMock(return_value=locked)
+    release = AsyncMock()
+
+    with patch.object(inventory_service, "release", release):
+        await transaction_monitor._mark_order_as_failed(
+            session, ORDER_ID, "Payment timeout"
+        )
+
+    assert order.status == OrderState.RESERVED
+    release.assert_not_awaited()
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_redelivered_job_for_finished_order_is_done():
+    """A job delivered again after its order moved on does nothing."""
+    order = Order(order_id=ORDER_ID, status=OrderState.RETIRED, num_allowances=2)
+    sessions, session = _sessions(order)
+    validate = AsyncMock()
+
+    with sessions, patch.object(
+        payment_validator, "validate_payment_transaction", validate
+    ):
+        result = await payment_job_service.run_job(ORDER_ID, TX_HASH, attempt=2)
+
+    assert result["success"] is True
+    validate.assert_not_awaited()
+    assert _finish_params(session)["status"] == PaymentJobState.DONE.value
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_late_valid_payment_is_not_timed_out():
+    """A payment made well after reserving is still checked on chain."""
+    now = datetime.utcnow()
+    order = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RESERVED,
+        num_allowances=2,
+        tx_hash=TX_HASH,
+        timestamp=now - timedelta(minutes=transaction_monitor.timeout_minutes + 1),
+        paid_at=now,
+    )
+    session = AsyncMock()
+
+    with patch.object(
+        alchemy_service, "is_transaction_confirmed", AsyncMock(return_value=True)
+    ), patch.object(
+        transaction_monitor, "_process_confirmed_payment", AsyncMock()
+    ) as fulfil, patch.object(
+        transaction_monitor, "_mark_order_as_failed", AsyncMock()
+    ) as fail:
+        await transaction_monitor._process_pending_order(session, order)
+
+    fulfil.assert_awaited_once_with(session, ORDER_ID)
+    fail.assert_not_awaited()
+
+
+@pytest.mark.smoke
+@pytest.mark.asyncio
+async def test_payment_unconfirmed_past_timeout_fails():
+    """A payment still unconfirmed after the timeout fails the order."""
+    order = Order(
+        order_id=ORDER_ID,
+        status=OrderState.RESERVED,
+        num_allowances=2,
+        tx_hash=TX_HASH,
+        paid_at=datetime.utcnow()
+        - timedelta(minutes=transaction_monitor.timeout_minutes + 1),
+    )
+    session = AsyncMock()
+    confirmed = AsyncMock()
+
+    with patch.object(
+        alchemy_service, "is_transaction_confirmed", confirmed
+    ), patch.object(transaction_monitor, "_mark_order_as_failed", AsyncMock()) as fail:
+        await transaction_monitor._process_pending_order(session, order)
+
+    fail.assert_awaited_once_with(session, ORDER_ID, "Payment timeout")
+    confirmed.assert_not_awaited()
@@ -0,0 +1,402 @@
+"""Query plan regression tests for the hot inventory and order queries.
+
+These run EXPLAIN against a seeded local Postgres and fail when a hot query
+falls back to a sequential scan. Point ``TEST_DATABASE_URL`` at a scratch
+database (e.g. ``postgresql+asyncpg://postgres@localhost/ultracivic_test``);
+the tests are skipped when it is not set. Tables are created in their own
+schema, which is dropped afterwards.
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, func, or_, text
+from sqlmodel import select
+
+from app.models.allowance_ranges import AllowanceRange
+from app.models.allowances import AllowanceStatus
+from app.models.inventory_counters import InventoryCounter
+from app.models.orders import Order, OrderAllowance, OrderState
+from app.models.payment_jobs import PaymentJob
+from app.models.retirement_watermark import RetirementWatermark
+from app.services.cleanup_service import CleanupService
+from app.services.history import (
+    BACKFILL_HISTORY_SQL,
+    HISTORY_PAGE_AFTER_SQL,
+    HISTORY_PAGE_SQL,
+    RECORD_RETIREMENT_SQL,
+    WALLET_PAGE_AFTER_SQL,
+    WALLET_PAGE_SQL,
+)
+from app.services.inventory import (
+    REBUILD_COUNTERS_SQL,
+    RESERVE_BATCH_SQL,
+    RESERVE_RANGES_SQL,
+    RETIRE_RANGES_SQL,
+)
+from app.services.retirement_export import EXPORT_RETIREMENTS_SQL
+from tests.conftest import scratch_schema
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+SCHEMA = "query_plans"
+NUM_RANGES = 20000
+NUM_ORDERS = 10000
+
+pytestmark = [
+    pytest.mark.db,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"),
+]
+
+
+async def _seed(engine):
+    async with engine.begin() as conn:
+        # Alternating free and held ranges of ten serials each
+        await conn.execute(
+            text(
+                """
+            INSERT INTO allowance_ranges (
+                start_serial, end_serial, status, bucket, created_at, updated_at
+            )
+            SELECT
+                1000000 + i * 10, 1000000 + i * 10 + 9,
+                CASE WHEN i % 2 = 0 THEN 'AVAILABLE' ELSE 'RETIRED' END::allowancestatus,
+                (i / 2) % 16, now(), now()
+            FROM generate_series(0, :num_ranges - 1) AS i
+        """
+            ),
+            {"num_ranges": NUM_RANGES},
+        )
+
+        # Mostly retired orders with a tail of reserved and paid ones, from
+        # a hundred wallets
+        await conn.execute(
+            text(
+                """
+            INSERT INTO orders (
+                order_id, status, wallet, num_allowances, tx_hash, paid_at,
+                timestamp, created_at, updated_at
+            )
+            SELECT
+                md5(i::text)::uuid::varchar,
+                CASE WHEN i % 20 = 0 THEN 'RESERVED' ELSE 'RETIRED' END::orderstate,
+                '0x' || lpad(to_hex(i % 100), 40, '0'),
+                10,
+                CASE WHEN i % 40 = 0 THEN '0x' || md5(i::text) END,
+                CASE WHEN i % 40 = 0 THEN now() - i * interval '1 minute' END,
+                now() - i * interval '1 minute',
+                now() - i * interval '1 minute',
+                now() - i * interval '1 minute'
+            FROM generate_series(1, :num_orders) AS i
+        """
+            ),
+            {"num_orders": NUM_ORDERS},
+        )
+        await conn.execute(
+            text(
+                """
+            INSERT INTO order_allowances (order_id, range_id)
+            SELECT o.order_id, r.id
+            FROM (SELECT order_id, row_number() OVER (ORDER BY order_id) AS n FROM orders) o
+            JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n
+                  FROM allowance_ranges WHERE status = 'RETIRED') r ON r.n = o.n
+        """
+            )
+        )
+        await conn.execute(
+            BACKFILL_HISTORY_SQL, {"after_order_id": "", "batch_size": NUM_ORDERS}
+        )
+        await conn.execute(REBUILD_COUNTERS_SQL, {"slots": 16})
+
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+
+
+async def _explain(engine, statement, params=None):
+    async with engine.connect() as conn:
+        # With sequential scans priced out, one only appears when no index applies
+        await conn.execute(text("SET enable_seqscan = off"))
+        if not isinstance(statement, str) and not hasattr(statement, "text"):
+            statement = statement.compile(
+                dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+            )
+            statement = text(str(statement))
+        result = await conn.execute(
+            text(f"EXPLAIN (FORMAT JSON) {statement.text}"), params or {}
+        )
+        plan = result.scalar_one()
+    return plan if isinstance(plan, list) else json.loads(plan)
+
+
+def _seq_scans(node):
+    """Collect relations read with a sequential scan anywhere in a plan."""
+    scans = []
+    if node.get("Node Type") == "Seq Scan":
+        scans.append(node.get("Relation Name"))
+    for child in node.get("Plans", []):
+        scans.extend(_seq_scans(child))
+    return scans
+
+
+async def assert_no_seq_scan(engine, statement, params=None):
+    plan = await _explain(engine, statement, params)
+    scans = _seq_scans(plan[0]["Plan"])
+    assert not scans, f"Sequential scan on {scans}:\n{json.dumps(plan, indent=2)}"
+
+
+@pytest.fixture(scope="module")
+def event_loop():
+    # The seeded schema is shared by the whole module, and so is its loop
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+async def db():
+    async with scratch_schema(SCHEMA) as engine:
+        await _seed(engine)
+        yield engine
+
+
+ORDER_ID = "550e8400-e29b-41d4-a716-446655440000"
+NOW = datetime(2026, 1, 1)
+
+
+async def test_order_status_lookup(db):
+    """Status reads one order by primary key."""
+    await assert_no_seq_scan(db, select(Order).where(Order.order_id == ORDER_ID))
+
+
+async def test_order_version_lookup(db):
+    """Status revalidation reads one order's updated_at by primary key."""
+    await assert_no_seq_scan(
+        db, select(Order.updated_at).where(Order.order_id == ORDER_ID)
+    )
+
+
+async def test_retirement_version_lookup(db):
+    """History revalidation reads the watermark row by primary key."""
+    await assert_no_seq_scan(
+        db, select(RetirementWatermark.version).where(RetirementWatermark.id == 1)
+    )
+
+
+async def test_order_ranges_lookup(db):
+    """Ranges for an order are found through the link table."""
+    stmt = (
+        select(AllowanceRange)
+        .join(OrderAllowance, OrderAllowance.range_id == AllowanceRange.id)
+        .where(OrderAllowance.order_id == ORDER_ID)
+        .order_by(AllowanceRange.start_serial)
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_range_owner_lookup(db):
+    """Deleting a merged range checks its links by range id."""
+    await assert_no_seq_scan(
+        db, select(OrderAllowance).where(OrderAllowance.range_id == 1)
+    )
+
+
+async def test_tx_hash_replay_probe(db):
+    """Confirm checks for a reused transaction with one index probe."""
+    await assert_no_seq_scan(
+        db, select(PaymentJob.order_id).where(PaymentJob.tx_hash == "0x" + "ab" * 32)
+    )
+
+
+async def test_pending_payment_scan(db):
+    """The monitor only reads paid, unretired orders."""
+    stmt = select(Order).where(
+        Order.status == OrderState.RESERVED,
+        Order.tx_hash.is_not(None),
+        Order.distribution_started_at.is_(None),
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_stuck_order_scan(db):
+    """Stuck-order cleanup reads paid, unretired orders past a threshold."""
+    stmt = select(Order).where(
+        Order.status == OrderState.RESERVED,
+        Order.tx_hash.is_not(None),
+        Order.distribution_started_at.is_(None),
+        Order.paid_at < NOW - timedelta(minutes=30),
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_stalled_distribution_scan(db):
+    """The stalled distribution check reads paid, unretired orders only."""
+    stmt = select(Order.order_id).where(
+        *CleanupService()._stalled_distribution_conditions()
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_expired_reservation_scan(db):
+    """Expired-reservation cleanup reads reserved orders past a threshold."""
+    stmt = select(Order).where(
+        Order.status == OrderState.RESERVED,
+        Order.timestamp < NOW - timedelta(minutes=15),
+        *CleanupService()._unpaid_conditions(),
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_history_page(db):
+    """History reads one page of the retirement history projection."""
+    await assert_no_seq_scan(db, HISTORY_PAGE_SQL, {"limit": 50, "offset": 100})
+
+
+async def test_history_page_after_cursor(db):
+    """A history cursor seeks into the projection's recency index."""
+    await assert_no_seq_scan(
+        db,
+        HISTORY_PAGE_AFTER_SQL,
+        {
+            "limit": 50,
+            "offset": 0,
+            "after_completed_at": NOW - timedelta(days=300),
+            "after_order_id": ORDER_ID,
+        },
+    )
+
+
+async def test_record_retirement(db):
+    """Projecting a retirement reads only the order's own ranges."""
+    await assert_no_seq_scan(
+        db,
+        RECORD_RETIREMENT_SQL,
+        {
+            "order_id": ORDER_ID,
+            "wallet": None,
+            "message": None,
+            "reward_tx_hash": None,
+            "completed_at": NOW,
+        },
+    )
+
+
+async def test_wallet_page(db):
+    """A wallet's retirements and totals are read through its index and summary row."""
+    wallet = "0x" + "0" * 38 + "2A"
+    await assert_no_seq_scan(
+        db, WALLET_PAGE_SQL, {"wallet": wallet.lower(), "limit": 50}
+    )
+    await assert_no_seq_scan(
+        db,
+        WALLET_PAGE_AFTER_SQL,
+        {
+            "wallet": wallet.lower(),
+            "limit": 50,
+            "after_completed_at": NOW - timedelta(days=3),
+            "after_order_id": ORDER_ID,
+        },
+    )
+
+
+async def test_export_retirements(db):
+    """The ledger export streams off the recency index instead of sorting it all."""
+    plan = await _explain(db, EXPORT_RETIREMENTS_SQL)
+    assert plan[0]["Plan"]["Node Type"] == "Index Scan"
+    assert plan[0]["Plan"]["Index Name"] == "ix_retirement_history_completed_at"
+
+
+async def test_count_available(db):
+    """Inventory counts read the counter stripes for one status."""
+    stmt = select(func.coalesce(func.sum(InventoryCounter.count), 0)).where(
+        InventoryCounter.status == AllowanceStatus.AVAILABLE
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_reserve_ranges(db):
+    """The reservation statement walks free ranges by serial."""
+    await assert_no_seq_scan(
+        db,
+        RESERVE_RANGES_SQL,
+        {
+            "order_id": ORDER_ID,
+            "quantity": 5,
+            "wallet": "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b",
+            "message": None,
+            "quote_wei": 10**16,
+            "quote_source": "coingecko",
+            "quote_expires_at": NOW,
+            "now": NOW,
+            "slot": 0,
+            "buckets": [3],
+        },
+    )
+
+
+async def test_reserve_batch(db):
+    """A batch reservation walks free ranges by serial once for all entries."""
+    await assert_no_seq_scan(
+        db,
+        RESERVE_BATCH_SQL,
+        {
+            "order_ids": [ORDER_ID, "650e8400-e29b-41d4-a716-446655440000"],
+            "wallets": ["0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b"] * 2,
+            "messages": [None, "Batch"],
+            "quantities": [5, 12],
+            "quote_weis": [10**16, None],
+            "quote_sources": ["coingecko", None],
+            "quote_expiries": [NOW, None],
+            "now": NOW,
+            "slot": 0,
+            "buckets": [3],
+            "all_or_nothing": True,
+        },
+    )
+
+
+async def test_retire_ranges(db):
+    """Retiring an order touches only its linked ranges."""
+    await assert_no_seq_scan(
+        db, RETIRE_RANGES_SQL, {"order_id": ORDER_ID, "now": NOW, "slot": 0}
+    )
+
+
+async def test_release_links(db):
+    """Releasing an order deletes only its links."""
+    await assert_no_seq_scan(
+        db, delete(OrderAllowance).where(OrderAllowance.order_id == ORDER_ID)
+    )
+
+
+async def test_coalesce_neighbours(db):
+    """Merging a released range looks up free neighbours by serial."""
+    stmt = select(AllowanceRange).where(
+        AllowanceRange.status == AllowanceStatus.AVAILABLE,
+        AllowanceRange.id != 1,
+        AllowanceRange.originating_state.is_not_distinct_from(None),
+        AllowanceRange.allocation_year.is_not_distinct_from(None),
+        AllowanceRange.bucket == 0,
+        or_(
+            AllowanceRange.end_serial == 1000009,
+            AllowanceRange.start_serial == 1000020,
+        ),
+    )
+    await assert_no_seq_scan(db, stmt)
+
+
+async def test_coalesce_neighbours_across_buckets(db):
+    """A range joining a neighbouring bucket still finds neighbours by serial."""
+    stmt = select(AllowanceRange).where(
+        AllowanceRange.status == AllowanceStatus.AVAILABLE,
+        AllowanceRange.id != 1,
+        AllowanceRange.originating_state.is_not_distinct_from(None),
+        AllowanceRange.allocation_year.is_not_distinct_from(None),
+        or_(
+            AllowanceRange.end_serial == 1000009,
+            AllowanceRange.start_serial == 1000020,
+        ),
+    )
+    await assert_no_seq_scan(db, stmt)
@@ -0,0 +1,110 @@
+"""Retirement ledger export tests."""
+
+import csv
+import hashlib
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.retirement_export import ExportFormat, RetirementExportService
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+NUM_RETIREMENTS = 2500
+
+
+async def _seed(engine):
+    async with engine.begin() as conn:
+        # Retirement i holds serials [i*10, i*10+1] and i*10+5
+        await conn.execute(
+            text(
+                """
+            INSERT INTO orders (order_id, status, num_allowances, created_at, updated_at)
+            SELECT 'order-' || lpad(i::text, 5, '0'), 'RETIRED', 3, now(), now()
+            FROM generate_series(1, :n) AS i
+        """
+            ),
+            {"n": NUM_RETIREMENTS},
+        )
+        await conn.execute(
+            text(
+                """
+            INSERT INTO retirement_history (
+                order_id, wallet, message, reward_tx_hash,
+                serial_ranges, num_allowances, completed_at
+            )
+            SELECT
+                'order-' || lpad(i::text, 5, '0'),
+                '0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b',
+                CASE WHEN i = 1 THEN 'Für den Planeten, "bitte"' END,
+                '0x' || md5(i::text),
+                ARRAY[ARRAY[i * 10, i * 10 + 1], ARRAY[i * 10 + 5, i * 10 + 5]],
+                3,
+                TIMESTAMP '2026-01-01' + i * interval '1 second'
+            FROM generate_series(1, :n) AS i
+        """
+            ),
+            {"n": NUM_RETIREMENTS},
+        )
+
+
+async def _export(engine, export_format):
+    """Run an export against a seeded schema; returns its chunks."""
+    await _seed(engine)
+    service = RetirementExportService()
+    service.chunk_size = 1000
+    async with AsyncSession(engine) as session:
+        return [chunk async for chunk in service.stream(session, export_format)]
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_ndjson_export_streams_the_ledger_in_chunks(db_engine):
+    """Every retirement is exported oldest first, one chunk per fetch."""
+    chunks = await _export(db_engine, ExportFormat.NDJSON)
+
+    assert len(chunks) == 3
+    records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert len(records) == NUM_RETIREMENTS
+    assert [r["order_id"] for r in records] == sorted(r["order_id"] for r in records)
+    assert records[0] == {
+        "order_id": "order-00001",
+        "wallet": "0x742d35cc6634c0532925a3b8d11d2d7d2ae30b2b",
+        "message": 'Für den Planeten, "bitte"',
+        "reward_tx_hash": "0x" + hashlib.md5(b"1").hexdigest(),
+        "num_allowances": 3,
+        "serial_ranges": [[10, 11], [15, 15]],
+        "completed_at": (datetime(2026, 1, 1) + timedelta(seconds=1)).isoformat(),
+    }
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_csv_export_writes_ranges_compactly(db_engine):
+    """CSV has a header row and runs of serials as start-end pairs."""
+    chunks = await _export(db_engine, ExportFormat.CSV)
+
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == NUM_RETIREMENTS
+    assert rows[0]["message"] == 'Für den Planeten, "bitte"'
+    assert rows[0]["serial_ranges"] == "10-11;15"
+    assert rows[-1]["order_id"] == "order-02500"
+
+
+@pytest.mark.db
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+async def test_parquet_export_writes_one_row_group_per_chunk(db_engine):
+    """Parquet bytes stream as row groups are written and read back whole."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    chunks = await _export(db_engine, ExportFormat.PARQUET)
+
+    assert all(chunks[:3])
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet.num_row_groups == 3
+    table = parquet.read()
+    assert table.num_rows == NUM_RETIREMENTS
+    assert table.column("serial_ranges")[0].as_py() == [[10, 11], [15, 15]]
@@ -0,0 +1,42 @@
+"""Serial number representation tests."""
+
+import pytest
+
+from app.utils.serials import (
+    SerialFormat,
+    compact_serials,
+    format_serials,
+    negotiate_serial_format,
+)
+
+
+@pytest.mark.smoke
+def test_consecutive_serials_collapse_into_runs():
+    """Touching ranges are joined; lone serials stand on their own."""
+    ranges = [[200, 200], [100, 149], [150, 198], [300, 301]]
+
+    assert compact_serials(ranges) == ["100-198", "200", "300-301"]
+    assert format_serials(ranges, SerialFormat.RANGES) == compact_serials(ranges)
+    assert format_serials([[5, 7], [1, 1]], SerialFormat.LIST) == ["1", "5", "6", "7"]
+    assert compact_serials([]) == []
+
+
+@pytest.mark.parametrize(
+    "requested, accept, expected",
+    [
+        (None, None, SerialFormat.LIST),
+        (None, "application/json", SerialFormat.LIST),
+        (None, "application/json; serials=ranges", SerialFormat.RANGES),
+        (
+            None,
+            'text/html, application/json;q=0.9;serials="RANGES"',
+            SerialFormat.RANGES,
+        ),
+        (None, "application/json; serials=bogus", SerialFormat.LIST),
+        (SerialFormat.LIST, "application/json; serials=ranges", SerialFormat.LIST),
+        (SerialFormat.RANGES, None, SerialFormat.RANGES),
+    ],
+)
+def test_serial_format_negotiation(requested, accept, expected):
+    """The query parameter wins over the Accept variant; the full list is the default."""
+    assert negotiate_serial_format(requested, accept) == expected